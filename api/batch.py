@@ -0,0 +1,79 @@
+"""
+Run a file of questions through the batch pipeline without the HTTP server.
+
+    python -m api.batch questions.txt -o results.ndjson --concurrency 4
+
+The input holds one question per line, or JSON lines with a "question"
+field. Results are written as NDJSON in completion order, exactly as the
+`POST /api/v1/chat/batch` endpoint streams them.
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+
+from api.core.config import settings
+
+
+def read_questions(path: str) -> list[str]:
+    stream = sys.stdin if path == "-" else open(path, encoding="utf-8")
+    with stream:
+        lines = [line.strip() for line in stream]
+    questions = []
+    for line in lines:
+        if not line:
+            continue
+        if line.startswith("{"):
+            line = json.loads(line)["question"]
+        questions.append(line)
+    return questions
+
+
+async def run(args) -> int:
+    from api.services import get_batch_service, get_database_service, init_services
+    from api.services.llm import get_llm_registry
+
+    questions = read_questions(args.input)
+    await asyncio.to_thread(init_services)
+    batch_service = get_batch_service()
+    output = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    try:
+        job = batch_service.submit(questions, args.model, args.concurrency)
+        async for line in batch_service.stream(job):
+            output.write(line.decode("utf-8"))
+            output.flush()
+    finally:
+        if output is not sys.stdout:
+            output.close()
+        await batch_service.shutdown()
+        database_service = get_database_service()
+        if database_service.async_db is not None:
+            await database_service.async_db.dispose()
+        await get_llm_registry().aclose()
+
+    print(
+        f"{len(job.questions)} questions, {job.unique} distinct, {job.failed} failed, "
+        f"job {job.status}",
+        file=sys.stderr,
+    )
+    return 1 if job.failed or job.status != "completed" else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Answer a file of questions")
+    parser.add_argument("input", help="Questions, one per line or JSONL ('-' for stdin)")
+    parser.add_argument("-o", "--output", default="-", help="NDJSON output file")
+    parser.add_argument("--model", default="gpt-4o-mini", help="Model for every question")
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=None,
+        help=f"Questions answered at once (at most {settings.batch_max_concurrency})",
+    )
+    args = parser.parse_args()
+    sys.exit(asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()
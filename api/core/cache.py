@@ -0,0 +1,152 @@
+"""
+Cache backends with TTL, LRU eviction and tag-based invalidation.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterable, Optional
+
+
+class CacheBackend:
+    """Interface for string caches shared by the services."""
+
+    def get(self, key: str) -> Optional[str]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: str, ttl: float, tags: Iterable[str] = ()):
+        raise NotImplementedError
+
+    def invalidate_tag(self, tag: str) -> int:
+        """Drop every entry stored with `tag`. Returns the number dropped."""
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def count(self) -> Optional[int]:
+        """Number of entries held, or None if the backend cannot count them cheaply."""
+        return None
+
+
+class MemoryCacheBackend(CacheBackend):
+    """In-process LRU cache bounded by entry count and total UTF-8 value size."""
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size_bytes = 0
+        # key -> (expires_at, value, tags, size in bytes)
+        self._entries: OrderedDict[str, tuple[float, str, tuple, int]] = OrderedDict()
+        self._tags: dict[str, set[str]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value, _, _ = entry
+            if expires_at < time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str, ttl: float, tags: Iterable[str] = ()):
+        size = len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        tags = tuple(tags)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + ttl, value, tags, size)
+            self.size_bytes += size
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while (
+                len(self._entries) > self.max_entries or self.size_bytes > self.max_bytes
+            ):
+                self._remove(next(iter(self._entries)))
+
+    def invalidate_tag(self, tag: str) -> int:
+        with self._lock:
+            keys = self._tags.pop(tag, set())
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+            self.size_bytes = 0
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        _, _, tags, size = entry
+        self.size_bytes -= size
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def count(self) -> Optional[int]:
+        return len(self._entries)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class RedisCacheBackend(CacheBackend):
+    """
+    Redis-backed cache so several uvicorn workers share entries.
+
+    Tags are stored as Redis sets of keys under the same prefix, expiring
+    no earlier than the last entry added to them (requires Redis 7). Entries
+    are not counted, since that would need a scan of the whole keyspace.
+    """
+
+    def __init__(self, url: str, prefix: str = "nl2sql:cache:"):
+        try:
+            import redis
+        except ImportError:
+            raise ImportError(
+                "redis package not found, please install with `pip install redis`"
+            )
+        self.prefix = prefix
+        self.client = redis.Redis.from_url(url, decode_responses=True)
+
+    def get(self, key: str) -> Optional[str]:
+        return self.client.get(self.prefix + key)
+
+    def set(self, key: str, value: str, ttl: float, tags: Iterable[str] = ()):
+        pipe = self.client.pipeline()
+        ttl_ms = int(ttl * 1000)
+        pipe.set(self.prefix + key, value, px=ttl_ms)
+        for tag in tags:
+            tag_key = f"{self.prefix}tag:{tag}"
+            pipe.sadd(tag_key, key)
+            # Give a new set the entry's TTL and only ever extend it, so the
+            # set outlives every entry it lists
+            pipe.pexpire(tag_key, ttl_ms, nx=True)
+            pipe.pexpire(tag_key, ttl_ms, gt=True)
+        pipe.execute()
+
+    def invalidate_tag(self, tag: str) -> int:
+        tag_key = f"{self.prefix}tag:{tag}"
+        keys = self.client.smembers(tag_key)
+        if keys:
+            self.client.delete(*(self.prefix + key for key in keys))
+        self.client.delete(tag_key)
+        return len(keys)
+
+    def clear(self):
+        keys = list(self.client.scan_iter(match=f"{self.prefix}*"))
+        if keys:
+            self.client.delete(*keys)
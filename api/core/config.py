@@ -18,6 +18,7 @@ class Settings(BaseSettings):
     host: str = "0.0.0.0"
     port: int = 8000
     reload: bool = False
+    profile_startup: bool = False  # log import/init timings after startup
 
     # CORS
     cors_origins: list[str] = ["http://localhost:3000", "http://localhost:5173"]
@@ -33,13 +34,112 @@ class Settings(BaseSettings):
     openai_model: str = "gpt-4o-mini"
     openai_temperature: float = 0.7
     openai_max_tokens: int = 1000
+    openai_embedding_model: str = "text-embedding-3-small"
 
-    # Database Configuration (PostgreSQL only)
+    # LLM clients, shared by every service
+    llm_backend: str = "openai"  # see api.services.llm.register_backend
+    llm_base_url: str = ""  # OpenAI-compatible endpoint, e.g. python -m benchmarks.llm_stub
+    llm_max_connections: int = 100  # pooled HTTP connections to the LLM API
+    llm_timeout_seconds: float = 60.0
+    llm_max_retries: int = 2  # with jittered exponential backoff
+    llm_hedge_after_seconds: float = 0.0  # resend if no first token by then; 0 disables
+
+    # Database Configuration (PostgreSQL, unless database_url says otherwise)
+    database_url: str = ""  # SQLAlchemy URL overriding db_*, e.g. a SQLite fixture
     db_user: str = ""
     db_password: str = ""
     db_host: str = "localhost"
     db_port: int = 5432
     db_name: str = ""
+    db_schema: str = "public"  # namespace watched for schema changes
+    db_pool_size: int = 10
+    db_pool_max_overflow: int = 10
+    db_pool_timeout: float = 30.0
+    db_statement_timeout_ms: int = 30000
+
+    # SQL result encoding
+    sql_max_rows: int = 200
+    sql_max_result_bytes: int = 16384
+    sql_max_cell_length: int = 300
+    sql_truncated_count_limit: int = 10000
+
+    # SQL validation and guardrails
+    sql_validator_cache_size: int = 4096  # cached read-only verdicts
+    sql_read_only: bool = True  # run agent SQL in read-only transactions (PostgreSQL)
+    sql_auto_limit: bool = True  # add a LIMIT to queries without one
+    sql_preflight_enabled: bool = False  # EXPLAIN queries before running them (PostgreSQL)
+    sql_preflight_max_cost: float = 1_000_000.0  # planner cost units
+    sql_preflight_max_rows: int = 10_000_000  # largest estimated rows of any plan step
+
+    # Query result cache
+    query_cache_enabled: bool = True
+    query_cache_ttl_seconds: float = 300.0
+    query_cache_max_entries: int = 1024
+    query_cache_max_bytes: int = 64 * 1024 * 1024
+    query_cache_redis_url: str = ""
+
+    # Answer cache
+    answer_cache_enabled: bool = True
+    answer_cache_mode: str = "rerun"  # "rerun" re-validates the SQL, "replay" trusts it
+    answer_cache_ttl_seconds: float = 3600.0
+    answer_cache_max_entries: int = 512
+    answer_cache_embedder: str = ""  # "", "hashing" or "openai"
+    answer_cache_similarity_threshold: float = 0.92
+
+    # Few-shot examples
+    examples_enabled: bool = True
+    examples_seed_path: str = "examples.jsonl"  # {"question", "sql"} per line, optional
+    examples_path: str = ".cache/examples.jsonl"  # user-confirmed examples; "" keeps them in memory
+    examples_top_k: int = 3
+    examples_embedder: str = ""  # "", "hashing" or "openai"
+    examples_max_candidates: int = 1024  # executed queries awaiting feedback
+
+    # Schema pruning
+    schema_pruning_enabled: bool = True
+    schema_pruning_top_k: int = 8
+    schema_pruning_min_tables: int = 12  # smaller schemas are sent in full
+    schema_embedder: str = ""  # "", "hashing" or "openai"
+    schema_poll_interval_seconds: float = 60.0  # 0 disables change detection
+    schema_snapshot_path: str = ".cache/schema_snapshot.json"  # "" disables
+    schema_tool_format: str = "compact"  # "compact" or "ddl" (CREATE TABLE + sample rows)
+    schema_tool_sample_rows: int = 3
+
+    # Conversation memory
+    checkpointer_backend: str = "memory"  # "memory", "sqlite", "postgres" or "" to disable
+    checkpointer_url: str = ""  # sqlite path or postgres connection string
+    conversation_history_strategy: str = "trim"  # "trim" or "summarize"
+    conversation_max_history_tokens: int = 4000
+    conversation_ttl_seconds: float = 86400.0  # 0 keeps idle threads forever
+    conversation_sweep_interval_seconds: float = 600.0
+
+    # Chat admission control
+    chat_max_concurrent_runs: int = 32
+    chat_max_queued_runs: int = 64
+    chat_queue_timeout_seconds: float = 10.0
+    chat_max_runs_per_chat: int = 1
+    chat_retry_after_seconds: int = 5
+
+    # Batch jobs
+    batch_max_questions: int = 500
+    batch_max_concurrency: int = 4
+    batch_max_running_jobs: int = 4  # further jobs are rejected with 503
+    batch_max_jobs: int = 100  # finished jobs kept for the status endpoint
+    batch_job_ttl_seconds: float = 3600.0
+
+    # Token accounting
+    usage_max_chats: int = 10000  # chats whose token totals this worker keeps
+
+    # Response streaming
+    sse_coalesce_window_ms: float = 20.0  # 0 sends every token in its own frame
+    sse_coalesce_max_bytes: int = 256
+
+    # Tracing
+    otel_enabled: bool = False  # exporter is configured with the OTEL_EXPORTER_OTLP_* variables
+    otel_service_name: str = "nl2sql-api"
+
+    # Query suggestions
+    suggestions_ttl_seconds: float = 3600.0
+    suggestions_retry_seconds: float = 60.0  # pause after a failed generation
 
     model_config = SettingsConfigDict(
         env_file=".env", env_file_encoding="utf-8", case_sensitive=False, extra="ignore"
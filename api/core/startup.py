@@ -0,0 +1,65 @@
+"""
+Startup-time profiling: import and initialization cost per module.
+"""
+
+import importlib
+import json
+import time
+from contextlib import contextmanager
+
+from .logging import logger
+
+
+class StartupProfiler:
+    """Records how long each startup phase takes."""
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.records: list[dict] = []
+
+    @contextmanager
+    def measure(self, phase: str, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.records.append(
+                {
+                    "phase": phase,
+                    "name": name,
+                    "seconds": round(time.perf_counter() - start, 6),
+                }
+            )
+
+    def import_module(self, name: str):
+        """
+        Import a module and record the time it took.
+
+        Modules already imported cost nothing, so the recorded time is the
+        incremental cost on top of everything imported before it.
+        """
+        with self.measure("import", name):
+            return importlib.import_module(name)
+
+    def report(self) -> dict:
+        return {
+            "records": self.records,
+            "ready_seconds": round(time.perf_counter() - self.started_at, 6),
+        }
+
+    def log_report(self):
+        report = self.report()
+        logger.info("Startup profile:")
+        for record in report["records"]:
+            logger.info(
+                f"  {record['phase']:<7} {record['name']:<45} {record['seconds']:.3f}s"
+            )
+        logger.info(f"  ready after {report['ready_seconds']:.3f}s")
+
+    def write_report(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.report(), f, indent=2)
+
+
+# Created on first import of api.core, i.e. at the very start of app import
+startup_profiler = StartupProfiler()
@@ -0,0 +1,40 @@
+"""
+Streaming response that always shuts its generator down.
+"""
+
+from typing import Callable, Optional
+
+from starlette.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+from .logging import logger
+
+
+class ClosingStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse that closes its body iterator when the response ends
+    for any reason, including a client disconnect, and then calls
+    `on_close`.
+
+    Starlette stops iterating on disconnect but leaves the generator
+    suspended until it is garbage collected; closing it right away cancels
+    the work behind it (agent runs, LLM requests, SQL queries).
+    """
+
+    def __init__(self, *args, on_close: Optional[Callable[[], None]] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.on_close = on_close
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            try:
+                aclose = getattr(self.body_iterator, "aclose", None)
+                if aclose is not None:
+                    await aclose()
+            except Exception as e:
+                logger.error(f"Error closing response stream: {str(e)}")
+            finally:
+                if self.on_close is not None:
+                    self.on_close()
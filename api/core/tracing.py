@@ -0,0 +1,159 @@
+"""
+Request stage timing: histograms on /metrics, a per-request breakdown and
+optional OpenTelemetry export.
+
+Durations are measured with `time.perf_counter`, so they are unaffected by
+wall clock adjustments.
+"""
+
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from .config import settings
+from .logging import logger
+from .metrics import metrics
+
+stage_seconds = metrics.histogram(
+    "nl2sql_stage_duration_seconds",
+    "Time spent in each stage of a request (agent build, LLM, tools, DB, SSE)",
+)
+
+_tracer = None
+
+
+class RequestTrace:
+    """Accumulates stage durations for one request."""
+
+    def __init__(self, name: str = "chat", **attributes):
+        self.started_at = time.perf_counter()
+        self.stages: dict[str, float] = defaultdict(float)
+        self.otel_span = None
+        self.otel_context = None
+        if _tracer is not None:
+            from opentelemetry import trace
+
+            self.otel_span = _tracer.start_span(name, attributes=attributes)
+            self.otel_context = trace.set_span_in_context(self.otel_span)
+
+    def add(self, stage: str, seconds: float):
+        self.stages[stage] += seconds
+
+    def finish(self) -> float:
+        """Record the total request time and close the exported span."""
+        elapsed = time.perf_counter() - self.started_at
+        self.add("request", elapsed)
+        stage_seconds.observe(elapsed, stage="request")
+        if self.otel_span is not None:
+            self.otel_span.end()
+        return elapsed
+
+    def summary(self) -> str:
+        return ", ".join(
+            f"{stage}={seconds * 1000:.1f}ms" for stage, seconds in self.stages.items()
+        )
+
+
+# Trace of the request being served; tool and DB tasks inherit it
+current_trace: ContextVar[Optional[RequestTrace]] = ContextVar(
+    "current_trace", default=None
+)
+
+
+def _trace_key(stage: str, labels: dict) -> str:
+    if not labels:
+        return stage
+    return f"{stage}[{','.join(str(value) for value in labels.values())}]"
+
+
+def record_duration(stage: str, seconds: float, **labels):
+    """Add a duration to the stage histogram and the current request trace."""
+    stage_seconds.observe(seconds, stage=stage, **labels)
+    trace = current_trace.get()
+    if trace is not None:
+        trace.add(_trace_key(stage, labels), seconds)
+
+
+def record_span(
+    stage: str,
+    start: float,
+    end: Optional[float] = None,
+    trace: Optional[RequestTrace] = None,
+    **labels,
+):
+    """
+    Record a stage that ran from `start` to `end` (perf_counter values).
+
+    `trace` defaults to the current request trace; callbacks that run
+    outside the request context pass it explicitly.
+    """
+    end = time.perf_counter() if end is None else end
+    seconds = end - start
+    stage_seconds.observe(seconds, stage=stage, **labels)
+    trace = trace or current_trace.get()
+    if trace is not None:
+        trace.add(_trace_key(stage, labels), seconds)
+
+    if _tracer is not None:
+        # Map the monotonic timestamps onto the wall clock for the exporter
+        end_ns = time.time_ns() - int((time.perf_counter() - end) * 1e9)
+        start_ns = end_ns - int(seconds * 1e9)
+        otel_span = _tracer.start_span(
+            stage,
+            context=trace.otel_context if trace is not None else None,
+            start_time=start_ns,
+            attributes=labels,
+        )
+        otel_span.end(end_time=end_ns)
+
+
+@contextmanager
+def span(stage: str, **labels):
+    """Time the enclosed block as `stage`."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_span(stage, start, **labels)
+
+
+def configure_tracing():
+    """Set up OpenTelemetry export when enabled in the settings."""
+    global _tracer
+    if not settings.otel_enabled:
+        return
+    try:
+        from opentelemetry import trace
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import (
+            OTLPSpanExporter,
+        )
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+    except ImportError:
+        raise ImportError(
+            "opentelemetry packages not found, please install with "
+            "`pip install opentelemetry-sdk opentelemetry-exporter-otlp-proto-http`"
+        )
+
+    provider = TracerProvider(
+        resource=Resource.create({"service.name": settings.otel_service_name})
+    )
+    # The exporter endpoint is read from the standard OTEL_EXPORTER_OTLP_* variables
+    provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+    trace.set_tracer_provider(provider)
+    _tracer = trace.get_tracer("nl2sql")
+    logger.info("OpenTelemetry span export enabled")
+
+
+def shutdown_tracing():
+    """Flush spans that are still buffered for export."""
+    if _tracer is None:
+        return
+    from opentelemetry import trace
+
+    provider = trace.get_tracer_provider()
+    if hasattr(provider, "shutdown"):
+        provider.shutdown()
@@ -3,7 +3,9 @@ NL2SQL FastAPI Application
 A chatbot API for converting natural language queries to SQL using LangChain.
 """
 
-from contextlib import asynccontextmanager
+import argparse
+import asyncio
+from contextlib import AsyncExitStack, asynccontextmanager
 
 from fastapi import FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
@@ -13,7 +15,17 @@ from starlette.exceptions import HTTPException as StarletteHTTPException
 
 from api.core.config import settings
 from api.core.logging import logger
-from api.routers import health_router, info_router, chat_router
+from api.core.startup import startup_profiler
+from api.core.tracing import configure_tracing, shutdown_tracing
+from api.middleware import RequestLoggingMiddleware
+from api.routers import health_router, info_router, chat_router, metrics_router
+from api.services import (
+    get_ai_service,
+    get_batch_service,
+    get_database_service,
+    get_suggestion_service,
+    init_services,
+)
 
 
 @asynccontextmanager
@@ -27,10 +39,61 @@ async def lifespan(app: FastAPI):
     logger.info(f"Debug mode: {settings.debug}")
     logger.info(f"Server will run on {settings.host}:{settings.port}")
 
+    configure_tracing()
+
+    # Services connect to the database and import LangChain, so build them
+    # off the event loop
+    await asyncio.to_thread(init_services)
+
+    # Conversation state per chat_id, closed on shutdown
+    exit_stack = AsyncExitStack()
+    from api.services.conversation import open_checkpointer
+
+    with startup_profiler.measure("init", "checkpointer"):
+        checkpointer = await exit_stack.enter_async_context(
+            open_checkpointer(settings.checkpointer_backend, settings.checkpointer_url)
+        )
+    ai_service = get_ai_service()
+    ai_service.attach_checkpointer(checkpointer)
+
+    # Compile the default agent before the first request arrives
+    with startup_profiler.measure("warm_up", "AIService"):
+        await asyncio.to_thread(ai_service.warm_up)
+    # Generate suggestions in the background so the first page load is fast
+    get_suggestion_service().schedule_refresh()
+
+    schema_watcher = None
+    if settings.schema_poll_interval_seconds > 0:
+        schema_watcher = asyncio.create_task(get_database_service().watch_schema())
+
+    thread_reaper = None
+    if ai_service.reaper is not None:
+        thread_reaper = asyncio.create_task(
+            ai_service.reaper.run(settings.conversation_sweep_interval_seconds)
+        )
+
+    if settings.profile_startup:
+        startup_profiler.log_report()
+
     yield
 
     # Shutdown
     logger.info("Shutting down NL2SQL API...")
+    if schema_watcher is not None:
+        schema_watcher.cancel()
+    if thread_reaper is not None:
+        thread_reaper.cancel()
+    await get_suggestion_service().shutdown()
+    # Before the checkpointer closes, since running jobs still use it
+    await get_batch_service().shutdown()
+    await exit_stack.aclose()
+    shutdown_tracing()
+    database_service = get_database_service()
+    if database_service.async_db is not None:
+        await database_service.async_db.dispose()
+    from api.services.llm import get_llm_registry
+
+    await get_llm_registry().aclose()
 
 
 def create_app() -> FastAPI:
@@ -55,11 +118,15 @@ def create_app() -> FastAPI:
         allow_headers=settings.cors_allow_headers,
     )
 
+    # Added last so it wraps the other middleware and times the full response
+    app.add_middleware(RequestLoggingMiddleware)
+
     register_exception_handlers(app)
 
     # Register routers
     app.include_router(health_router)
     app.include_router(info_router)
+    app.include_router(metrics_router)
     app.include_router(chat_router, prefix=settings.api_v1_prefix)
 
     return app
@@ -78,6 +145,8 @@ def register_exception_handlers(app: FastAPI):
                 "error": exc.detail,
                 "status_code": exc.status_code,
             },
+            # e.g. Retry-After on 429/503
+            headers=getattr(exc, "headers", None),
         )
 
     @app.exception_handler(RequestValidationError)
@@ -112,8 +181,32 @@ def register_exception_handlers(app: FastAPI):
 app = create_app()
 
 
+async def profile_startup(output: str = ""):
+    """Run the application startup once and report where the time went."""
+    async with lifespan(app):
+        pass
+    startup_profiler.log_report()
+    if output:
+        startup_profiler.write_report(output)
+
+
 def main():
     """Run the FastAPI application."""
+    parser = argparse.ArgumentParser(description=settings.app_name)
+    parser.add_argument(
+        "--profile-startup",
+        action="store_true",
+        help="Run startup once, report import and init time per module, and exit",
+    )
+    parser.add_argument(
+        "--profile-output", default="", help="Write the startup profile as JSON"
+    )
+    args = parser.parse_args()
+
+    if args.profile_startup:
+        asyncio.run(profile_startup(args.profile_output))
+        return
+
     import uvicorn
 
     uvicorn.run(
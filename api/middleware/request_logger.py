@@ -3,31 +3,105 @@ Request logging middleware.
 """
 
 import time
-from fastapi import Request
-from starlette.middleware.base import BaseHTTPMiddleware
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
 from api.core.logging import logger
+from api.core.metrics import metrics
+
+http_requests = metrics.counter(
+    "nl2sql_http_requests_total", "HTTP requests by method, route and status"
+)
+http_time_to_first_byte = metrics.histogram(
+    "nl2sql_http_time_to_first_byte_seconds",
+    "Time from receiving a request to sending the first body byte",
+)
+http_response_duration = metrics.histogram(
+    "nl2sql_http_response_duration_seconds",
+    "Time from receiving a request to sending the last body byte",
+)
+http_response_bytes = metrics.counter(
+    "nl2sql_http_response_bytes_total", "Response body bytes sent"
+)
+http_client_disconnects = metrics.counter(
+    "nl2sql_http_client_disconnects_total",
+    "Responses cut short because the client went away",
+)
+
 
+class RequestLoggingMiddleware:
+    """
+    Middleware to log all incoming requests and their processing time.
 
-class RequestLoggingMiddleware(BaseHTTPMiddleware):
-    """Middleware to log all incoming requests and their processing time."""
+    Implemented as plain ASGI so streaming responses pass through untouched
+    and the timings cover the whole body, not just the headers.
+    """
 
-    async def dispatch(self, request: Request, call_next):
-        """Log request and response details."""
-        start_time = time.time()
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+        method, path = scope["method"], scope["path"]
+        status_code = 500
+        first_byte_time = None
+        bytes_sent = 0
+        complete = False
+        disconnected = False
 
         # Log request
-        logger.info(f"➡️  {request.method} {request.url.path}")
+        logger.info(f"➡️  {method} {path}")
+
+        async def receive_wrapper() -> Message:
+            nonlocal disconnected
+            message = await receive()
+            if message["type"] == "http.disconnect" and not complete:
+                disconnected = True
+            return message
 
-        # Process request
-        response = await call_next(request)
+        async def send_wrapper(message: Message):
+            nonlocal status_code, first_byte_time, bytes_sent, complete, disconnected
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers.append("X-Process-Time", str(time.perf_counter() - start_time))
+            elif message["type"] == "http.response.body":
+                body = message.get("body", b"")
+                if body and first_byte_time is None:
+                    first_byte_time = time.perf_counter()
+                bytes_sent += len(body)
+                if not message.get("more_body", False):
+                    complete = True
+            try:
+                await send(message)
+            except OSError:
+                disconnected = True
+                raise
 
-        # Log response time
-        process_time = time.time() - start_time
-        logger.info(
-            f"⬅️  {request.method} {request.url.path} "
-            f"- Status: {response.status_code} "
-            f"- Time: {process_time:.3f}s"
-        )
+        try:
+            await self.app(scope, receive_wrapper, send_wrapper)
+        finally:
+            end_time = time.perf_counter()
+            # Label by route template rather than raw path to bound cardinality
+            route = getattr(scope.get("route"), "path", "unmatched")
+            http_requests.inc(method=method, route=route, status=status_code)
+            http_response_duration.observe(end_time - start_time, route=route)
+            if first_byte_time is not None:
+                http_time_to_first_byte.observe(first_byte_time - start_time, route=route)
+            http_response_bytes.inc(bytes_sent, route=route)
+            if disconnected:
+                http_client_disconnects.inc(route=route)
 
-        response.headers["X-Process-Time"] = str(process_time)
-        return response
+            # Log response time
+            logger.info(
+                f"⬅️  {method} {path} "
+                f"- Status: {status_code} "
+                f"- Time: {end_time - start_time:.3f}s "
+                f"- Bytes: {bytes_sent}"
+                + (" - Client disconnected" if disconnected else "")
+            )
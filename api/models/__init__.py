@@ -1,6 +1,21 @@
 """Data models and schemas."""
 
 from .responses import HealthResponse, InfoResponse, RootResponse
-from .chat import ChatRequest
+from .chat import (
+    BatchJobStatus,
+    BatchRequest,
+    ChatRequest,
+    ExampleFeedback,
+    ExampleFeedbackResponse,
+)
 
-__all__ = ["HealthResponse", "InfoResponse", "RootResponse", "ChatRequest"]
+__all__ = [
+    "HealthResponse",
+    "InfoResponse",
+    "RootResponse",
+    "ChatRequest",
+    "ExampleFeedback",
+    "ExampleFeedbackResponse",
+    "BatchRequest",
+    "BatchJobStatus",
+]
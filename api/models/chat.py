@@ -2,6 +2,8 @@
 Chat models for chatbot endpoints.
 """
 
+from typing import Any, Literal, Optional
+
 from pydantic import BaseModel, Field
 
 
@@ -13,6 +15,15 @@ class ChatRequest(BaseModel):
         default="gpt-4o-mini", description="Model to use for the chat response"
     )
     chat_id: str = Field(..., description="Chat ID", min_length=1)
+    mode: Literal["agent", "direct", "direct_rows"] = Field(
+        default="agent",
+        description=(
+            "agent: multi-step tool-calling agent. direct: one LLM call writes "
+            "the SQL, a second summarizes the result. direct_rows: like direct, "
+            "but returns the rows without a summary. Direct modes fall back to "
+            "the agent when the SQL is rejected or fails."
+        ),
+    )
 
 
 class QuerySuggestion(BaseModel):
@@ -29,7 +40,75 @@ class SuggestionsResponse(BaseModel):
     )
 
 
+class GeneratedSQL(BaseModel):
+    """Structured output of the direct SQL generation call."""
+
+    sql: str = Field(
+        description=(
+            "A single read-only SELECT query that answers the question, or an "
+            "empty string if the schema cannot answer it"
+        )
+    )
+
+
 class QueryInput(BaseModel):
     """Input model for query database tool."""
 
     question: str = Field(description="The user's data question in natural language")
+
+
+class ExampleFeedback(BaseModel):
+    """Feedback on the SQL behind an answer."""
+
+    example_id: str = Field(
+        ..., description="`example_id` from the final frame of a chat response"
+    )
+    good: bool = Field(
+        ..., description="Whether the answer was correct; good queries become examples"
+    )
+
+
+class ExampleFeedbackResponse(BaseModel):
+    """Outcome of example feedback."""
+
+    stored: bool = Field(description="Whether the query was stored as an example")
+    examples: int = Field(description="Number of examples in the store")
+
+
+class BatchRequest(BaseModel):
+    """Request model for the batch chat endpoint."""
+
+    questions: list[str] = Field(
+        ..., description="Questions to answer", min_length=1
+    )
+    model: str = Field(
+        default="gpt-4o-mini", description="Model to use for every question"
+    )
+    concurrency: Optional[int] = Field(
+        default=None,
+        description="Questions answered at once, capped by the server limit",
+        ge=1,
+    )
+    stream: bool = Field(
+        default=True,
+        description="Stream results as NDJSON; otherwise return the job status at once",
+    )
+
+
+class BatchJobStatus(BaseModel):
+    """Progress of a batch job."""
+
+    job_id: str = Field(description="Batch job ID")
+    status: str = Field(description="pending, running, completed, failed or cancelled")
+    model: str = Field(description="Model used for every question")
+    total: int = Field(description="Number of questions submitted")
+    unique: int = Field(description="Number of distinct questions run")
+    completed: int = Field(description="Questions with a result so far")
+    failed: int = Field(description="Questions whose run failed, counting each duplicate")
+    created_at: float = Field(description="Submission time (Unix seconds)")
+    finished_at: Optional[float] = Field(
+        default=None, description="Completion time (Unix seconds)"
+    )
+    results: Optional[list[dict[str, Any]]] = Field(
+        default=None, description="Results in completion order, if requested"
+    )
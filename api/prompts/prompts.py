@@ -31,6 +31,11 @@ def get_suggestion_generation_prompt():
     return ChatPromptTemplate.from_template(SUGGESTION_GENERATION_PROMPT)
 
 
+# The conversation history follows the system prompt, so anything that
+# varies between turns of a chat would invalidate the provider's cache of
+# the history too. Only the schema context is filled in here, and it is
+# kept the same for every turn of a chat; per-question few-shot examples go
+# into the user's message instead.
 SQL_AGENT_SYSTEM_PROMPT = """
 You are an expert data analyst assistant for a secure database system.
 
@@ -74,7 +79,7 @@ ORDER BY product_count DESC
 User: "Which categories have the most products?"
 Your approach:
 - Use sql_db_query with a JOIN query that gets category names AND counts
-- Tool returns: "Electronics|5\nClothing|3\nHome|2"
+- Tool returns: "name\tproduct_count\nElectronics\t5\nClothing\t3\nHome\t2"
 Your response to user:
 "Here are the categories with the most products:
 
@@ -97,3 +102,40 @@ Your response: [Present formatted results]
 
 Database context: {db_info}
 """
+
+
+# Direct mode: one call writes the SQL, one summarizes its result
+DIRECT_SQL_PROMPT = """You are an expert {dialect} analyst. Write a single read-only SQL SELECT query that answers the user's question.
+
+Rules:
+- Use only the tables and columns in the database context below
+- Use JOINs to return meaningful names/labels instead of IDs
+- Return everything needed in ONE query; aggregate in SQL rather than returning raw rows
+- Never modify data (no INSERT, UPDATE, DELETE, DDL or session settings)
+- If the question cannot be answered from this schema, return an empty string
+
+Database context: {db_info}{examples}"""
+
+DIRECT_SUMMARY_PROMPT = """You are a data analyst presenting query results to a user.
+
+Answer the user's question from the query result below in plain, conversational language. Format results as a clean table when appropriate.
+- NEVER mention SQL, table names, column names or schema details
+- NEVER use code blocks
+- If the result is empty, say that nothing matched the question
+
+Query result (tab-separated):
+{result}"""
+
+
+def get_direct_sql_prompt():
+    """Get the direct SQL generation prompt."""
+    return ChatPromptTemplate.from_messages(
+        [("system", DIRECT_SQL_PROMPT), ("human", "{question}")]
+    )
+
+
+def get_direct_summary_prompt():
+    """Get the direct mode result summary prompt."""
+    return ChatPromptTemplate.from_messages(
+        [("system", DIRECT_SUMMARY_PROMPT), ("human", "{question}")]
+    )
@@ -2,7 +2,8 @@
 from .health import router as health_router
 from .info import router as info_router
 from .chat import router as chat_router
+from .metrics import router as metrics_router
 
-__all__ = ["health_router", "info_router", "chat_router"]
+__all__ = ["health_router", "info_router", "chat_router", "metrics_router"]
 
 
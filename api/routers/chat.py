@@ -2,38 +2,74 @@
 Chat router for chatbot interactions.
 """
 
-from fastapi import APIRouter
-from fastapi.responses import StreamingResponse
+import asyncio
+from typing import TYPE_CHECKING, Optional
 
-from api.models.chat import ChatRequest, SuggestionsResponse
-from api.services.ai_service import ai_service
-from api.services.suggestion_service import suggestion_service
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from api.core.config import settings
+from api.core.streaming import ClosingStreamingResponse
+from api.models.chat import (
+    BatchJobStatus,
+    BatchRequest,
+    ChatRequest,
+    ExampleFeedback,
+    ExampleFeedbackResponse,
+    SuggestionsResponse,
+)
+from api.services import (
+    get_admission_controller,
+    get_ai_service,
+    get_batch_service,
+    get_example_store,
+    get_suggestion_service,
+)
+
+if TYPE_CHECKING:
+    from api.services.admission import AdmissionController
+    from api.services.ai_service import AIService
+    from api.services.batch_service import BatchService
+    from api.services.example_store import ExampleStore
+    from api.services.suggestion_service import SuggestionService
 
 router = APIRouter(tags=["Chat"])
 
 
 @router.get("/chat/suggestions", response_model=SuggestionsResponse)
-async def get_suggestions():
+async def get_suggestions(
+    suggestion_service: "SuggestionService" = Depends(get_suggestion_service),
+):
     """
     Get query suggestions based on the database schema.
 
     Returns 5 interesting and useful query suggestions that users can ask.
     All suggestions are read-only SELECT queries (no mutations).
+    Suggestions are cached per schema version and refreshed in the background.
     """
-    suggestions = suggestion_service.generate_suggestions()
+    suggestions = await suggestion_service.get_suggestions()
     return SuggestionsResponse(suggestions=suggestions)
 
 
 @router.post("/chat")
-async def ai_chat_stream(request: ChatRequest):
+async def ai_chat_stream(
+    request: ChatRequest,
+    ai_service: "AIService" = Depends(get_ai_service),
+    admission_controller: "AdmissionController" = Depends(get_admission_controller),
+):
     """
     Stream chat responses from the AI.
 
     This endpoint streams the AI's response token by token as it's generated.
     Accepts a model parameter to specify which AI model to use.
+    Returns 429 while another message in the same chat is being answered,
+    and 503 when the server is at capacity, both with a Retry-After header.
+    The agent run is cancelled if the client disconnects.
     """
-    return StreamingResponse(
+    ticket = await admission_controller.acquire(request.chat_id)
+    return ClosingStreamingResponse(
         ai_service.stream_response(request),
+        on_close=ticket.release,
         media_type="text/event-stream",
         headers={
             "Cache-Control": "no-cache",
@@ -41,3 +77,94 @@ async def ai_chat_stream(request: ChatRequest):
             "X-Accel-Buffering": "no",  # Disable nginx buffering
         },
     )
+
+
+@router.post("/chat/feedback", response_model=ExampleFeedbackResponse)
+async def example_feedback(
+    feedback: ExampleFeedback,
+    example_store: Optional["ExampleStore"] = Depends(get_example_store),
+):
+    """
+    Mark the SQL behind an answer as good or bad.
+
+    Good queries are stored as few-shot examples for similar questions.
+    Returns 404 for unknown or already answered example IDs, or when
+    examples are disabled.
+    """
+    if example_store is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Examples are disabled"
+        )
+    if feedback.good:
+        # May embed the question and appends to the examples file
+        found = await asyncio.to_thread(example_store.confirm, feedback.example_id)
+    else:
+        found = example_store.reject(feedback.example_id)
+    if not found:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Example not found"
+        )
+    return ExampleFeedbackResponse(stored=feedback.good, examples=len(example_store))
+
+
+@router.post("/chat/batch", response_model=BatchJobStatus)
+async def ai_chat_batch(
+    request: BatchRequest,
+    batch_service: "BatchService" = Depends(get_batch_service),
+):
+    """
+    Answer many questions in one job.
+
+    Identical questions are answered once, and every question shares one
+    schema context. By default the results are streamed as NDJSON, one line
+    per question as it completes, with the job ID in the X-Batch-Job-Id
+    header. With `stream` false the job status is returned at once (202) and
+    the results are read from the job status endpoint.
+    The job keeps running if the client disconnects.
+    Returns 413 when the batch holds too many questions, and 503 with a
+    Retry-After header while too many batch jobs are running.
+    """
+    from api.services.batch_service import BatchBusy
+
+    try:
+        job = batch_service.submit(request.questions, request.model, request.concurrency)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_413_CONTENT_TOO_LARGE, detail=str(e)
+        )
+    except BatchBusy as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": str(settings.chat_retry_after_seconds)},
+        )
+    if not request.stream:
+        return JSONResponse(job.status_dict(), status_code=status.HTTP_202_ACCEPTED)
+    return StreamingResponse(
+        batch_service.stream(job),
+        media_type="application/x-ndjson",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+            "X-Batch-Job-Id": job.id,
+        },
+    )
+
+
+@router.get("/chat/batch/{job_id}", response_model=BatchJobStatus)
+async def get_batch_job(
+    job_id: str,
+    results: bool = False,
+    batch_service: "BatchService" = Depends(get_batch_service),
+):
+    """
+    Get the progress of a batch job, and its results so far if `results` is set.
+
+    Finished jobs are kept for a limited time; unknown jobs return 404.
+    """
+    job = batch_service.get(job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Batch job not found"
+        )
+    return job.status_dict(include_results=results)
@@ -1,10 +1,105 @@
-"""Business logic services."""
+"""Business logic services.
+
+Services are created lazily on first use (normally from the application
+lifespan) so that importing the API does not connect to the database or
+pull in LangChain.
+"""
+
+from functools import lru_cache
+from typing import TYPE_CHECKING, Optional
+
+from api.core.startup import startup_profiler
+
+if TYPE_CHECKING:
+    from .admission import AdmissionController
+    from .ai_service import AIService
+    from .batch_service import BatchService
+    from .database_service import DatabaseService
+    from .example_store import ExampleStore
+    from .suggestion_service import SuggestionService
+
+# Third-party packages that dominate import time, profiled individually
+HEAVY_MODULES = (
+    "sqlalchemy",
+    "langchain_core",
+    "langchain_openai",
+    "langchain_community.utilities.sql_database",
+    "langgraph",
+    "langchain.agents",
+)
+
+
+@lru_cache(maxsize=None)
+def get_database_service() -> "DatabaseService":
+    module = startup_profiler.import_module("api.services.database_service")
+    with startup_profiler.measure("init", "DatabaseService"):
+        return module.DatabaseService()
+
+
+@lru_cache(maxsize=None)
+def get_example_store() -> Optional["ExampleStore"]:
+    database_service = get_database_service()
+    module = startup_profiler.import_module("api.services.example_store")
+    with startup_profiler.measure("init", "ExampleStore"):
+        example_store = module.create_example_store(
+            database_service.db.dialect, verify=database_service.check_plan
+        )
+    if example_store is not None:
+        database_service.subscribe(example_store.invalidate)
+    return example_store
+
+
+@lru_cache(maxsize=None)
+def get_ai_service() -> "AIService":
+    database_service = get_database_service()
+    example_store = get_example_store()
+    module = startup_profiler.import_module("api.services.ai_service")
+    with startup_profiler.measure("init", "AIService"):
+        return module.AIService(database_service, example_store=example_store)
+
+
+@lru_cache(maxsize=None)
+def get_suggestion_service() -> "SuggestionService":
+    database_service = get_database_service()
+    module = startup_profiler.import_module("api.services.suggestion_service")
+    with startup_profiler.measure("init", "SuggestionService"):
+        return module.SuggestionService(database_service)
+
+
+@lru_cache(maxsize=None)
+def get_batch_service() -> "BatchService":
+    ai_service = get_ai_service()
+    admission_controller = get_admission_controller()
+    module = startup_profiler.import_module("api.services.batch_service")
+    with startup_profiler.measure("init", "BatchService"):
+        return module.BatchService(ai_service, admission_controller)
+
+
+@lru_cache(maxsize=None)
+def get_admission_controller() -> "AdmissionController":
+    from .admission import create_admission_controller
+
+    return create_admission_controller()
+
+
+def init_services():
+    """Create every service up front, e.g. during application startup."""
+    for name in HEAVY_MODULES:
+        startup_profiler.import_module(name)
+    get_database_service()
+    get_example_store()
+    get_ai_service()
+    get_suggestion_service()
+    get_batch_service()
+    get_admission_controller()
 
-from .suggestion_service import SuggestionService, suggestion_service
-from .ai_service import ai_service
 
 __all__ = [
-    "SuggestionService",
-    "suggestion_service",
-    "ai_service",
+    "get_database_service",
+    "get_example_store",
+    "get_ai_service",
+    "get_suggestion_service",
+    "get_batch_service",
+    "get_admission_controller",
+    "init_services",
 ]
@@ -0,0 +1,167 @@
+"""
+Admission control for agent runs.
+
+Bounds how many agent runs execute at once, globally and per chat_id, and
+how many may wait for a slot, so overload turns into fast 429/503
+responses instead of ever-growing latency. Batch questions take the same
+global slots, so a batch job cannot push the server past its limit.
+"""
+
+import asyncio
+from typing import Optional
+
+from fastapi import HTTPException, status
+
+from api.core.config import settings
+from api.core.metrics import metrics
+
+admission_rejections = metrics.counter(
+    "nl2sql_admission_rejections_total", "Chat requests rejected, by reason"
+)
+admission_wait_seconds = metrics.histogram(
+    "nl2sql_admission_wait_seconds", "Time chat requests waited for a run slot"
+)
+
+
+class AdmissionTicket:
+    """A granted run slot. Releasing it more than once is a no-op."""
+
+    def __init__(self, controller: "AdmissionController", chat_id: Optional[str]):
+        self._controller = controller
+        self._chat_id = chat_id
+        self._released = False
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self._controller._release(self._chat_id)
+
+
+class AdmissionController:
+    """
+    Hands out run slots.
+
+    A chat that already has `max_per_chat` runs in flight is rejected with
+    429. When all `max_concurrent` slots are busy, up to `max_queued`
+    requests wait for one for at most `queue_timeout` seconds; beyond that
+    requests are rejected with 503. Both carry a Retry-After header.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int,
+        max_queued: int,
+        queue_timeout: float,
+        max_per_chat: int,
+        retry_after: int,
+    ):
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout
+        self.max_per_chat = max_per_chat
+        self.retry_after = retry_after
+        self.active = 0
+        self.queued = 0
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._per_chat: dict[str, int] = {}
+        metrics.gauge(
+            "nl2sql_admission_active_runs",
+            "Agent runs currently holding a slot",
+            callback=lambda: self.active,
+        )
+        metrics.gauge(
+            "nl2sql_admission_queued_runs",
+            "Chat requests waiting for a slot",
+            callback=lambda: self.queued,
+        )
+
+    def _reject(self, status_code: int, reason: str, detail: str):
+        admission_rejections.inc(reason=reason)
+        raise HTTPException(
+            status_code=status_code,
+            detail=detail,
+            headers={"Retry-After": str(self.retry_after)},
+        )
+
+    def _get_slots(self) -> asyncio.Semaphore:
+        if self._slots is None:
+            # Created lazily so it binds to the serving event loop
+            self._slots = asyncio.Semaphore(self.max_concurrent)
+        return self._slots
+
+    async def acquire(self, chat_id: str) -> AdmissionTicket:
+        """Wait for a run slot for `chat_id`, or raise HTTPException."""
+        self._get_slots()
+
+        if self._per_chat.get(chat_id, 0) >= self.max_per_chat:
+            self._reject(
+                status.HTTP_429_TOO_MANY_REQUESTS,
+                "chat_busy",
+                "A previous message in this chat is still being answered",
+            )
+
+        if self._slots.locked():
+            if self.queued >= self.max_queued:
+                self._reject(
+                    status.HTTP_503_SERVICE_UNAVAILABLE,
+                    "queue_full",
+                    "Server is busy, please retry shortly",
+                )
+        # Reserve the chat slot before waiting so a second message for the
+        # same chat cannot queue up behind the first
+        self._per_chat[chat_id] = self._per_chat.get(chat_id, 0) + 1
+        self.queued += 1
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._release_chat(chat_id)
+            self._reject(
+                status.HTTP_503_SERVICE_UNAVAILABLE,
+                "queue_timeout",
+                "Server is busy, please retry shortly",
+            )
+        except BaseException:
+            self._release_chat(chat_id)
+            raise
+        finally:
+            self.queued -= 1
+            admission_wait_seconds.observe(loop.time() - started)
+
+        self.active += 1
+        return AdmissionTicket(self, chat_id)
+
+    async def acquire_background(self) -> AdmissionTicket:
+        """
+        Wait for a run slot for background work such as a batch question.
+
+        Background runs are never rejected and do not take queue places;
+        they wait for a global slot for as long as it takes.
+        """
+        await self._get_slots().acquire()
+        self.active += 1
+        return AdmissionTicket(self, None)
+
+    def _release_chat(self, chat_id: str):
+        remaining = self._per_chat.get(chat_id, 0) - 1
+        if remaining > 0:
+            self._per_chat[chat_id] = remaining
+        else:
+            self._per_chat.pop(chat_id, None)
+
+    def _release(self, chat_id: Optional[str]):
+        self.active -= 1
+        if chat_id is not None:
+            self._release_chat(chat_id)
+        self._slots.release()
+
+
+def create_admission_controller() -> AdmissionController:
+    return AdmissionController(
+        max_concurrent=settings.chat_max_concurrent_runs,
+        max_queued=settings.chat_max_queued_runs,
+        queue_timeout=settings.chat_queue_timeout_seconds,
+        max_per_chat=settings.chat_max_runs_per_chat,
+        retry_after=settings.chat_retry_after_seconds,
+    )
@@ -1,56 +1,265 @@
-import json
+import asyncio
+import threading
 import time
-from typing import AsyncIterator, Optional
+import uuid
+from dataclasses import dataclass
+from typing import AsyncIterator, Callable, Optional
 
 from langchain.agents import create_agent
-from langchain_core.messages import AIMessageChunk, ToolMessageChunk
+from langchain.agents.middleware import (
+    AgentMiddleware,
+    ModelRequest,
+    SummarizationMiddleware,
+    dynamic_prompt,
+)
+from langchain_core.messages import (
+    AIMessage,
+    AIMessageChunk,
+    HumanMessage,
+    RemoveMessage,
+    ToolMessageChunk,
+)
+from langchain_core.language_models import BaseChatModel
+from langgraph.checkpoint.base import BaseCheckpointSaver
 from langgraph.store.memory import InMemoryStore
-from langchain_openai import ChatOpenAI
 from langgraph.graph.state import CompiledStateGraph
 
 from api.core.config import settings
 from api.core.logging import logger
-from api.models.chat import ChatRequest
-from api.prompts.prompts import SQL_AGENT_SYSTEM_PROMPT
-from api.services.database_service import database_service
+from api.core.metrics import metrics
+from api.core.tracing import (
+    RequestTrace,
+    current_trace,
+    record_duration,
+    record_span,
+    span,
+)
+from api.models.chat import ChatRequest, GeneratedSQL
+from api.prompts.prompts import (
+    SQL_AGENT_SYSTEM_PROMPT,
+    get_direct_sql_prompt,
+    get_direct_summary_prompt,
+)
+from api.services.answer_cache import (
+    CachedAnswer,
+    answer_cache,
+    result_digest,
+)
+from api.services.callbacks import StageTimingHandler, TokenUsage
+from api.services.conversation import ThreadReaper, trim_history_middleware
+from api.services.database_service import DatabaseService
+from api.services.example_store import ExampleStore, format_examples
+from api.services.llm import get_llm_registry
+from api.services.sql_service import ExecutedQuery, capture_rows, executed_queries
+from api.services.sse import SSEEncoder, TokenBuffer, ToolResultOrder, with_timeouts
+
+
+agent_cache_hits = metrics.counter(
+    "nl2sql_agent_cache_hits_total", "Compiled agent cache hits"
+)
+agent_cache_misses = metrics.counter(
+    "nl2sql_agent_cache_misses_total", "Compiled agent cache misses"
+)
+agent_runs_cancelled = metrics.counter(
+    "nl2sql_agent_runs_cancelled_total",
+    "Agent runs stopped early because the client disconnected",
+)
+agent_iterations = metrics.histogram(
+    "nl2sql_agent_iterations",
+    "LLM calls per agent run, by whether few-shot examples were in the prompt",
+    buckets=(1, 2, 3, 4, 5, 6, 8, 10, 15, 20),
+)
+direct_sql_runs = metrics.counter(
+    "nl2sql_direct_sql_total",
+    "Direct mode outcomes (answered, or no_sql/rejected/failed and the agent answered)",
+)
+
+
+@dataclass
+class AgentContext:
+    """Per-run context passed to the compiled agent."""
+
+    db_info: str
+
+
+@dynamic_prompt
+def sql_agent_prompt(request: ModelRequest) -> str:
+    """Build the system prompt from the schema selected for this run."""
+    return SQL_AGENT_SYSTEM_PROMPT.format(db_info=request.runtime.context.db_info)
 
 
 class AIService:
     ALLOWED_MODELS = ["gpt-4o", "gpt-4o-mini", "gpt-3.5-turbo"]
 
-    def __init__(self):
-        self.agent: Optional[CompiledStateGraph] = None
+    def __init__(
+        self,
+        database_service: DatabaseService,
+        llm_factory: Optional[Callable[..., BaseChatModel]] = None,
+        example_store: Optional[ExampleStore] = None,
+    ):
+        self.database_service = database_service
+        self.example_store = example_store
+        # Builds the agent's chat model; replaced by a fake in benchmarks
+        self.llm_factory = llm_factory or self._create_llm
         self.store = InMemoryStore()
+        self.checkpointer: Optional[BaseCheckpointSaver] = None
+        self.reaper: Optional[ThreadReaper] = None
+        self._agents: dict[tuple, CompiledStateGraph] = {}
+        # Chat models for the direct mode calls, per model name
+        self._llms: dict[str, BaseChatModel] = {}
+        # Token totals per chat_id, least recently used first
+        self._chat_usage: dict[str, TokenUsage] = {}
+        # Tables in the system prompt per chat_id, least recently used first
+        self._chat_tables: dict[str, frozenset[str]] = {}
+        self._agents_lock = threading.Lock()
+        metrics.gauge(
+            "nl2sql_agent_cache_size",
+            "Number of compiled agents held in the cache",
+            callback=lambda: len(self._agents),
+        )
+        metrics.gauge(
+            "nl2sql_conversation_threads",
+            "Conversation threads tracked for idle eviction by this worker",
+            callback=lambda: len(self.reaper) if self.reaper is not None else 0,
+        )
+        # Agents for older schema versions can never be hit again
+        database_service.subscribe(lambda version, changed: self.invalidate_agents())
 
         if not settings.openai_api_key:
             logger.warning(
                 "OpenAI API key not configured. Please set OPENAI_API_KEY in .env"
             )
 
-    def _get_agent(self, model: str):
-        """Get agent instance with specified model."""
-        if model not in self.ALLOWED_MODELS:
-            logger.warning(f"Invalid model {model}, using default")
-            model = settings.openai_model
+    def attach_checkpointer(self, checkpointer: Optional[BaseCheckpointSaver]):
+        """
+        Persist conversation state per chat_id in `checkpointer`.
+
+        Cached agents are dropped since the checkpointer is compiled into
+        the graph.
+        """
+        self.checkpointer = checkpointer
+        self.reaper = None
+        if checkpointer is not None and settings.conversation_ttl_seconds > 0:
+            self.reaper = ThreadReaper(checkpointer, settings.conversation_ttl_seconds)
+        self.invalidate_agents()
+
+    def _history_middleware(self) -> list[AgentMiddleware]:
+        """Middleware that keeps the conversation history within budget."""
+        if self.checkpointer is None:
+            return []
+        max_tokens = settings.conversation_max_history_tokens
+        if settings.conversation_history_strategy == "summarize":
+            summarizer = get_llm_registry().chat_model(
+                temperature=0,
+                streaming=False,
+                # Keep summary tokens out of the streamed answer
+                tags=["nostream"],
+            )
+            return [
+                SummarizationMiddleware(
+                    model=summarizer,
+                    trigger=("tokens", max_tokens),
+                    keep=("tokens", max_tokens // 2),
+                )
+            ]
+        return [trim_history_middleware(max_tokens)]
+
+    @staticmethod
+    def _create_llm(model: str, temperature: float, max_tokens: int) -> BaseChatModel:
+        return get_llm_registry().chat_model(
+            model, temperature=temperature, max_tokens=max_tokens
+        )
 
-        llm = ChatOpenAI(
-            model=settings.openai_model,
-            temperature=settings.openai_temperature,
-            max_tokens=settings.openai_max_tokens,
-            openai_api_key=settings.openai_api_key,
-            streaming=True,
+    def _build_agent(self, model: str, temperature: float, max_tokens: int):
+        """Compile a new agent graph for the given model settings."""
+        llm = self.llm_factory(
+            model=model, temperature=temperature, max_tokens=max_tokens
         )
 
-        toolkit = database_service.get_toolkit()
-        db_info = database_service.get_db_info()
+        toolkit = self.database_service.get_toolkit()
 
         return create_agent(
             model=llm,
             tools=toolkit.get_tools(),
-            system_prompt=SQL_AGENT_SYSTEM_PROMPT.format(db_info=db_info),
+            middleware=[sql_agent_prompt, *self._history_middleware()],
+            context_schema=AgentContext,
+            checkpointer=self.checkpointer,
             store=self.store,
         )
 
+    def _resolve_model(self, model: str) -> str:
+        if model not in self.ALLOWED_MODELS:
+            logger.warning(f"Invalid model {model}, using default")
+            model = settings.openai_model
+        return model
+
+    def _get_llm(self, model: str) -> BaseChatModel:
+        """Chat model for calls made outside the agent, shared per model."""
+        model = self._resolve_model(model)
+        llm = self._llms.get(model)
+        if llm is None:
+            llm = self._llms[model] = self.llm_factory(
+                model=model,
+                temperature=settings.openai_temperature,
+                max_tokens=settings.openai_max_tokens,
+            )
+        return llm
+
+    def _get_agent(self, model: str):
+        """
+        Get a compiled agent for the specified model.
+
+        Agents are cached by (model, temperature, max_tokens, schema version),
+        so a schema change transparently forces a rebuild.
+        """
+        model = self._resolve_model(model)
+
+        schema_version = self.database_service.schema_version
+        key = (
+            model,
+            settings.openai_temperature,
+            settings.openai_max_tokens,
+            schema_version,
+        )
+
+        agent = self._agents.get(key)
+        if agent is not None:
+            agent_cache_hits.inc()
+            return agent
+
+        with self._agents_lock:
+            agent = self._agents.get(key)
+            if agent is not None:
+                agent_cache_hits.inc()
+                return agent
+
+            agent_cache_misses.inc()
+            # Agents compiled against an older schema can never be hit again
+            self._agents = {
+                cached_key: cached_agent
+                for cached_key, cached_agent in self._agents.items()
+                if cached_key[3] == schema_version
+            }
+            agent = self._build_agent(
+                model, settings.openai_temperature, settings.openai_max_tokens
+            )
+            self._agents[key] = agent
+            logger.info(f"Compiled agent for {model} (schema v{schema_version})")
+            return agent
+
+    def warm_up(self):
+        """Pre-compile the default agent and load the schema it is prompted with."""
+        try:
+            self._get_agent(settings.openai_model)
+            self.database_service.get_db_info()
+        except Exception as e:
+            logger.error(f"Error warming up agent cache: {str(e)}")
+
+    def invalidate_agents(self):
+        """Drop every cached agent."""
+        with self._agents_lock:
+            self._agents = {}
+
     @staticmethod
     async def _parse_model_content(chunk: AIMessageChunk) -> str:
         """Parse model content and return the text."""
@@ -78,6 +287,12 @@ class AIService:
             "done": False,
         }
 
+    async def _encode_tool(self, encoder: SSEEncoder, chunk: ToolMessageChunk) -> bytes:
+        tool_data = await self._parse_tool_content(chunk)
+        return encoder.tool(
+            tool_data["tool_name"], tool_data["token"], tool_data["tool_call_id"]
+        )
+
     @staticmethod
     def _is_tool_message(chunk: ToolMessageChunk) -> bool:
         """
@@ -88,31 +303,407 @@ class AIService:
             return True
         return False
 
-    async def stream_response(self, request: ChatRequest) -> AsyncIterator[str]:
+    async def _record_exchange(
+        self, agent: CompiledStateGraph, config: dict, question: str, answer: str
+    ):
+        """Add a question answered without the agent to the conversation."""
+        if self.checkpointer is None:
+            return
+        await agent.aupdate_state(
+            config,
+            {"messages": [HumanMessage(content=question), AIMessage(content=answer)]},
+            as_node="model",
+        )
+
+    def _add_chat_usage(self, chat_id: str, usage: TokenUsage) -> TokenUsage:
+        """Add `usage` to the token totals of `chat_id` and return them."""
+        totals = self._chat_usage.pop(chat_id, None) or TokenUsage()
+        totals.add(usage)
+        self._chat_usage[chat_id] = totals
+        while len(self._chat_usage) > settings.usage_max_chats:
+            self._chat_usage.pop(next(iter(self._chat_usage)))
+        return totals
+
+    async def _get_chat_db_info(self, chat_id: str, question: str, new_thread: bool) -> str:
+        """
+        Schema context for a turn of `chat_id`.
+
+        The system prompt precedes the conversation history, so follow-up
+        turns keep the tables of the earlier turns (or switch to the full
+        schema once) instead of changing the prompt with every question.
+        """
+        pinned = None
+        if not new_thread:
+            pinned = self._chat_tables.pop(chat_id, None)
+            if pinned is None:
+                # Earlier turns were answered by another worker or from the
+                # answer cache, so their schema context is unknown
+                pinned = frozenset(self.database_service.get_usable_tables())
+        db_info, tables = await self.database_service.get_relevant_db_info(
+            question, pinned
+        )
+        self._chat_tables[chat_id] = tables
+        while len(self._chat_tables) > settings.usage_max_chats:
+            self._chat_tables.pop(next(iter(self._chat_tables)))
+        return db_info
+
+    async def _is_new_thread(self, config: dict) -> bool:
+        """Whether the thread in `config` has no stored conversation yet."""
+        if self.checkpointer is None:
+            return True
+        return await self.checkpointer.aget_tuple(config) is None
+
+    async def _replay_cached_answer(
+        self, encoder: SSEEncoder, cached: CachedAnswer, **done_fields
+    ) -> Optional[list[bytes]]:
+        """
+        Build the SSE frames for a cached answer.
+
+        In "rerun" mode the cached SQL is executed again and the answer is
+        only replayed if the result is unchanged; otherwise None is returned
+        and the caller falls back to the full agent.
+        """
+        result = cached.result
+        if settings.answer_cache_mode == "rerun":
+            result = await self.database_service.get_query_tool().ainvoke(
+                {"query": cached.sql}
+            )
+            if result_digest(result) != cached.digest:
+                answer_cache.discard(cached)
+                return None
+
+        return [
+            encoder.tool("sql_db_query", result, f"cached-{uuid.uuid4().hex}"),
+            encoder.token(cached.answer),
+            encoder.done(cached=True, **done_fields),
+        ]
+
+    async def _get_examples(self, question: str) -> str:
+        """Few-shot examples for `question`, formatted to follow the question."""
+        if self.example_store is None:
+            return ""
+        with span("examples"):
+            examples = await self.example_store.asearch(question, settings.examples_top_k)
+        return format_examples(examples)
+
+    def _propose_example(self, question: str, sql: str) -> dict:
+        """Done frame fields that let the client confirm `sql` as an example."""
+        if self.example_store is None:
+            return {}
+        return {"example_id": self.example_store.propose(question, sql)}
+
+    async def _direct_query(
+        self, question: str, model: str, db_info: str, examples: str, callbacks: list
+    ) -> Optional[ExecutedQuery]:
+        """
+        Write SQL for `question` in one structured LLM call and run it.
+
+        Returns the executed query and its result, or None when the agent
+        should answer instead: no SQL was written, or it was rejected or
+        failed.
+        """
+        chain = get_direct_sql_prompt() | self._get_llm(model).with_structured_output(
+            GeneratedSQL
+        )
         try:
-            agent = self._get_agent(request.model)
+            generated = await chain.ainvoke(
+                {
+                    "dialect": self.database_service.db.dialect,
+                    "db_info": db_info,
+                    "examples": examples,
+                    "question": question,
+                },
+                config={"callbacks": callbacks},
+            )
+        except Exception as e:
+            logger.warning(f"Direct SQL generation failed: {str(e)}")
+            direct_sql_runs.inc(outcome="failed")
+            return None
+        if not generated.sql.strip():
+            direct_sql_runs.inc(outcome="no_sql")
+            return None
+
+        query_tool = self.database_service.get_query_tool()
+        reason = query_tool.check(generated.sql)
+        if reason is not None:
+            logger.info(f"Direct SQL rejected, falling back to the agent: {reason}")
+            direct_sql_runs.inc(outcome="rejected")
+            return None
 
-            start_time = time.time()
-            async for event_tuple in agent.astream(
-                input={"messages": [{"role": "user", "content": request.message}]},
-                config={"configurable": {"thread_id": request.chat_id}},
+        # The query tool only records queries that ran successfully
+        queries = []
+        executed_queries.set(queries)
+        result = await query_tool.ainvoke({"query": generated.sql})
+        if not queries:
+            logger.info(f"Direct SQL failed, falling back to the agent: {result}")
+            direct_sql_runs.inc(outcome="failed")
+            return None
+        direct_sql_runs.inc(outcome="answered")
+        return queries[-1]
+
+    async def _summarize(
+        self, question: str, model: str, result: str, callbacks: list
+    ) -> AsyncIterator[str]:
+        """Stream a short answer to `question` from a query result."""
+        chain = get_direct_summary_prompt() | self._get_llm(model)
+        async for chunk in chain.astream(
+            {"question": question, "result": result}, config={"callbacks": callbacks}
+        ):
+            text = await self._parse_model_content(chunk)
+            if text:
+                yield text
+
+    async def answer(self, question: str, model: str, db_info: str) -> dict:
+        """
+        Run the agent to completion for a single question, without streaming
+        and without conversation memory.
+
+        Returns the answer text, the queries the agent executed with their
+        actual rows, the tokens used and the stage timings in milliseconds.
+        """
+        trace = RequestTrace("batch", model=model)
+        current_trace.set(trace)
+        queries = []
+        executed_queries.set(queries)
+        capture_rows.set(True)
+        # A throwaway thread, in case the agent is compiled with a checkpointer
+        thread_id = f"batch-{uuid.uuid4().hex}"
+        try:
+            with span("agent_build"):
+                agent = self._get_agent(model)
+            examples = await self._get_examples(question)
+            handler = StageTimingHandler(trace)
+            state = await agent.ainvoke(
+                input={"messages": [{"role": "user", "content": question + examples}]},
+                config={
+                    "configurable": {"thread_id": thread_id},
+                    "callbacks": [handler],
+                },
+                context=AgentContext(db_info=db_info),
+            )
+            agent_iterations.observe(
+                handler.llm_calls, examples="yes" if examples else "no"
+            )
+        finally:
+            trace.finish()
+            if self.checkpointer is not None:
+                await self.checkpointer.adelete_thread(thread_id)
+
+        final = state["messages"][-1]
+        return {
+            "answer": final.text,
+            "queries": queries,
+            "usage": handler.usage.as_dict(),
+            "timings_ms": {
+                stage: round(seconds * 1000, 1) for stage, seconds in trace.stages.items()
+            },
+        }
+
+    async def stream_response(self, request: ChatRequest) -> AsyncIterator[bytes]:
+        trace = RequestTrace("chat", model=request.model)
+        current_trace.set(trace)
+        encoder = SSEEncoder(request.model)
+        events = None
+        handler = None
+        completed = False
+        try:
+            config = {"configurable": {"thread_id": request.chat_id}}
+            if self.reaper is not None:
+                self.reaper.touch(request.chat_id)
+
+            with span("agent_build"):
+                agent = self._get_agent(request.model)
+            # Follow-up questions depend on the conversation, so only the
+            # first question of a thread is answered from or stored in the
+            # answer cache
+            new_thread = await self._is_new_thread(config)
+
+            if answer_cache is not None and new_thread:
+                with span("answer_cache"):
+                    cached = await answer_cache.alookup(request.message, request.model)
+                    frames = None
+                    if cached is not None:
+                        frames = await self._replay_cached_answer(
+                            encoder,
+                            cached,
+                            usage=TokenUsage().as_dict(),
+                            chat_usage=self._add_chat_usage(
+                                request.chat_id, TokenUsage()
+                            ).as_dict(),
+                        )
+                if frames is not None:
+                    # Record the exchange so follow-ups have context
+                    await self._record_exchange(
+                        agent, config, request.message, cached.answer
+                    )
+                    for frame in frames:
+                        yield frame
+                    return
+
+            with span("schema_context"):
+                db_info = await self._get_chat_db_info(
+                    request.chat_id, request.message, new_thread
+                )
+            examples = await self._get_examples(request.message)
+            handler = StageTimingHandler(trace)
+            # Tokens are sent in batches to cut per-frame encoding and writes
+            buffer = TokenBuffer(
+                settings.sse_coalesce_window_ms / 1000, settings.sse_coalesce_max_bytes
+            )
+
+            if request.mode != "agent":
+                with span("direct_sql"):
+                    executed = await self._direct_query(
+                        request.message, request.model, db_info, examples, [handler]
+                    )
+                if executed is not None:
+                    sql, result = executed.query, executed.result
+                    yield encoder.tool("sql_db_query", result, f"direct-{uuid.uuid4().hex}")
+                    answer = result
+                    if request.mode == "direct":
+                        parts = []
+                        async for text in self._summarize(
+                            request.message, request.model, result, [handler]
+                        ):
+                            if not parts:
+                                record_span("first_token", trace.started_at)
+                            parts.append(text)
+                            buffer.add(text)
+                            if len(parts) == 1 or buffer.full():
+                                yield encoder.token(buffer.flush())
+                        if buffer:
+                            yield encoder.token(buffer.flush())
+                        answer = "".join(parts)
+                        if answer_cache is not None and new_thread and answer.strip():
+                            await answer_cache.astore(
+                                CachedAnswer(
+                                    question=request.message,
+                                    sql=sql,
+                                    result=result,
+                                    answer=answer,
+                                    model=request.model,
+                                )
+                            )
+                    await self._record_exchange(agent, config, request.message, answer)
+                    completed = True
+                    yield encoder.done(
+                        mode=request.mode,
+                        llm_calls=handler.llm_calls,
+                        usage=handler.usage.as_dict(),
+                        chat_usage=self._add_chat_usage(
+                            request.chat_id, handler.usage
+                        ).as_dict(),
+                        **self._propose_example(request.message, sql),
+                    )
+                    return
+
+            queries = []
+            executed_queries.set(queries)
+            answer = []
+            serialize_seconds = 0.0
+            # Tool calls of a turn run concurrently; their results are sent
+            # in call order
+            tool_order = ToolResultOrder()
+
+            # Examples go with the question rather than in the system prompt,
+            # which has to stay the same for every turn of the chat
+            events = agent.astream(
+                input={
+                    "messages": [{"role": "user", "content": request.message + examples}]
+                },
+                config={**config, "callbacks": [handler]},
+                context=AgentContext(db_info=db_info),
                 stream_mode="messages",
-            ):
-                chunk, _ = event_tuple
-                if self._is_tool_message(chunk):
-                    tool_data = await self._parse_tool_content(chunk)
-                    yield f"data: {json.dumps(tool_data)}\n\n"
+            )
+            if buffer.window > 0:
+                # Wakes us up with None when buffered tokens are due
+                events = with_timeouts(events, buffer.remaining)
+
+            async for event_tuple in events:
+                serialize_start = time.perf_counter()
+                frames = []
+                if event_tuple is None:
+                    if buffer:
+                        frames.append(encoder.token(buffer.flush()))
                 else:
-                    text = await self._parse_model_content(chunk)
-                    yield f"data: {json.dumps({'token': text, 'done': False, 'model': request.model})}\n\n"
+                    chunk, _ = event_tuple
+                    if isinstance(chunk, RemoveMessage):
+                        # Emitted when history is trimmed, nothing to show
+                        continue
+                    if self._is_tool_message(chunk):
+                        if buffer:
+                            frames.append(encoder.token(buffer.flush()))
+                        for tool_chunk in tool_order.release(chunk.tool_call_id, chunk):
+                            frames.append(await self._encode_tool(encoder, tool_chunk))
+                    else:
+                        for tool_chunk in tool_order.message(chunk.id):
+                            frames.append(await self._encode_tool(encoder, tool_chunk))
+                        for call in getattr(chunk, "tool_call_chunks", None) or ():
+                            if call.get("id"):
+                                tool_order.expect(call["id"])
+                        text = await self._parse_model_content(chunk)
+                        if text:
+                            if not answer:
+                                record_span("first_token", trace.started_at)
+                            answer.append(text)
+                            buffer.add(text)
+                            # The first token is never held back
+                            if len(answer) == 1 or buffer.full():
+                                frames.append(encoder.token(buffer.flush()))
+                serialize_seconds += time.perf_counter() - serialize_start
+                for frame in frames:
+                    yield frame
+
+            if buffer:
+                yield encoder.token(buffer.flush())
+            for tool_chunk in tool_order.drain():
+                yield await self._encode_tool(encoder, tool_chunk)
+            record_duration("sse_serialize", serialize_seconds)
 
-            end_time = time.time()
-            logger.info(f"Time taken: {end_time - start_time} seconds")
+            if (
+                answer_cache is not None
+                and new_thread
+                and queries
+                and "".join(answer).strip()
+            ):
+                sql, result = queries[-1].query, queries[-1].result
+                await answer_cache.astore(
+                    CachedAnswer(
+                        question=request.message,
+                        sql=sql,
+                        result=result,
+                        answer="".join(answer),
+                        model=request.model,
+                    )
+                )
 
-            yield f"data: {json.dumps({'done': True, 'token': '', 'model': request.model})}\n\n"
+            agent_iterations.observe(
+                handler.llm_calls, examples="yes" if examples else "no"
+            )
+            # Set before the last frame, so its tokens are not counted twice
+            # if the client leaves while it is sent
+            completed = True
+            yield encoder.done(
+                mode="agent",
+                llm_calls=handler.llm_calls,
+                usage=handler.usage.as_dict(),
+                chat_usage=self._add_chat_usage(request.chat_id, handler.usage).as_dict(),
+                **(self._propose_example(request.message, queries[-1].query) if queries else {}),
+            )
+        except (asyncio.CancelledError, GeneratorExit):
+            agent_runs_cancelled.inc()
+            logger.info(f"Client disconnected, cancelling agent run for {request.chat_id}")
+            raise
         except Exception as e:
             logger.error(f"Error streaming AI service response: {str(e)}")
             raise
-
-
-ai_service = AIService()
+        finally:
+            if events is not None and not completed:
+                # Stop the agent run, its LLM request and any running SQL
+                # instead of letting them finish in the background
+                await events.aclose()
+            if handler is not None and not completed:
+                # Tokens of a cancelled or failed run were still used
+                self._add_chat_usage(request.chat_id, handler.usage)
+            trace.finish()
+            logger.info(f"Request timings: {trace.summary()}")
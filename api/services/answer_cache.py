@@ -0,0 +1,170 @@
+"""
+Question-level answer cache that lets repeated questions skip the agent loop.
+"""
+
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Optional
+
+from api.core.config import settings
+from api.core.logging import logger
+from api.core.metrics import metrics
+from api.services.embeddings import Embedder, cosine_similarity, get_embedder
+
+_PUNCTUATION_RE = re.compile(r"[^\w\s]")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+answer_cache_hits = metrics.counter(
+    "nl2sql_answer_cache_hits_total", "Answer cache hits, by match kind"
+)
+answer_cache_misses = metrics.counter(
+    "nl2sql_answer_cache_misses_total", "Answer cache misses"
+)
+answer_cache_stale = metrics.counter(
+    "nl2sql_answer_cache_stale_total",
+    "Answer cache hits discarded because re-running the SQL changed the result",
+)
+
+
+def normalize_question(question: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace."""
+    question = _PUNCTUATION_RE.sub(" ", question.lower())
+    return _WHITESPACE_RE.sub(" ", question).strip()
+
+
+def result_digest(result: str) -> str:
+    return hashlib.sha256(result.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class CachedAnswer:
+    """Final SQL and rendered answer for a previously answered question."""
+
+    question: str
+    sql: str
+    result: str
+    answer: str
+    model: str
+    digest: str = ""
+    vector: Optional[list[float]] = field(default=None, repr=False)
+    expires_at: float = 0.0
+
+    def __post_init__(self):
+        if not self.digest:
+            self.digest = result_digest(self.result)
+
+
+class AnswerCache:
+    """
+    Exact-match cache of answers, with optional embedding-similarity lookup.
+
+    Exact matches are keyed by model and normalized question, so an answer
+    is only served for the model that wrote it. When an embedder is
+    configured, a miss falls back to the most similar cached question for
+    the same model above `similarity_threshold`.
+    """
+
+    def __init__(
+        self,
+        embedder: Optional[Embedder] = None,
+        similarity_threshold: float = 0.92,
+        ttl: float = 3600.0,
+        max_entries: int = 512,
+    ):
+        self.embedder = embedder
+        self.similarity_threshold = similarity_threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: OrderedDict[tuple[str, str], CachedAnswer] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(question: str, model: str) -> tuple[str, str]:
+        return model, normalize_question(question)
+
+    def _get_exact(self, key: tuple[str, str]) -> Optional[CachedAnswer]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def _get_similar(self, vector: list[float], model: str) -> Optional[CachedAnswer]:
+        now = time.monotonic()
+        best, best_score = None, self.similarity_threshold
+        with self._lock:
+            for entry in self._entries.values():
+                if (
+                    entry.vector is None
+                    or entry.model != model
+                    or entry.expires_at < now
+                ):
+                    continue
+                score = cosine_similarity(vector, entry.vector)
+                if score >= best_score:
+                    best, best_score = entry, score
+        return best
+
+    async def alookup(self, question: str, model: str) -> Optional[CachedAnswer]:
+        """Find a cached answer to `question` by `model`, exact match first."""
+        entry = self._get_exact(self._key(question, model))
+        if entry is not None:
+            answer_cache_hits.inc(kind="exact")
+            return entry
+
+        if self.embedder is not None and self._entries:
+            entry = self._get_similar(await self.embedder.aembed(question), model)
+            if entry is not None:
+                answer_cache_hits.inc(kind="semantic")
+                return entry
+
+        answer_cache_misses.inc()
+        return None
+
+    async def astore(self, entry: CachedAnswer):
+        """Store an answer; the question is embedded if similarity is enabled."""
+        if self.embedder is not None and entry.vector is None:
+            entry.vector = await self.embedder.aembed(entry.question)
+        entry.expires_at = time.monotonic() + self.ttl
+        key = self._key(entry.question, entry.model)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def discard(self, entry: CachedAnswer):
+        """Drop an entry whose answer no longer matches the data."""
+        answer_cache_stale.inc()
+        with self._lock:
+            self._entries.pop(self._key(entry.question, entry.model), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        logger.info("Answer cache cleared")
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def _create_answer_cache() -> Optional[AnswerCache]:
+    if not settings.answer_cache_enabled:
+        return None
+    return AnswerCache(
+        embedder=get_embedder(settings.answer_cache_embedder),
+        similarity_threshold=settings.answer_cache_similarity_threshold,
+        ttl=settings.answer_cache_ttl_seconds,
+        max_entries=settings.answer_cache_max_entries,
+    )
+
+
+answer_cache = _create_answer_cache()
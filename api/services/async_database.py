@@ -0,0 +1,141 @@
+"""
+Async SQL execution over a pooled SQLAlchemy asyncio engine.
+"""
+
+import asyncio
+import time
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+from api.core.logging import logger
+from api.core.metrics import metrics
+from api.core.tracing import record_span
+from api.services.query_guard import QueryGuard
+from api.services.result_encoder import FETCH_BATCH_SIZE, RawResult, aencode_rows
+
+queries_cancelled = metrics.counter(
+    "nl2sql_db_queries_cancelled_total",
+    "Running queries cancelled on the server because their request went away",
+)
+
+
+class AsyncDatabase:
+    """
+    Runs agent queries without blocking the event loop.
+
+    Queries go through a bounded connection pool and are executed inside a
+    transaction with a per-statement timeout, on PostgreSQL read-only and
+    after an optional EXPLAIN pre-flight. When the awaiting task is
+    cancelled (e.g. the client disconnected), the running statement is
+    cancelled on the server with pg_cancel_backend.
+    """
+
+    def __init__(
+        self,
+        uri: str,
+        pool_size: int = 10,
+        max_overflow: int = 10,
+        pool_timeout: float = 30.0,
+        statement_timeout_ms: int = 30000,
+        read_only: bool = True,
+        guard: Optional[QueryGuard] = None,
+    ):
+        self.statement_timeout_ms = statement_timeout_ms
+        self.guard = guard
+        engine_args = {}
+        if read_only and make_url(uri).get_backend_name() == "postgresql":
+            # Applied when the connection is opened, so it costs no round trip
+            engine_args["connect_args"] = {
+                "server_settings": {"default_transaction_read_only": "on"}
+            }
+        self.engine: AsyncEngine = create_async_engine(
+            uri,
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_timeout=pool_timeout,
+            pool_pre_ping=True,
+            **engine_args,
+        )
+
+    @property
+    def dialect(self) -> str:
+        return self.engine.dialect.name
+
+    async def run(
+        self,
+        query: str,
+        timeout_ms: Optional[int] = None,
+        raw: Optional[RawResult] = None,
+    ) -> str:
+        """
+        Execute a query and return its rows as capped TSV.
+
+        Rows are streamed from a server-side cursor, so only the encoded
+        output is ever held in memory, unless `raw` is given to collect the
+        unencoded rows too.
+        """
+        timeout_ms = timeout_ms or self.statement_timeout_ms
+
+        start = time.perf_counter()
+        async with self.engine.connect() as connection:
+            backend_pid = await self._backend_pid(connection)
+            async with connection.begin():
+                record_span("db_acquire", start)
+                try:
+                    return await self._stream(connection, query, timeout_ms, raw)
+                except asyncio.CancelledError:
+                    # Stop the statement before the rollback waits on it
+                    if backend_pid is not None:
+                        await asyncio.shield(self._cancel_backend(backend_pid))
+                    raise
+
+    async def _stream(
+        self, connection, query: str, timeout_ms: int, raw: Optional[RawResult]
+    ) -> str:
+        start = time.perf_counter()
+        if self.dialect == "postgresql":
+            await connection.exec_driver_sql(
+                f"SET LOCAL statement_timeout = {int(timeout_ms)}"
+            )
+            if self.guard is not None:
+                await self.guard.acheck(connection, query)
+                start = time.perf_counter()
+        result = await connection.stream(
+            text(query),
+            execution_options={"max_row_buffer": FETCH_BATCH_SIZE},
+        )
+        record_span("db_execute", start)
+        start = time.perf_counter()
+        try:
+            return await aencode_rows(
+                list(result.keys()), result.partitions(FETCH_BATCH_SIZE), raw
+            )
+        finally:
+            await result.close()
+            record_span("db_fetch", start)
+
+    async def _backend_pid(self, connection) -> Optional[int]:
+        """Server process id of a PostgreSQL connection, without a round trip."""
+        if self.dialect != "postgresql":
+            return None
+        raw_connection = await connection.get_raw_connection()
+        get_server_pid = getattr(raw_connection.driver_connection, "get_server_pid", None)
+        return get_server_pid() if get_server_pid is not None else None
+
+    async def _cancel_backend(self, backend_pid: int):
+        try:
+            async with self.engine.connect() as connection:
+                await connection.execute(
+                    text("SELECT pg_cancel_backend(:pid)"), {"pid": backend_pid}
+                )
+            queries_cancelled.inc()
+        except Exception as e:
+            logger.error(f"Error cancelling query on backend {backend_pid}: {str(e)}")
+
+    async def dispose(self):
+        """Close every pooled connection."""
+        await self.engine.dispose()
+        logger.info("Async database pool disposed")
@@ -0,0 +1,237 @@
+"""
+Batch answering of many questions through the SQL agent.
+
+A job runs its distinct questions with bounded parallelism against one
+shared schema context and records a result per submitted question as soon
+as it is known. Results can be followed as NDJSON lines while the job runs
+and are kept for a while after it finishes for the status endpoint.
+"""
+
+import asyncio
+import json
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Optional
+
+from api.core.config import settings
+from api.core.logging import logger
+from api.core.metrics import metrics
+from api.services.admission import AdmissionController
+from api.services.ai_service import AIService
+from api.services.answer_cache import normalize_question
+
+batch_questions = metrics.counter(
+    "nl2sql_batch_questions_total",
+    "Batch questions answered, by outcome (ok, error, deduplicated)",
+)
+
+class BatchBusy(Exception):
+    """Raised instead of starting a job while too many jobs are running."""
+
+
+@dataclass
+class BatchJob:
+    id: str
+    questions: list[str]
+    model: str
+    concurrency: int
+    status: str = "pending"
+    created_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+    unique: int = 0
+    failed: int = 0
+    results: list[dict] = field(default_factory=list)
+    task: Optional[asyncio.Task] = None
+    _changed: asyncio.Event = field(default_factory=asyncio.Event)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("completed", "failed", "cancelled")
+
+    def add_result(self, result: dict):
+        self.results.append(result)
+        self._notify()
+
+    def finish(self, status: str):
+        self.status = status
+        self.finished_at = time.time()
+        self._notify()
+
+    def _notify(self):
+        # Wake every follower, then start a new round of waiting
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def follow(self) -> AsyncIterator[dict]:
+        """Yield results in completion order until the job has finished."""
+        sent = 0
+        while True:
+            changed = self._changed
+            while sent < len(self.results):
+                yield self.results[sent]
+                sent += 1
+            if self.finished:
+                return
+            await changed.wait()
+
+    def status_dict(self, include_results: bool = False) -> dict:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "model": self.model,
+            "total": len(self.questions),
+            "unique": self.unique,
+            "completed": len(self.results),
+            "failed": self.failed,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+            "results": list(self.results) if include_results else None,
+        }
+
+
+class BatchService:
+    """Runs batch jobs and keeps recent ones for status lookups."""
+
+    def __init__(self, ai_service: AIService, admission_controller: AdmissionController):
+        self.ai_service = ai_service
+        self.admission_controller = admission_controller
+        self._jobs: dict[str, BatchJob] = {}
+
+    def submit(
+        self, questions: list[str], model: str, concurrency: Optional[int] = None
+    ) -> BatchJob:
+        """
+        Start a job in the background and return it.
+
+        Raises ValueError for too many questions and BatchBusy while
+        `batch_max_running_jobs` jobs are unfinished.
+        """
+        if len(questions) > settings.batch_max_questions:
+            raise ValueError(
+                f"A batch may hold at most {settings.batch_max_questions} questions"
+            )
+        self._evict()
+        running = sum(1 for job in self._jobs.values() if not job.finished)
+        if running >= settings.batch_max_running_jobs:
+            raise BatchBusy(f"{running} batch jobs are already running")
+        limit = settings.batch_max_concurrency
+        job = BatchJob(
+            id=uuid.uuid4().hex,
+            questions=list(questions),
+            model=model,
+            concurrency=min(concurrency or limit, limit),
+        )
+        self._jobs[job.id] = job
+        job.task = asyncio.create_task(self.run(job))
+        return job
+
+    def get(self, job_id: str) -> Optional[BatchJob]:
+        return self._jobs.get(job_id)
+
+    async def run(self, job: BatchJob):
+        """Answer every question of `job`, recording results as they complete."""
+        job.status = "running"
+        # Identical questions are answered once and reported for each index
+        groups: dict[str, list[int]] = {}
+        for index, question in enumerate(job.questions):
+            groups.setdefault(normalize_question(question), []).append(index)
+        job.unique = len(groups)
+
+        try:
+            db_info = await self.ai_service.database_service.get_shared_db_info(
+                [job.questions[indexes[0]] for indexes in groups.values()]
+            )
+            semaphore = asyncio.Semaphore(job.concurrency)
+
+            async def answer(indexes: list[int]):
+                async with semaphore:
+                    # Batch questions share the global run slots with chat runs
+                    ticket = await self.admission_controller.acquire_background()
+                    try:
+                        result = await self._answer(
+                            job, job.questions[indexes[0]], db_info
+                        )
+                    finally:
+                        ticket.release()
+                for position, index in enumerate(indexes):
+                    if result["error"]:
+                        job.failed += 1
+                    job.add_result(
+                        {
+                            "index": index,
+                            "question": job.questions[index],
+                            **result,
+                            "deduplicated": position > 0,
+                        }
+                    )
+                    batch_questions.inc(
+                        outcome="deduplicated"
+                        if position
+                        else ("error" if result["error"] else "ok")
+                    )
+
+            await asyncio.gather(*(answer(indexes) for indexes in groups.values()))
+            job.finish("completed")
+        except asyncio.CancelledError:
+            job.finish("cancelled")
+            raise
+        except Exception as e:
+            logger.error(f"Batch job {job.id} failed: {str(e)}")
+            job.finish("failed")
+
+    async def _answer(self, job: BatchJob, question: str, db_info: str) -> dict:
+        start = time.perf_counter()
+        result = {
+            "sql": None,
+            "columns": [],
+            "rows": [],
+            "truncated": False,
+            "answer": "",
+            "error": None,
+            "usage": {},
+            "timings_ms": {},
+        }
+        try:
+            outcome = await self.ai_service.answer(question, job.model, db_info)
+        except Exception as e:
+            logger.error(f"Batch job {job.id} question failed: {str(e)}")
+            result["error"] = str(e)
+        else:
+            result["answer"] = outcome["answer"]
+            result["usage"] = outcome["usage"]
+            result["timings_ms"] = outcome["timings_ms"]
+            if outcome["queries"]:
+                executed = outcome["queries"][-1]
+                result["sql"] = executed.query
+                # The actual values, not the escaped and capped text the
+                # model saw; SQL NULL is None
+                if executed.raw is not None:
+                    result["columns"] = executed.raw.columns
+                    result["rows"] = executed.raw.rows
+                    result["truncated"] = executed.raw.truncated
+        result["timings_ms"]["total"] = round((time.perf_counter() - start) * 1000, 1)
+        return result
+
+    async def stream(self, job: BatchJob) -> AsyncIterator[bytes]:
+        """Results of `job` as NDJSON lines. Stopping early does not stop the job."""
+        async for result in job.follow():
+            yield json.dumps(result, default=str).encode("utf-8") + b"\n"
+
+    def _evict(self):
+        """Drop finished jobs past their TTL, then the oldest beyond the cap."""
+        now = time.time()
+        for job_id, job in list(self._jobs.items()):
+            if job.finished and now - job.finished_at > settings.batch_job_ttl_seconds:
+                del self._jobs[job_id]
+        finished = [job for job in self._jobs.values() if job.finished]
+        excess = len(self._jobs) - settings.batch_max_jobs + 1
+        for job in sorted(finished, key=lambda job: job.finished_at)[: max(excess, 0)]:
+            del self._jobs[job.id]
+
+    async def shutdown(self):
+        """Cancel running jobs."""
+        tasks = [job.task for job in self._jobs.values() if job.task and not job.task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
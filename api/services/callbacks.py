@@ -0,0 +1,132 @@
+"""
+LangChain callbacks that time LLM and tool calls of an agent run and add
+up the tokens it used.
+"""
+
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from api.core.metrics import metrics
+from api.core.tracing import RequestTrace, record_span
+
+llm_tokens = metrics.counter(
+    "nl2sql_llm_tokens_total",
+    "LLM tokens used by chat and batch requests, by kind (prompt, completion, cached) and model",
+)
+
+
+@dataclass
+class TokenUsage:
+    """Tokens reported by the model, summed over LLM calls."""
+
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached_tokens: int = 0  # prompt tokens served from the provider's prompt cache
+
+    def add(self, other: "TokenUsage"):
+        self.prompt_tokens += other.prompt_tokens
+        self.completion_tokens += other.completion_tokens
+        self.cached_tokens += other.cached_tokens
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+def _response_usage(response) -> list[tuple[str, TokenUsage]]:
+    """(model, usage) of every generation in an LLM result that reports usage."""
+    usages = []
+    llm_output = getattr(response, "llm_output", None) or {}
+    for generations in getattr(response, "generations", None) or ():
+        for generation in generations:
+            message = getattr(generation, "message", None)
+            usage = getattr(message, "usage_metadata", None)
+            if not usage:
+                continue
+            model = (
+                message.response_metadata.get("model_name")
+                or llm_output.get("model_name")
+                or "unknown"
+            )
+            details = usage.get("input_token_details") or {}
+            usages.append(
+                (
+                    model,
+                    TokenUsage(
+                        prompt_tokens=usage.get("input_tokens") or 0,
+                        completion_tokens=usage.get("output_tokens") or 0,
+                        cached_tokens=details.get("cache_read") or 0,
+                    ),
+                )
+            )
+    return usages
+
+
+class StageTimingHandler(BaseCallbackHandler):
+    """
+    Records every LLM call (time to first token and total) and every tool
+    call of one agent run as stages of `trace`, counts the LLM calls and
+    sums the tokens they report in `usage`.
+    """
+
+    # Only cheap bookkeeping here, no need to hop to a thread
+    run_inline = True
+
+    def __init__(self, trace: Optional[RequestTrace] = None):
+        self.trace = trace
+        self.llm_calls = 0
+        self.usage = TokenUsage()
+        self._llm_starts: dict[UUID, float] = {}
+        self._first_token: set[UUID] = set()
+        self._tool_starts: dict[UUID, tuple[float, str]] = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, **kwargs: Any):
+        self.llm_calls += 1
+        self._llm_starts[run_id] = time.perf_counter()
+
+    def on_llm_start(self, serialized, prompts, *, run_id: UUID, **kwargs: Any):
+        self.llm_calls += 1
+        self._llm_starts[run_id] = time.perf_counter()
+
+    def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs: Any):
+        if run_id in self._first_token or run_id not in self._llm_starts:
+            return
+        self._first_token.add(run_id)
+        record_span("llm_first_token", self._llm_starts[run_id], trace=self.trace)
+
+    def on_llm_end(self, response, *, run_id: UUID, **kwargs: Any):
+        self._end_llm(run_id)
+        for model, usage in _response_usage(response):
+            self.usage.add(usage)
+            llm_tokens.inc(usage.prompt_tokens, kind="prompt", model=model)
+            llm_tokens.inc(usage.completion_tokens, kind="completion", model=model)
+            if usage.cached_tokens:
+                llm_tokens.inc(usage.cached_tokens, kind="cached", model=model)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any):
+        self._end_llm(run_id)
+
+    def _end_llm(self, run_id: UUID):
+        self._first_token.discard(run_id)
+        start = self._llm_starts.pop(run_id, None)
+        if start is not None:
+            record_span("llm", start, trace=self.trace)
+
+    def on_tool_start(self, serialized, input_str: str, *, run_id: UUID, **kwargs: Any):
+        name = (serialized or {}).get("name") or kwargs.get("name") or "unknown"
+        self._tool_starts[run_id] = (time.perf_counter(), name)
+
+    def on_tool_end(self, output, *, run_id: UUID, **kwargs: Any):
+        self._end_tool(run_id)
+
+    def on_tool_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any):
+        self._end_tool(run_id)
+
+    def _end_tool(self, run_id: UUID):
+        started = self._tool_starts.pop(run_id, None)
+        if started is not None:
+            start, name = started
+            record_span("tool", start, trace=self.trace, tool=name)
@@ -0,0 +1,191 @@
+"""
+Conversation memory: pluggable checkpointers, a token budget for the history
+sent to the model, and TTL eviction of idle threads.
+"""
+
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Any, AsyncIterator, Optional
+
+from langchain.agents.middleware import AgentMiddleware, AgentState, before_model
+from langchain_core.messages import HumanMessage, RemoveMessage
+from langchain_core.messages.utils import count_tokens_approximately, trim_messages
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.graph.message import REMOVE_ALL_MESSAGES
+from langgraph.runtime import Runtime
+
+from api.core.logging import logger
+from api.core.metrics import metrics
+
+DEFAULT_SQLITE_PATH = ".cache/checkpoints.sqlite"
+
+history_messages_trimmed = metrics.counter(
+    "nl2sql_conversation_messages_trimmed_total",
+    "Messages dropped from conversation history to stay within the token budget",
+)
+threads_evicted = metrics.counter(
+    "nl2sql_conversation_threads_evicted_total",
+    "Idle conversation threads deleted from the checkpointer",
+)
+
+
+@asynccontextmanager
+async def open_checkpointer(
+    backend: str, url: str = ""
+) -> AsyncIterator[Optional[BaseCheckpointSaver]]:
+    """
+    Open the checkpointer that stores per-thread agent state.
+
+    "memory" keeps threads in-process, "sqlite" in a local file (`url` is the
+    path) and "postgres" in a database shared by every worker (`url` is the
+    connection string). An empty backend disables conversation memory.
+    """
+    if not backend:
+        yield None
+    elif backend == "memory":
+        from langgraph.checkpoint.memory import InMemorySaver
+
+        yield InMemorySaver()
+    elif backend == "sqlite":
+        try:
+            from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+        except ImportError:
+            raise ImportError(
+                "langgraph-checkpoint-sqlite package not found, please install "
+                "with `pip install langgraph-checkpoint-sqlite`"
+            )
+        path = url or DEFAULT_SQLITE_PATH
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        async with AsyncSqliteSaver.from_conn_string(path) as saver:
+            await saver.setup()
+            yield saver
+    elif backend == "postgres":
+        try:
+            from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
+        except ImportError:
+            raise ImportError(
+                "langgraph-checkpoint-postgres package not found, please install "
+                "with `pip install langgraph-checkpoint-postgres`"
+            )
+        if not url:
+            raise ValueError("CHECKPOINTER_URL must be set for the postgres backend")
+        async with AsyncPostgresSaver.from_conn_string(url) as saver:
+            await saver.setup()
+            yield saver
+    else:
+        raise ValueError(f"Unknown checkpointer backend: {backend}")
+
+
+def trim_history_middleware(max_tokens: int) -> AgentMiddleware:
+    """
+    Keep the stored conversation within `max_tokens`.
+
+    The current turn (the latest user message and everything after it) is
+    never trimmed, so tool calls stay paired with their results. Older
+    turns are dropped whole, oldest first, and removed from the checkpoint
+    as well so the stored thread stays bounded too.
+    """
+
+    @before_model(name="TrimHistory")
+    def trim_history(state: AgentState, runtime: Runtime) -> Optional[dict[str, Any]]:
+        messages = state["messages"]
+        last_human = next(
+            (
+                index
+                for index in range(len(messages) - 1, -1, -1)
+                if isinstance(messages[index], HumanMessage)
+            ),
+            0,
+        )
+        history, current = messages[:last_human], messages[last_human:]
+        if not history:
+            return None
+
+        budget = max_tokens - count_tokens_approximately(current)
+        if count_tokens_approximately(history) <= budget:
+            return None
+
+        kept = []
+        if budget > 0:
+            kept = trim_messages(
+                history,
+                max_tokens=budget,
+                token_counter=count_tokens_approximately,
+                strategy="last",
+                start_on="human",
+            )
+        history_messages_trimmed.inc(len(history) - len(kept))
+        return {"messages": [RemoveMessage(id=REMOVE_ALL_MESSAGES), *kept, *current]}
+
+    return trim_history
+
+
+def _checkpoint_timestamp(checkpoint_tuple) -> float:
+    try:
+        return datetime.fromisoformat(checkpoint_tuple.checkpoint["ts"]).timestamp()
+    except (KeyError, TypeError, ValueError):
+        return 0.0
+
+
+class ThreadReaper:
+    """
+    Deletes conversation threads that have been idle for longer than `ttl`.
+
+    Threads are tracked as this worker serves them. Before a thread is
+    deleted its latest checkpoint is checked, so a thread that another
+    worker used more recently is kept.
+    """
+
+    def __init__(self, checkpointer: BaseCheckpointSaver, ttl: float):
+        self.checkpointer = checkpointer
+        self.ttl = ttl
+        self._last_seen: dict[str, float] = {}
+
+    def touch(self, thread_id: str):
+        self._last_seen[thread_id] = time.time()
+
+    def __len__(self) -> int:
+        return len(self._last_seen)
+
+    async def sweep(self) -> int:
+        """Delete expired threads. Returns the number deleted."""
+        cutoff = time.time() - self.ttl
+        evicted = 0
+        for thread_id, last_seen in list(self._last_seen.items()):
+            if last_seen >= cutoff:
+                continue
+            latest = await self.checkpointer.aget_tuple(
+                {"configurable": {"thread_id": thread_id}}
+            )
+            if latest is not None:
+                updated_at = _checkpoint_timestamp(latest)
+                if updated_at >= cutoff:
+                    self._last_seen[thread_id] = max(
+                        self._last_seen.get(thread_id, 0.0), updated_at
+                    )
+                    continue
+            # The thread may have been used again while we were awaiting
+            if self._last_seen.get(thread_id, 0.0) >= cutoff:
+                continue
+            await self.checkpointer.adelete_thread(thread_id)
+            self._last_seen.pop(thread_id, None)
+            evicted += 1
+
+        if evicted:
+            threads_evicted.inc(evicted)
+            logger.info(f"Evicted {evicted} idle conversation thread(s)")
+        return evicted
+
+    async def run(self, interval: float):
+        """Sweep every `interval` seconds until cancelled."""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.error(f"Error evicting idle conversation threads: {str(e)}")
@@ -1,13 +1,40 @@
-from typing import Optional
+import asyncio
+import threading
+from typing import Callable, Optional
 
-from langchain_openai import ChatOpenAI
+from sqlalchemy import text
+from sqlalchemy.engine import URL, make_url
 from api.core.config import settings
 from api.core.logging import logger
+from api.core.metrics import metrics
 from langchain_community.utilities.sql_database import SQLDatabase
 from langchain_community.agent_toolkits.sql.toolkit import SQLDatabaseToolkit
+from langchain_core.tools import BaseTool
 
+from api.services.answer_cache import answer_cache
+from api.services.async_database import AsyncDatabase
+from api.services.embeddings import get_embedder
+from api.services.llm import get_llm_registry
+from api.services.query_cache import query_cache
+from api.services.query_guard import QueryGuard
+from api.services.schema_cache import SchemaCache
+from api.services.schema_catalog import diff_fingerprints, fetch_table_fingerprints
+from api.services.schema_index import SchemaIndex, TableDoc, estimate_tokens
+from api.services.schema_snapshot import load_snapshot, save_snapshot
+from api.services.sql_database import SQLDatabaseAdapter
 from api.services.sql_service import CustomSQLDatabaseToolkit
 
+# Drivers used by the async engine, keyed by backend name
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+schema_prompt_tokens = metrics.counter(
+    "nl2sql_schema_prompt_tokens_total",
+    "Estimated schema tokens put in agent prompts, full schema vs pruned",
+)
+
 
 class DatabaseService:
     """Service for database operations."""
@@ -15,44 +42,369 @@ class DatabaseService:
     def __init__(self):
         self._db_info_cache = None
         self._usable_tables_cache = None
+        self._table_info_cache: dict[str, str] = {}
+        self._table_doc_cache: dict[str, TableDoc] = {}
+        self._table_fingerprints: Optional[dict[str, str]] = None
+        self._schema_index: Optional[SchemaIndex] = None
+        self._schema_lock = threading.RLock()
+        self._schema_listeners: list[Callable[[int, set[str]], None]] = []
+        self.schema_version = 0
         self.db: Optional[SQLDatabase] = None
+        self.database: Optional[SQLDatabaseAdapter] = None
+        self.async_db: Optional[AsyncDatabase] = None
+        self.query_guard: Optional[QueryGuard] = None
+        self.schema_cache: Optional[SchemaCache] = None
         self.toolkit: Optional[SQLDatabaseToolkit] = None
+        self._query_tool: Optional[BaseTool] = None
 
-        self.llm = ChatOpenAI(
-            model=settings.openai_model,
-            temperature=settings.openai_temperature,
-            max_tokens=settings.openai_max_tokens,
-            openai_api_key=settings.openai_api_key,
-            streaming=False,
-            max_retries=0,
+        self.llm = get_llm_registry().chat_model(
+            max_tokens=settings.openai_max_tokens, streaming=False
         )
 
         self._initialize_database()
+        self.schema_cache = SchemaCache(
+            self.database, sample_rows=settings.schema_tool_sample_rows
+        )
+        self.subscribe(self._invalidate_dependent_caches)
+        self.subscribe(self.schema_cache.invalidate)
+
+    @staticmethod
+    def _database_url(asynchronous: bool = False) -> URL:
+        """
+        URL of the queried database: `database_url` if set (e.g. a SQLite
+        fixture for benchmarks), otherwise PostgreSQL from the db_* settings.
+        """
+        if settings.database_url:
+            url = make_url(settings.database_url)
+        else:
+            url = URL.create(
+                "postgresql",
+                username=settings.db_user,
+                password=settings.db_password,
+                host=settings.db_host,
+                port=settings.db_port,
+                database=settings.db_name,
+            )
+        if asynchronous:
+            url = url.set(
+                drivername=ASYNC_DRIVERS.get(url.get_backend_name(), url.drivername)
+            )
+        return url
 
     def _initialize_database(self):
         """Initialize database connection and LangChain components."""
         try:
-            db_uri = f"postgresql://{settings.db_user}:{settings.db_password}@{settings.db_host}:{settings.db_port}/{settings.db_name}"
-            self.db = SQLDatabase.from_uri(db_uri)
+            url = self._database_url()
+            engine_args = {}
+            guard = None
+            if url.get_backend_name() == "postgresql":
+                options = f"-c statement_timeout={settings.db_statement_timeout_ms}"
+                if settings.sql_read_only:
+                    options += " -c default_transaction_read_only=on"
+                engine_args["connect_args"] = {"options": options}
+                if settings.sql_preflight_enabled:
+                    guard = QueryGuard(
+                        settings.sql_preflight_max_cost, settings.sql_preflight_max_rows
+                    )
+            self.query_guard = guard
+            self.db = SQLDatabase.from_uri(
+                url.render_as_string(hide_password=False),
+                engine_args=engine_args,
+                # Tables are reflected on first use instead of all at startup
+                lazy_table_reflection=True,
+            )
+            # One lock for everything that reflects into or edits self.db's MetaData
+            self.database = SQLDatabaseAdapter(self.db, lock=self._schema_lock)
+            self.async_db = AsyncDatabase(
+                self._database_url(asynchronous=True).render_as_string(
+                    hide_password=False
+                ),
+                pool_size=settings.db_pool_size,
+                max_overflow=settings.db_pool_max_overflow,
+                pool_timeout=settings.db_pool_timeout,
+                statement_timeout_ms=settings.db_statement_timeout_ms,
+                read_only=settings.sql_read_only,
+                guard=guard,
+            )
+            self._table_fingerprints = fetch_table_fingerprints(
+                self.database.engine, settings.db_schema
+            )
+            self._load_schema_snapshot()
             logger.info(f"Database initialized successfully")
         except Exception as e:
             logger.error(f"Error initializing database service: {str(e)}")
             raise
 
+    def _snapshot_key(self) -> str:
+        url = self._database_url()
+        return f"{url.host}:{url.port}/{url.database}/{settings.db_schema}"
+
+    def _load_schema_snapshot(self):
+        """Seed the per-table caches from the on-disk snapshot, if usable."""
+        if not settings.schema_snapshot_path:
+            return
+        loaded = load_snapshot(
+            settings.schema_snapshot_path,
+            self._snapshot_key(),
+            self._table_fingerprints,
+        )
+        if loaded is None:
+            return
+        table_infos, table_docs = loaded
+        self._table_info_cache.update(table_infos)
+        self._table_doc_cache.update(table_docs)
+        logger.info(f"Loaded {len(table_infos)} table(s) from schema snapshot")
+
+    def _save_schema_snapshot(self):
+        if not settings.schema_snapshot_path:
+            return
+        save_snapshot(
+            settings.schema_snapshot_path,
+            self._snapshot_key(),
+            self._table_fingerprints or {},
+            self._table_info_cache,
+            self._table_doc_cache,
+        )
+
+    @staticmethod
+    def _build_table_doc(table) -> TableDoc:
+        return TableDoc(
+            name=table.name,
+            columns=[column.name for column in table.columns],
+            comment=table.comment or "",
+            column_comments=[
+                column.comment for column in table.columns if column.comment
+            ],
+            foreign_keys={fk.column.table.name for fk in table.foreign_keys},
+        )
+
+    def get_table_infos(self) -> dict[str, str]:
+        """
+        DDL and sample rows for every usable table, keyed by table name.
+
+        Tables are reflected individually and only when missing from the
+        cache, so a schema change re-reflects just the altered tables.
+        Newly reflected tables are written back to the schema snapshot.
+        """
+        with self._schema_lock:
+            tables = self.get_usable_tables()
+            missing = [table for table in tables if table not in self._table_info_cache]
+            for table in missing:
+                self._table_info_cache[table] = self.database.table_info(table)
+                reflected = self.database.reflected(table)
+                if reflected is not None:
+                    self._table_doc_cache[table] = self._build_table_doc(reflected)
+            if missing:
+                self._save_schema_snapshot()
+            return {table: self._table_info_cache[table] for table in tables}
+
+    @staticmethod
+    def _format_db_info(table_names: list[str], table_infos: list[str]) -> str:
+        return f"Tables: {', '.join(table_names)}\n\n" + "\n\n".join(table_infos)
+
     def get_db_info(self):
         if self._db_info_cache is None:
-            self._db_info_cache = self.db.get_context()
+            table_infos = self.get_table_infos()
+            self._db_info_cache = self._format_db_info(
+                list(table_infos), list(table_infos.values())
+            )
         return self._db_info_cache
 
+    def _get_schema_context(self) -> tuple[str, dict[str, str]]:
+        """The full schema context and the per-table infos it was built from."""
+        with self._schema_lock:
+            return self.get_db_info(), self.get_table_infos()
+
+    def get_schema_index(self) -> SchemaIndex:
+        if self._schema_index is None:
+            # Table docs are collected together with the table info
+            tables = self.get_table_infos()
+            self._schema_index = SchemaIndex(
+                [
+                    self._table_doc_cache[table]
+                    for table in tables
+                    if table in self._table_doc_cache
+                ],
+                embedder=get_embedder(settings.schema_embedder),
+            )
+        return self._schema_index
+
+    async def get_relevant_db_info(
+        self, question: str, pinned: Optional[frozenset[str]] = None
+    ) -> tuple[str, frozenset[str]]:
+        """
+        Schema context for a question: the names of all tables, plus DDL and
+        sample rows for the tables relevant to the question only.
+
+        Returns the context and the tables it describes. `pinned` are the
+        tables described for earlier turns of the same chat: they are kept
+        while they cover the question, so the system prompt stays the same
+        within a chat, and the full schema is used once they do not.
+        """
+        # Both take the schema lock and may reflect tables, so off the loop
+        db_info, table_infos = await asyncio.to_thread(self._get_schema_context)
+        all_tables = frozenset(table_infos)
+        full_tokens = estimate_tokens(db_info)
+        schema_prompt_tokens.inc(full_tokens, kind="full")
+
+        if (
+            not settings.schema_pruning_enabled
+            or len(table_infos) <= settings.schema_pruning_min_tables
+            or (pinned is not None and all_tables <= pinned)
+        ):
+            schema_prompt_tokens.inc(full_tokens, kind="pruned")
+            return db_info, all_tables
+
+        index = await asyncio.to_thread(self.get_schema_index)
+        relevant = frozenset(
+            await index.aselect(question, settings.schema_pruning_top_k)
+        )
+        if pinned is not None:
+            relevant = pinned if relevant <= pinned else all_tables
+        if not relevant or relevant >= all_tables:
+            schema_prompt_tokens.inc(full_tokens, kind="pruned")
+            return db_info, all_tables
+
+        # Selected tables in schema order rather than by score, so questions
+        # selecting the same tables get a byte-identical (cacheable) prompt
+        pruned = self._format_db_info(
+            list(table_infos),
+            [info for table, info in table_infos.items() if table in relevant],
+        )
+        schema_prompt_tokens.inc(estimate_tokens(pruned), kind="pruned")
+        logger.debug(
+            f"Schema pruned to {len(relevant)}/{len(table_infos)} tables "
+            f"({estimate_tokens(pruned)}/{full_tokens} tokens)"
+        )
+        return pruned, relevant
+
+    async def get_shared_db_info(self, questions: list[str]) -> str:
+        """
+        One schema context for a group of questions: the tables relevant to
+        any of them, so every run of a batch gets the same prompt.
+        """
+        # Both take the schema lock and may reflect tables, so off the loop
+        db_info, table_infos = await asyncio.to_thread(self._get_schema_context)
+        if (
+            not settings.schema_pruning_enabled
+            or len(table_infos) <= settings.schema_pruning_min_tables
+        ):
+            return db_info
+
+        index = await asyncio.to_thread(self.get_schema_index)
+        selections = await asyncio.gather(
+            *(index.aselect(question, settings.schema_pruning_top_k) for question in questions)
+        )
+        relevant = list(dict.fromkeys(table for tables in selections for table in tables))
+        if not relevant or any(not tables for tables in selections):
+            return db_info
+        return self._format_db_info(
+            list(table_infos),
+            [info for table, info in table_infos.items() if table in relevant],
+        )
+
     def get_usable_tables(self):
         if self._usable_tables_cache is None:
             self._usable_tables_cache = self.db.get_usable_table_names()
         return self._usable_tables_cache
 
+    def check_plan(self, query: str) -> Optional[str]:
+        """
+        Why `query` cannot be planned against the current schema, or None.
+
+        Runs a plain EXPLAIN, which resolves tables and columns without
+        executing the query.
+        """
+        try:
+            with self.database.engine.connect() as connection:
+                connection.execute(text(f"EXPLAIN {query}"))
+        except Exception as e:
+            return str(e).split("\n", 1)[0]
+        return None
+
+    def subscribe(self, listener: Callable[[int, set[str]], None]):
+        """
+        Register a callback fired on every schema version bump.
+
+        The listener receives the new version and the names of the tables
+        that changed.
+        """
+        self._schema_listeners.append(listener)
+
+    def _bump_schema_version(self, changed: set[str]):
+        self._db_info_cache = None
+        self._usable_tables_cache = None
+        self._schema_index = None
+        self.schema_version += 1
+        logger.info(
+            f"Schema version {self.schema_version}: {len(changed)} table(s) changed"
+        )
+        for listener in self._schema_listeners:
+            try:
+                listener(self.schema_version, changed)
+            except Exception as e:
+                logger.error(f"Error in schema change listener: {str(e)}")
+
+    def _forget_tables(self, tables: set[str]):
+        """Drop reflected metadata and cached info for `tables`."""
+        self.database.refresh_tables(forget=tables)
+        for table in tables:
+            self._table_info_cache.pop(table, None)
+            self._table_doc_cache.pop(table, None)
+
+    def check_schema_changes(self) -> set[str]:
+        """
+        Compare the catalog fingerprint against the last one seen and
+        re-introspect only the tables that changed.
+        """
+        fingerprints = fetch_table_fingerprints(self.database.engine, settings.db_schema)
+        with self._schema_lock:
+            if self._table_fingerprints is None:
+                self._table_fingerprints = fingerprints
+                return set()
+            changed = diff_fingerprints(self._table_fingerprints, fingerprints)
+            if changed:
+                self._forget_tables(changed)
+                self._table_fingerprints = fingerprints
+                self._bump_schema_version(changed)
+        return changed
+
+    async def watch_schema(self):
+        """Poll the catalog for changes until cancelled."""
+        while True:
+            await asyncio.sleep(settings.schema_poll_interval_seconds)
+            try:
+                await asyncio.to_thread(self.check_schema_changes)
+            except Exception as e:
+                logger.error(f"Error checking schema changes: {str(e)}")
+
+    @staticmethod
+    def _invalidate_dependent_caches(schema_version: int, changed: set[str]):
+        if query_cache is not None:
+            query_cache.invalidate_tables(changed)
+        if answer_cache is not None:
+            answer_cache.clear()
+
     def get_toolkit(self):
         if not self.toolkit:
-            self.toolkit = CustomSQLDatabaseToolkit(db=self.db, llm=self.llm)
+            self.toolkit = CustomSQLDatabaseToolkit(
+                db=self.db,
+                database=self.database,
+                llm=self.llm,
+                async_db=self.async_db,
+                query_guard=self.query_guard,
+                result_cache=query_cache,
+                schema_cache=self.schema_cache,
+            )
         return self.toolkit
 
+    def get_query_tool(self) -> BaseTool:
+        """Get the sql_db_query tool for running SQL outside the agent."""
+        if self._query_tool is None:
+            self._query_tool = next(
+                tool
+                for tool in self.get_toolkit().get_tools()
+                if tool.name == "sql_db_query"
+            )
+        return self._query_tool
 
-database_service = DatabaseService()
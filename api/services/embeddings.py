@@ -0,0 +1,107 @@
+"""
+Pluggable text embedders used for similarity lookups.
+"""
+
+import asyncio
+import hashlib
+import math
+import re
+from typing import Optional
+
+from api.core.config import settings
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+class Embedder:
+    """Turns text into a fixed-size, L2-normalized vector."""
+
+    def embed(self, text: str) -> list[float]:
+        raise NotImplementedError
+
+    async def aembed(self, text: str) -> list[float]:
+        return await asyncio.to_thread(self.embed, text)
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        """Embed several texts; remote embedders do it in as few requests as they can."""
+        return [self.embed(text) for text in texts]
+
+
+class HashingEmbedder(Embedder):
+    """
+    Deterministic local embedder based on the hashing trick.
+
+    Word unigrams and bigrams are hashed into a fixed number of buckets. It
+    needs no network or model download, which makes it suitable for tests
+    and offline deployments.
+    """
+
+    def __init__(self, dimensions: int = 256):
+        self.dimensions = dimensions
+
+    def _bucket(self, feature: str) -> tuple[int, float]:
+        digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+        value = int.from_bytes(digest, "little")
+        sign = 1.0 if value & 1 else -1.0
+        return (value >> 1) % self.dimensions, sign
+
+    def embed(self, text: str) -> list[float]:
+        tokens = _TOKEN_RE.findall(text.lower())
+        features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+        vector = [0.0] * self.dimensions
+        for feature in features:
+            index, sign = self._bucket(feature)
+            vector[index] += sign
+        norm = math.sqrt(sum(v * v for v in vector))
+        return [v / norm for v in vector] if norm else vector
+
+    async def aembed(self, text: str) -> list[float]:
+        return self.embed(text)
+
+
+class OpenAIEmbedder(Embedder):
+    """Embedder backed by the OpenAI embeddings API."""
+
+    def __init__(self, model: str = "text-embedding-3-small"):
+        from langchain_openai import OpenAIEmbeddings
+
+        from api.services.llm import get_llm_registry
+
+        registry = get_llm_registry()
+        self.client = OpenAIEmbeddings(
+            model=model,
+            openai_api_key=settings.openai_api_key,
+            base_url=settings.llm_base_url or None,
+            http_client=registry.http_client,
+            http_async_client=registry.http_async_client,
+            max_retries=settings.llm_max_retries,
+            # Token-array inputs need tiktoken files and are not accepted by
+            # every OpenAI-compatible server
+            check_embedding_ctx_length=not settings.llm_base_url,
+        )
+
+    def embed(self, text: str) -> list[float]:
+        return self.client.embed_query(text)
+
+    async def aembed(self, text: str) -> list[float]:
+        return await self.client.aembed_query(text)
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        # Sent in batches of the client's chunk_size rather than one per text
+        return self.client.embed_documents(texts)
+
+
+def cosine_similarity(a: list[float], b: list[float]) -> float:
+    """Cosine similarity of two L2-normalized vectors."""
+    return sum(x * y for x, y in zip(a, b))
+
+
+def get_embedder(name: str) -> Optional[Embedder]:
+    """Build an embedder by name ("hashing", "openai"), or None if disabled."""
+    if not name:
+        return None
+    if name == "hashing":
+        return HashingEmbedder()
+    if name == "openai":
+        return OpenAIEmbedder(settings.openai_embedding_model)
+    raise ValueError(f"Unknown embedder: {name}")
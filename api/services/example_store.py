@@ -0,0 +1,239 @@
+"""
+Verified question/SQL examples retrieved as few-shot context for the agent.
+
+Examples are seeded from a JSONL file and grown from queries that ran
+successfully and that the user marked as good. The most similar examples
+to a question are ranked with BM25, optionally combined with embedding
+similarity, and added to the question sent to the agent. When the schema
+changes, examples that use a changed table are checked again and dropped
+if they no longer plan.
+"""
+
+import json
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+from api.core.config import settings
+from api.core.logging import logger
+from api.core.metrics import metrics
+from api.services.answer_cache import normalize_question
+from api.services.embeddings import Embedder, cosine_similarity, get_embedder
+from api.services.query_cache import extract_tables
+from api.services.schema_index import BM25Index
+from api.services.sql_validator import get_validator
+
+examples_added = metrics.counter(
+    "nl2sql_examples_added_total", "Few-shot examples added, by source (seed, feedback)"
+)
+examples_dropped = metrics.counter(
+    "nl2sql_examples_dropped_total",
+    "Few-shot examples and candidates dropped after a schema change",
+)
+example_retrievals = metrics.counter(
+    "nl2sql_example_retrievals_total",
+    "Questions answered with and without few-shot examples, by outcome (hit, miss)",
+)
+
+
+@dataclass
+class Example:
+    """A question and the SQL that answered it correctly."""
+
+    question: str
+    sql: str
+    source: str = "seed"
+    vector: Optional[list[float]] = field(default=None, repr=False)
+
+
+def format_examples(examples: list[Example]) -> str:
+    """Render examples as a prompt section, or "" when there are none."""
+    if not examples:
+        return ""
+    pairs = "\n\n".join(
+        f"Question: {example.question}\nSQL: {example.sql}" for example in examples
+    )
+    return (
+        "\n\n**VERIFIED EXAMPLES** (similar questions and SQL that answered them "
+        f"correctly on this database):\n\n{pairs}"
+    )
+
+
+class ExampleStore:
+    """
+    In-memory store of verified examples, keyed by normalized question.
+
+    Queries the agent ran successfully are held as candidates under an ID
+    that is sent to the client; `confirm` turns a candidate into an example
+    and appends it to `path`, so it survives restarts.
+
+    `verify` returns why a query no longer works against the current
+    schema, or None. Loaded examples are checked with it, and so are
+    examples that use a changed table; without it those are dropped
+    unchecked.
+    """
+
+    def __init__(
+        self,
+        path: str = "",
+        seed_path: str = "",
+        dialect: Optional[str] = None,
+        embedder: Optional[Embedder] = None,
+        max_candidates: int = 1024,
+        verify: Optional[Callable[[str], Optional[str]]] = None,
+    ):
+        self.path = path
+        self.dialect = dialect
+        self.embedder = embedder
+        self.verify = verify
+        self.max_candidates = max_candidates
+        self._examples: dict[str, Example] = {}
+        self._candidates: OrderedDict[str, Example] = OrderedDict()
+        self._index: Optional[BM25Index] = None
+        self._indexed: list[Example] = []
+        self._lock = threading.Lock()
+
+        if seed_path:
+            self._load(seed_path, "seed")
+        if path:
+            self._load(path, "feedback")
+
+    def _load(self, path: str, source: str):
+        if not os.path.exists(path):
+            return
+        loaded = 0
+        with open(path, encoding="utf-8") as f:
+            for number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                    question, sql = record["question"], record["sql"]
+                except (ValueError, KeyError, TypeError):
+                    logger.warning(f"Skipping malformed example at {path}:{number}")
+                    continue
+                # The schema may have changed since the example was stored
+                if self._add(Example(question, sql, source), verify=True):
+                    loaded += 1
+        logger.info(f"Loaded {loaded} few-shot examples from {path}")
+
+    def _add(self, example: Example, verify: bool = False) -> bool:
+        reason = get_validator(self.dialect).check(example.sql)
+        if reason is None and verify and self.verify is not None:
+            reason = self.verify(example.sql)
+        if reason is not None:
+            logger.warning(f"Skipping example {example.question!r}: {reason}")
+            return False
+        if self.embedder is not None and example.vector is None:
+            example.vector = self.embedder.embed(example.question)
+        with self._lock:
+            self._examples[normalize_question(example.question)] = example
+            self._index = None
+        examples_added.inc(source=example.source)
+        return True
+
+    def propose(self, question: str, sql: str) -> str:
+        """Hold a successfully executed query as a candidate; return its ID."""
+        candidate_id = uuid.uuid4().hex
+        with self._lock:
+            self._candidates[candidate_id] = Example(question, sql, "feedback")
+            while len(self._candidates) > self.max_candidates:
+                self._candidates.popitem(last=False)
+        return candidate_id
+
+    def confirm(self, candidate_id: str) -> Optional[Example]:
+        """Store the candidate `candidate_id` as an example, None if it is unknown."""
+        with self._lock:
+            example = self._candidates.pop(candidate_id, None)
+        if example is None or not self._add(example):
+            return None
+        if self.path:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"question": example.question, "sql": example.sql}) + "\n")
+        return example
+
+    def reject(self, candidate_id: str) -> bool:
+        """Forget a candidate the user marked as bad."""
+        with self._lock:
+            return self._candidates.pop(candidate_id, None) is not None
+
+    def invalidate(self, schema_version: int, changed: set[str]):
+        """Schema change listener: drop examples and candidates that no longer plan."""
+        changed = {table.lower() for table in changed}
+        with self._lock:
+            affected = [
+                (entries, key, example)
+                for entries in (self._examples, self._candidates)
+                for key, example in entries.items()
+                if extract_tables(example.sql, self.dialect) & changed
+            ]
+        stale = []
+        for entries, key, example in affected:
+            reason = self.verify(example.sql) if self.verify else "schema changed"
+            if reason is not None:
+                logger.info(f"Dropping example {example.question!r}: {reason}")
+                stale.append((entries, key, example))
+        with self._lock:
+            for entries, key, example in stale:
+                # Skip entries replaced while the queries were checked
+                if entries.get(key) is example:
+                    del entries[key]
+                    examples_dropped.inc()
+                    self._index = None
+
+    def search(
+        self, question: str, k: int, vector: Optional[list[float]] = None
+    ) -> list[Example]:
+        """The top-k examples most similar to `question`."""
+        with self._lock:
+            if self._index is None:
+                self._indexed = list(self._examples.values())
+                self._index = BM25Index([example.question for example in self._indexed])
+            index, examples = self._index, self._indexed
+        if not examples:
+            return []
+
+        scores = index.scores(question)
+        top = max(scores, default=0.0)
+        if top > 0:
+            scores = [score / top for score in scores]
+        if vector is not None:
+            scores = [
+                score + cosine_similarity(vector, example.vector)
+                if example.vector is not None
+                else score
+                for score, example in zip(scores, examples)
+            ]
+        ranked = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)
+        return [examples[i] for i in ranked[:k] if scores[i] > 0]
+
+    async def asearch(self, question: str, k: int) -> list[Example]:
+        vector = await self.embedder.aembed(question) if self.embedder else None
+        examples = self.search(question, k, vector)
+        example_retrievals.inc(outcome="hit" if examples else "miss")
+        return examples
+
+    def __len__(self) -> int:
+        return len(self._examples)
+
+
+def create_example_store(
+    dialect: Optional[str] = None,
+    verify: Optional[Callable[[str], Optional[str]]] = None,
+) -> Optional[ExampleStore]:
+    if not settings.examples_enabled:
+        return None
+    return ExampleStore(
+        path=settings.examples_path,
+        seed_path=settings.examples_seed_path,
+        dialect=dialect,
+        embedder=get_embedder(settings.examples_embedder),
+        max_candidates=settings.examples_max_candidates,
+        verify=verify,
+    )
@@ -0,0 +1,216 @@
+"""
+Shared chat model construction for every service.
+
+All chat models are built by one registry, so they share a pooled HTTP
+client, retry failed requests with jittered exponential backoff and can be
+pointed at any OpenAI-compatible server (`LLM_BASE_URL`), such as the
+stub in `benchmarks.llm_stub`. Streaming models can optionally hedge: if
+no first token arrives within `LLM_HEDGE_AFTER_SECONDS`, a second
+identical request is sent and whichever answers first is used.
+"""
+
+import asyncio
+import threading
+from functools import lru_cache
+from typing import Any, AsyncIterator, Callable, Optional
+
+import httpx
+from langchain_core.language_models import BaseChatModel
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+
+from api.core.config import settings
+from api.core.metrics import metrics
+
+llm_hedges = metrics.counter(
+    "nl2sql_llm_hedged_requests_total",
+    "Second LLM requests sent because the first token was slow, by winner",
+)
+
+# Builds a chat model: (registry, model, temperature, max_tokens, streaming, tags)
+Backend = Callable[..., BaseChatModel]
+
+_BACKENDS: dict[str, Backend] = {}
+
+
+def register_backend(name: str, backend: Backend):
+    """Make a chat model backend selectable with `LLM_BACKEND=name`."""
+    _BACKENDS[name] = backend
+
+
+class HedgedChatModel(BaseChatModel):
+    """
+    Streams from `llm`, racing a second request if the first token is slow.
+
+    Only the stream that produces the first chunk is read; the other
+    request is cancelled.
+    """
+
+    llm: BaseChatModel
+    hedge_after: float
+
+    @property
+    def _llm_type(self) -> str:
+        return f"hedged-{self.llm._llm_type}"
+
+    @property
+    def _identifying_params(self) -> dict[str, Any]:
+        return {**self.llm._identifying_params, "hedge_after": self.hedge_after}
+
+    def bind_tools(self, tools, **kwargs):
+        # Keep the wrapped model's tool formatting, but stream through the hedge
+        return self.bind(**self.llm.bind_tools(tools, **kwargs).kwargs)
+
+    def with_structured_output(self, schema, **kwargs):
+        return self.llm.with_structured_output(schema, **kwargs)
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        return self.llm._generate(messages, stop=stop, **kwargs)
+
+    async def _agenerate(
+        self, messages, stop=None, run_manager=None, **kwargs
+    ) -> ChatResult:
+        return await self.llm._agenerate(messages, stop=stop, **kwargs)
+
+    async def _astream(
+        self, messages, stop=None, run_manager=None, **kwargs
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        def attempt():
+            return self.llm._astream(messages, stop=stop, **kwargs)
+
+        primary = attempt()
+        tasks = {asyncio.ensure_future(anext(primary)): primary}
+        done, _ = await asyncio.wait(tasks, timeout=self.hedge_after)
+        if not done:
+            backup = attempt()
+            tasks[asyncio.ensure_future(anext(backup))] = backup
+
+        winner = None
+        pending = set(tasks)
+        try:
+            while pending and winner is None:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    error = task.exception()
+                    if error is None or isinstance(error, StopAsyncIteration):
+                        winner = task
+                        break
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            for task, stream in tasks.items():
+                if task is not winner:
+                    await stream.aclose()
+
+        if len(tasks) > 1:
+            llm_hedges.inc(
+                winner="primary" if winner is next(iter(tasks)) else "backup"
+            )
+        if winner is None:
+            # Every attempt failed; surface the primary request's error
+            raise next(iter(tasks)).exception()
+
+        stream = tasks[winner]
+        if isinstance(winner.exception(), StopAsyncIteration):
+            return
+        chunk = winner.result()
+        while True:
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+            try:
+                chunk = await anext(stream)
+            except StopAsyncIteration:
+                return
+
+
+class LLMRegistry:
+    """
+    Builds and caches chat models on shared, pooled HTTP clients.
+
+    Models are cached by their settings, so services asking for the same
+    model get the same instance.
+    """
+
+    def __init__(self, backend: str = "openai"):
+        if backend not in _BACKENDS:
+            raise ValueError(f"Unknown LLM backend: {backend}")
+        self.backend = backend
+        limits = httpx.Limits(
+            max_connections=settings.llm_max_connections,
+            max_keepalive_connections=settings.llm_max_connections,
+        )
+        timeout = httpx.Timeout(settings.llm_timeout_seconds, connect=10.0)
+        self.http_client = httpx.Client(limits=limits, timeout=timeout)
+        self.http_async_client = httpx.AsyncClient(limits=limits, timeout=timeout)
+        self._models: dict[tuple, BaseChatModel] = {}
+        self._lock = threading.Lock()
+
+    def chat_model(
+        self,
+        model: Optional[str] = None,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        streaming: bool = True,
+        tags: Optional[list[str]] = None,
+    ) -> BaseChatModel:
+        """Chat model for `model`, defaulting to the configured model settings."""
+        key = (
+            model or settings.openai_model,
+            settings.openai_temperature if temperature is None else temperature,
+            max_tokens,
+            streaming,
+            tuple(tags or ()),
+        )
+        with self._lock:
+            llm = self._models.get(key)
+            if llm is None:
+                llm = _BACKENDS[self.backend](
+                    self,
+                    model=key[0],
+                    temperature=key[1],
+                    max_tokens=max_tokens,
+                    streaming=streaming,
+                    tags=list(key[4]) or None,
+                )
+                if streaming and settings.llm_hedge_after_seconds > 0:
+                    llm = HedgedChatModel(
+                        llm=llm,
+                        hedge_after=settings.llm_hedge_after_seconds,
+                        tags=list(key[4]) or None,
+                    )
+                self._models[key] = llm
+            return llm
+
+    async def aclose(self):
+        self.http_client.close()
+        await self.http_async_client.aclose()
+
+
+def _openai_backend(registry: LLMRegistry, **options) -> BaseChatModel:
+    from langchain_openai import ChatOpenAI
+
+    return ChatOpenAI(
+        **options,
+        openai_api_key=settings.openai_api_key,
+        base_url=settings.llm_base_url or None,
+        http_client=registry.http_client,
+        http_async_client=registry.http_async_client,
+        timeout=settings.llm_timeout_seconds,
+        # The OpenAI client backs off exponentially with jitter between attempts
+        max_retries=settings.llm_max_retries,
+        # Usage (with cached prompt tokens) in the last chunk of streamed
+        # responses too; only on by default without a custom client
+        stream_usage=True,
+    )
+
+
+register_backend("openai", _openai_backend)
+
+
+@lru_cache(maxsize=None)
+def get_llm_registry() -> LLMRegistry:
+    """Registry shared by every service, for the configured backend."""
+    return LLMRegistry(settings.llm_backend)
@@ -0,0 +1,136 @@
+"""
+Result cache for SELECT queries executed by the agent.
+"""
+
+import asyncio
+import hashlib
+import re
+from typing import Optional
+
+from api.core.cache import CacheBackend, MemoryCacheBackend, RedisCacheBackend
+from api.core.config import settings
+from api.core.logging import logger
+from api.core.metrics import metrics
+from api.services.sql_validator import get_validator
+
+_LITERAL_RE = re.compile(r"('(?:[^']|'')*'|\"(?:[^\"]|\"\")*\")")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+query_cache_hits = metrics.counter(
+    "nl2sql_query_cache_hits_total", "Query result cache hits"
+)
+query_cache_misses = metrics.counter(
+    "nl2sql_query_cache_misses_total", "Query result cache misses"
+)
+query_cache_bytes_saved = metrics.counter(
+    "nl2sql_query_cache_bytes_saved_total",
+    "Bytes of query results served from the cache instead of the database",
+)
+
+
+def normalize_query(query: str) -> str:
+    """
+    Normalize whitespace and case of a cleaned query.
+
+    Quoted literals and identifiers are left untouched so that e.g.
+    `name = 'Bob'` and `name = 'bob'` never share a cache entry.
+    """
+    parts = _LITERAL_RE.split(query)
+    for i in range(0, len(parts), 2):
+        parts[i] = _WHITESPACE_RE.sub(" ", parts[i]).lower()
+    return "".join(parts).strip()
+
+
+def extract_tables(query: str, dialect: Optional[str] = None) -> set[str]:
+    """Lowercased names of the tables `query` reads, as sqlglot parses them."""
+    return set(get_validator(dialect).tables(query or ""))
+
+
+class QueryResultCache:
+    """Caches encoded query results keyed by normalized SQL text."""
+
+    def __init__(self, backend: CacheBackend, ttl: float):
+        self.backend = backend
+        self.ttl = ttl
+
+    @staticmethod
+    def _key(normalized: str) -> str:
+        return "query:" + hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+    def get(self, query: str) -> Optional[str]:
+        normalized = normalize_query(query)
+        result = self.backend.get(self._key(normalized))
+        if result is None:
+            query_cache_misses.inc()
+            return None
+        query_cache_hits.inc()
+        query_cache_bytes_saved.inc(len(result.encode("utf-8")))
+        return result
+
+    def set(self, query: str, result: str):
+        normalized = normalize_query(query)
+        tags = [f"table:{table}" for table in extract_tables(query)]
+        self.backend.set(self._key(normalized), result, self.ttl, tags)
+
+    async def aget(self, query: str) -> Optional[str]:
+        if isinstance(self.backend, MemoryCacheBackend):
+            return self.get(query)
+        return await asyncio.to_thread(self.get, query)
+
+    async def aset(self, query: str, result: str):
+        if isinstance(self.backend, MemoryCacheBackend):
+            return self.set(query, result)
+        await asyncio.to_thread(self.set, query, result)
+
+    def invalidate_tables(self, tables) -> int:
+        """Drop cached results that read from any of `tables`."""
+        dropped = sum(
+            self.backend.invalidate_tag(f"table:{table.lower()}") for table in tables
+        )
+        logger.info(f"Invalidated {dropped} cached query results")
+        return dropped
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self) -> dict:
+        hits = query_cache_hits.value()
+        misses = query_cache_misses.value()
+        return {
+            "hits": int(hits),
+            "misses": int(misses),
+            "hit_ratio": hits / (hits + misses) if hits + misses else 0.0,
+            "bytes_saved": int(query_cache_bytes_saved.value()),
+            "entries": self.backend.count(),
+        }
+
+
+def _create_query_cache() -> Optional[QueryResultCache]:
+    if not settings.query_cache_enabled:
+        return None
+    if settings.query_cache_redis_url:
+        backend = RedisCacheBackend(
+            settings.query_cache_redis_url, prefix="nl2sql:query:"
+        )
+    else:
+        backend = MemoryCacheBackend(
+            max_entries=settings.query_cache_max_entries,
+            max_bytes=settings.query_cache_max_bytes,
+        )
+    return QueryResultCache(backend, ttl=settings.query_cache_ttl_seconds)
+
+
+query_cache = _create_query_cache()
+
+if query_cache is not None:
+    metrics.gauge(
+        "nl2sql_query_cache_hit_ratio",
+        "Query result cache hit ratio",
+        callback=lambda: query_cache.stats()["hit_ratio"],
+    )
+    if query_cache.backend.count() is not None:
+        metrics.gauge(
+            "nl2sql_query_cache_entries",
+            "Entries held in the local query result cache",
+            callback=query_cache.backend.count,
+        )
@@ -0,0 +1,105 @@
+"""
+Cost pre-flight for agent SQL.
+
+Before a query runs, PostgreSQL's planner estimates are read with
+`EXPLAIN (FORMAT JSON)`. Queries whose estimated total cost, or whose
+largest intermediate row count (the usual sign of a missing join
+condition), is above the configured limit are rejected with a structured
+hint the agent can act on instead of being executed.
+"""
+
+import json
+import time
+from typing import Any, Optional
+
+from sqlalchemy import text
+
+from api.core.metrics import metrics
+from api.core.tracing import record_span
+
+preflight_rejections = metrics.counter(
+    "nl2sql_sql_preflight_rejections_total",
+    "Agent SQL rejected by the EXPLAIN pre-flight, by reason",
+)
+
+_SUGGESTIONS = {
+    "estimated_cost": (
+        "Filter with WHERE on selective columns, aggregate in SQL instead of "
+        "returning raw rows, and avoid sorting whole tables."
+    ),
+    "estimated_rows": (
+        "Check that every JOIN has a condition on key columns, and filter "
+        "tables before joining them."
+    ),
+}
+
+
+class QueryRejected(Exception):
+    """Raised instead of executing a query that is estimated to be too expensive."""
+
+    def __init__(self, hint: dict[str, Any]):
+        self.hint = hint
+        super().__init__(f"Query rejected before execution: {json.dumps(hint)}")
+
+
+def _walk(plan: dict):
+    yield plan
+    for child in plan.get("Plans", ()):
+        yield from _walk(child)
+
+
+class QueryGuard:
+    """Rejects queries whose planner estimates exceed `max_cost` or `max_rows`."""
+
+    def __init__(self, max_cost: float, max_rows: int):
+        self.max_cost = max_cost
+        self.max_rows = max_rows
+
+    @staticmethod
+    def _explain(query: str):
+        return text(f"EXPLAIN (FORMAT JSON) {query}")
+
+    def evaluate(self, explained: Any) -> Optional[dict[str, Any]]:
+        """Return a hint for an EXPLAIN (FORMAT JSON) result over the limits, else None."""
+        if isinstance(explained, str):
+            explained = json.loads(explained)
+        root = explained[0]["Plan"]
+        cost = root["Total Cost"]
+        largest = max(_walk(root), key=lambda node: node["Plan Rows"])
+        rows = largest["Plan Rows"]
+
+        if cost > self.max_cost:
+            reason = "estimated_cost"
+        elif rows > self.max_rows:
+            reason = "estimated_rows"
+        else:
+            return None
+
+        preflight_rejections.inc(reason=reason)
+        return {
+            "reason": reason,
+            "estimated_cost": cost,
+            "max_cost": self.max_cost,
+            "estimated_rows": rows,
+            "max_rows": self.max_rows,
+            "largest_step": largest["Node Type"],
+            "suggestion": _SUGGESTIONS[reason],
+        }
+
+    def check(self, connection, query: str):
+        """Raise QueryRejected if `query` is over the limits."""
+        start = time.perf_counter()
+        explained = connection.execute(self._explain(query)).scalar()
+        record_span("db_explain", start)
+        hint = self.evaluate(explained)
+        if hint is not None:
+            raise QueryRejected(hint)
+
+    async def acheck(self, connection, query: str):
+        """Async variant of `check` for an AsyncConnection."""
+        start = time.perf_counter()
+        explained = (await connection.execute(self._explain(query))).scalar()
+        record_span("db_explain", start)
+        hint = self.evaluate(explained)
+        if hint is not None:
+            raise QueryRejected(hint)
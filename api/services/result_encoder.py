@@ -0,0 +1,135 @@
+"""
+Bounded, compact encoding of SQL query results for the agent.
+
+Rows are consumed from a server-side cursor one batch at a time and written
+as tab-separated values with a header line. Encoding stops once either the
+row cap or the byte cap is reached, so memory stays bounded regardless of
+the size of the underlying result set.
+"""
+
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Iterable, Optional, Sequence
+
+from api.core.config import settings
+
+FETCH_BATCH_SIZE = 500
+
+
+def _format_cell(value, max_length: int) -> str:
+    if value is None:
+        return "NULL"
+    text = str(value)
+    if len(text) > max_length:
+        text = text[:max_length] + "..."
+    return text.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n")
+
+
+@dataclass
+class RawResult:
+    """
+    The columns and unencoded rows read while encoding, for callers that
+    need the actual values rather than the text the model sees. Rows are
+    not capped by size, only by the rows read for the truncation count.
+    """
+
+    columns: list[str] = field(default_factory=list)
+    rows: list[list] = field(default_factory=list)
+    truncated: bool = False  # reading stopped before the last row
+
+
+class ResultEncoder:
+    """Accumulates rows as TSV until a row or byte limit is hit."""
+
+    def __init__(
+        self,
+        columns: Sequence[str],
+        max_rows: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        max_cell_length: Optional[int] = None,
+        count_limit: Optional[int] = None,
+    ):
+        self.max_rows = max_rows or settings.sql_max_rows
+        self.max_bytes = max_bytes or settings.sql_max_result_bytes
+        self.max_cell_length = max_cell_length or settings.sql_max_cell_length
+        self.count_limit = (
+            settings.sql_truncated_count_limit if count_limit is None else count_limit
+        )
+
+        self._lines = ["\t".join(columns)]
+        self._size = len(self._lines[0]) + 1
+        self.row_count = 0
+        self.skipped = 0
+        self.full = False
+
+    def add(self, row: Sequence) -> bool:
+        """
+        Add a row to the output.
+
+        Returns False once the encoder is full; further rows are only counted
+        (up to `count_limit`) for the truncation marker.
+        """
+        if self.full:
+            self.skipped += 1
+            return self.skipped < self.count_limit
+
+        line = "\t".join(_format_cell(value, self.max_cell_length) for value in row)
+        line_size = len(line.encode("utf-8")) + 1
+        if self.row_count >= self.max_rows or self._size + line_size > self.max_bytes:
+            self.full = True
+            self.skipped = 1
+            return self.skipped < self.count_limit
+
+        self._lines.append(line)
+        self._size += line_size
+        self.row_count += 1
+        return True
+
+    def render(self, exhausted: bool = True) -> str:
+        """Render the encoded rows, with a truncation marker if needed."""
+        if self.row_count == 0 and not self.full:
+            return ""
+        output = "\n".join(self._lines)
+        if self.full:
+            more = f"{self.skipped}" if exhausted else f"{self.skipped}+"
+            output += f"\n... truncated, {more} more rows"
+        return output
+
+
+def encode_rows(
+    columns: Sequence[str],
+    batches: Iterable[Sequence],
+    raw: Optional[RawResult] = None,
+) -> str:
+    """Encode rows from an iterator of row batches, also collecting them in `raw`."""
+    encoder = ResultEncoder(columns)
+    if raw is not None:
+        raw.columns = list(columns)
+    for batch in batches:
+        for row in batch:
+            if raw is not None:
+                raw.rows.append(list(row))
+            if not encoder.add(row):
+                if raw is not None:
+                    raw.truncated = True
+                return encoder.render(exhausted=False)
+    return encoder.render()
+
+
+async def aencode_rows(
+    columns: Sequence[str],
+    batches: AsyncIterator[Sequence],
+    raw: Optional[RawResult] = None,
+) -> str:
+    """Encode rows from an async iterator of row batches, also collecting them in `raw`."""
+    encoder = ResultEncoder(columns)
+    if raw is not None:
+        raw.columns = list(columns)
+    async for batch in batches:
+        for row in batch:
+            if raw is not None:
+                raw.rows.append(list(row))
+            if not encoder.add(row):
+                if raw is not None:
+                    raw.truncated = True
+                return encoder.render(exhausted=False)
+    return encoder.render()
@@ -0,0 +1,224 @@
+"""
+Per-table schema descriptions for the agent's schema and table list tools.
+
+Tables are reflected once and their sample rows are fetched for all
+requested tables in a single query. The rendered descriptions are cached
+until the schema version changes for that table.
+"""
+
+import threading
+from dataclasses import dataclass, field
+from typing import Optional
+
+from sqlalchemy import String, Table, cast, literal, null, select, union_all
+from sqlalchemy.schema import CreateTable
+from sqlalchemy.types import NullType
+
+from api.core.logging import logger
+from api.core.metrics import metrics
+from api.services.schema_index import estimate_tokens
+from api.services.sql_database import SQLDatabaseAdapter
+
+schema_tool_tokens = metrics.counter(
+    "nl2sql_schema_tool_tokens_total",
+    "Estimated tokens returned by the schema tool, by output format",
+)
+
+FORMATS = ("compact", "ddl")
+
+
+@dataclass
+class TableSchema:
+    table: Table
+    columns: list
+    sample_rows: list[tuple] = field(default_factory=list)
+
+
+def _sample_value(value: Optional[str], max_length: int) -> str:
+    if value is None:
+        return "NULL"
+    text = value.replace("\n", " ")
+    return text if len(text) <= max_length else text[:max_length] + "..."
+
+
+class SchemaCache:
+    """
+    Caches schema tool output per table and format.
+
+    "compact" lists one column per line with its type, PK/FK markers and a
+    few distinct sample values. "ddl" is the CREATE TABLE statement plus
+    sample rows, as SQLDatabase.get_table_info renders it.
+    """
+
+    def __init__(
+        self,
+        database: SQLDatabaseAdapter,
+        sample_rows: int = 3,
+        max_value_length: int = 40,
+    ):
+        self.database = database
+        self.db = database.db
+        self.sample_rows = sample_rows
+        self.max_value_length = max_value_length
+        self._entries: dict[tuple[str, str], str] = {}
+        self._table_list: Optional[str] = None
+        # Bumped on invalidation, so renders that raced with it are not stored
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def table_list(self) -> str:
+        """Comma-separated usable table names."""
+        if self._table_list is None:
+            self._table_list = ", ".join(self.db.get_usable_table_names())
+        return self._table_list
+
+    def is_cached(self, table_names: list[str], format: str = "compact") -> bool:
+        with self._lock:
+            return all((name, format) in self._entries for name in table_names)
+
+    def describe(self, table_names: list[str], format: str = "compact") -> str:
+        """Descriptions of `table_names` in the requested order."""
+        if format not in FORMATS:
+            raise ValueError(f"Unknown schema format {format!r}")
+        usable = set(self.db.get_usable_table_names())
+        unknown = [name for name in table_names if name not in usable]
+        if unknown:
+            return f"Error: table_names {set(unknown)} not found in database"
+
+        with self._lock:
+            generation = self._generation
+            described = {name: self._entries.get((name, format)) for name in table_names}
+        missing = [name for name, text in described.items() if text is None]
+        if missing:
+            rendered = {
+                schema.table.name: self._render(schema, format)
+                for schema in self._load(missing)
+            }
+            with self._lock:
+                if generation == self._generation:
+                    for name, text in rendered.items():
+                        self._entries[(name, format)] = text
+            described.update(
+                (name, rendered[name]) for name in missing if name in rendered
+            )
+
+        # Tables that could not be reflected, e.g. views or names whose case
+        # differs from the reflected table, get an error line of their own
+        output = "\n\n".join(
+            described[name] or f"Error: could not read the schema of table {name}"
+            for name in table_names
+        )
+        schema_tool_tokens.inc(estimate_tokens(output), format=format)
+        return output
+
+    def invalidate(self, schema_version: int, changed: set[str]):
+        """Schema change listener: forget the tables that changed."""
+        with self._lock:
+            self._table_list = None
+            self._generation += 1
+            for key in [key for key in self._entries if key[0] in changed]:
+                del self._entries[key]
+
+    def _load(self, table_names: list[str]) -> list[TableSchema]:
+        tables = self.database.reflect(table_names)
+        schemas = [
+            TableSchema(
+                table=tables[name],
+                # Columns of unknown type cannot be rendered or cast
+                columns=[
+                    column
+                    for column in tables[name].columns
+                    if type(column.type) is not NullType
+                ],
+            )
+            for name in table_names
+            if name in tables
+        ]
+        if self.sample_rows > 0 and schemas:
+            self._fetch_samples(schemas)
+        return schemas
+
+    def _sample_query(self, schemas: list[TableSchema]):
+        """One UNION ALL over every table, each column cast to text."""
+        width = max(len(schema.columns) for schema in schemas)
+        selects = []
+        for schema in schemas:
+            sample = (
+                select(*schema.columns)
+                .select_from(schema.table)
+                .limit(self.sample_rows)
+                .subquery()
+            )
+            values = [cast(sample.c[column.name], String) for column in schema.columns]
+            values += [cast(null(), String)] * (width - len(values))
+            selects.append(
+                select(
+                    literal(schema.table.name, String).label("table_name"),
+                    *[value.label(f"c{index}") for index, value in enumerate(values)],
+                )
+            )
+        return union_all(*selects) if len(selects) > 1 else selects[0]
+
+    def _fetch_samples(self, schemas: list[TableSchema]):
+        by_name = {schema.table.name: schema for schema in schemas}
+        try:
+            with self.database.engine.connect() as connection:
+                rows = connection.execute(self._sample_query(schemas)).fetchall()
+        except Exception as e:
+            if len(schemas) == 1:
+                logger.warning(
+                    f"Could not sample rows of {schemas[0].table.name}: {str(e)}"
+                )
+                return
+            # Fall back to one query per table so one bad table only loses
+            # its own samples
+            for schema in schemas:
+                self._fetch_samples([schema])
+            return
+        for row in rows:
+            schema = by_name[row[0]]
+            schema.sample_rows.append(tuple(row[1 : len(schema.columns) + 1]))
+
+    def _render(self, schema: TableSchema, format: str) -> str:
+        if format == "ddl":
+            return self._render_ddl(schema)
+        return self._render_compact(schema)
+
+    def _render_compact(self, schema: TableSchema) -> str:
+        dialect = self.database.engine.dialect
+        table = schema.table
+        lines = [f"{table.name} -- {table.comment}" if table.comment else table.name]
+        for index, column in enumerate(schema.columns):
+            parts = [f"  {column.name} {column.type.compile(dialect=dialect).lower()}"]
+            if column.primary_key:
+                parts.append("PK")
+            for foreign_key in column.foreign_keys:
+                parts.append(f"FK {foreign_key.target_fullname}")
+            samples = list(
+                dict.fromkeys(
+                    _sample_value(row[index], self.max_value_length)
+                    for row in schema.sample_rows
+                    if row[index] is not None
+                )
+            )
+            if samples and not column.primary_key:
+                parts.append("e.g. " + " | ".join(samples))
+            if column.comment:
+                parts.append(f"-- {column.comment}")
+            lines.append(" ".join(parts))
+        return "\n".join(lines)
+
+    def _render_ddl(self, schema: TableSchema) -> str:
+        table = schema.table
+        create_table = str(CreateTable(table).compile(self.database.engine)).strip()
+        if self.sample_rows <= 0:
+            return create_table
+        header = "\t".join(column.name for column in schema.columns)
+        rows = "\n".join(
+            "\t".join(_sample_value(value, 100) for value in row)
+            for row in schema.sample_rows
+        )
+        return (
+            f"{create_table}\n\n/*\n{self.sample_rows} rows from {table.name} table:\n"
+            f"{header}\n{rows}\n*/"
+        )
@@ -0,0 +1,69 @@
+"""
+Cheap catalog fingerprints used to detect schema changes.
+"""
+
+import hashlib
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+
+# One round-trip: a hash per relation over its columns, types, nullability,
+# comments and constraint definitions.
+PG_TABLE_FINGERPRINTS = """
+SELECT cl.relname AS table_name,
+       md5(
+           string_agg(
+               a.attname || ':' || format_type(a.atttypid, a.atttypmod)
+               || ':' || a.attnotnull::text
+               || ':' || coalesce(col_description(cl.oid, a.attnum), ''),
+               ',' ORDER BY a.attnum
+           )
+           || '|' || coalesce(obj_description(cl.oid, 'pg_class'), '')
+           || '|' || coalesce((
+               SELECT string_agg(pg_get_constraintdef(co.oid), ',' ORDER BY co.conname)
+               FROM pg_constraint co
+               WHERE co.conrelid = cl.oid
+           ), '')
+       ) AS fingerprint
+FROM pg_class cl
+JOIN pg_namespace n ON n.oid = cl.relnamespace
+JOIN pg_attribute a ON a.attrelid = cl.oid AND a.attnum > 0 AND NOT a.attisdropped
+WHERE n.nspname = :schema AND cl.relkind IN ('r', 'p', 'v', 'm')
+GROUP BY cl.oid, cl.relname
+"""
+
+
+def _inspect_fingerprints(engine: Engine, schema: str) -> dict[str, str]:
+    """Dialect-agnostic fallback using the SQLAlchemy inspector."""
+    inspector = inspect(engine)
+    fingerprints = {}
+    for table in inspector.get_table_names(schema=schema):
+        parts = [
+            f"{col['name']}:{col['type']}:{col['nullable']}:{col.get('comment') or ''}"
+            for col in inspector.get_columns(table, schema=schema)
+        ]
+        parts += [
+            f"fk:{fk['constrained_columns']}->{fk['referred_table']}{fk['referred_columns']}"
+            for fk in inspector.get_foreign_keys(table, schema=schema)
+        ]
+        parts.append(f"pk:{inspector.get_pk_constraint(table, schema=schema)}")
+        fingerprints[table] = hashlib.md5(",".join(parts).encode("utf-8")).hexdigest()
+    return fingerprints
+
+
+def fetch_table_fingerprints(engine: Engine, schema: str = "public") -> dict[str, str]:
+    """Return a {table: fingerprint} map for every relation in `schema`."""
+    if engine.dialect.name != "postgresql":
+        return _inspect_fingerprints(engine, None)
+    with engine.connect() as connection:
+        rows = connection.execute(text(PG_TABLE_FINGERPRINTS), {"schema": schema})
+        return {row.table_name: row.fingerprint for row in rows}
+
+
+def diff_fingerprints(old: dict[str, str], new: dict[str, str]) -> set[str]:
+    """Names of tables that were added, dropped or altered."""
+    return {
+        table
+        for table in old.keys() | new.keys()
+        if old.get(table) != new.get(table)
+    }
@@ -0,0 +1,151 @@
+"""
+Searchable index over the database schema used to prune the agent prompt.
+"""
+
+import math
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Optional
+
+from api.services.embeddings import Embedder, cosine_similarity
+
+_WORD_RE = re.compile(r"[A-Za-z][a-z]*|[0-9]+")
+
+
+def tokenize(text: str) -> list[str]:
+    """
+    Split text into lowercase terms.
+
+    snake_case and camelCase identifiers are split into words and a trailing
+    plural "s" is dropped, so "order_items" matches "items ordered".
+    """
+    tokens = []
+    for word in _WORD_RE.findall(text.replace("_", " ")):
+        word = word.lower()
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        tokens.append(word)
+    return tokens
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough prompt-token estimate (~4 characters per token)."""
+    return len(text) // 4
+
+
+class BM25Index:
+    """Okapi BM25 ranking over a fixed list of documents."""
+
+    def __init__(self, documents: list[str], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._docs = [Counter(tokenize(doc)) for doc in documents]
+        self._lengths = [sum(doc.values()) for doc in self._docs]
+        self._avg_length = (
+            sum(self._lengths) / len(self._lengths) if self._lengths else 0.0
+        )
+        frequencies = Counter(term for doc in self._docs for term in doc)
+        total = len(self._docs)
+        self._idf = {
+            term: math.log(1 + (total - freq + 0.5) / (freq + 0.5))
+            for term, freq in frequencies.items()
+        }
+
+    def scores(self, query: str) -> list[float]:
+        terms = set(tokenize(query))
+        scores = []
+        for doc, length in zip(self._docs, self._lengths):
+            score = 0.0
+            for term in terms:
+                tf = doc.get(term)
+                if not tf:
+                    continue
+                norm = self.k1 * (1 - self.b + self.b * length / self._avg_length)
+                score += self._idf[term] * tf * (self.k1 + 1) / (tf + norm)
+            scores.append(score)
+        return scores
+
+    def search(self, query: str, k: int) -> list[tuple[int, float]]:
+        """Return the (document index, score) of the top-k matching documents."""
+        ranked = sorted(enumerate(self.scores(query)), key=lambda x: x[1], reverse=True)
+        return [(i, score) for i, score in ranked[:k] if score > 0]
+
+
+@dataclass
+class TableDoc:
+    """Searchable description of a single table."""
+
+    name: str
+    columns: list[str]
+    comment: str = ""
+    column_comments: list[str] = field(default_factory=list)
+    foreign_keys: set[str] = field(default_factory=set)
+
+    def text(self) -> str:
+        return " ".join(
+            [self.name, self.name, *self.columns, self.comment, *self.column_comments]
+        )
+
+
+class SchemaIndex:
+    """
+    Selects the tables relevant to a question.
+
+    Tables are ranked by BM25 over their names, columns and comments, and
+    optionally re-ranked with embedding similarity. The top-k tables are
+    expanded with their foreign-key neighbours so joins stay possible.
+    """
+
+    def __init__(self, tables: list[TableDoc], embedder: Optional[Embedder] = None):
+        self.tables = tables
+        self.embedder = embedder
+        self._bm25 = BM25Index([table.text() for table in tables])
+        # One batch, not a round-trip per table
+        self._vectors = (
+            embedder.embed_documents([table.text() for table in tables])
+            if embedder
+            else None
+        )
+
+        # Foreign keys are followed in both directions
+        self._neighbours: dict[str, set[str]] = {t.name: set() for t in tables}
+        for table in tables:
+            for target in table.foreign_keys:
+                if target in self._neighbours:
+                    self._neighbours[table.name].add(target)
+                    self._neighbours[target].add(table.name)
+
+    def _rank(self, question: str, vector: Optional[list[float]]) -> list[int]:
+        scores = self._bm25.scores(question)
+        top = max(scores, default=0.0)
+        if top > 0:
+            scores = [score / top for score in scores]
+        if vector is not None and self._vectors is not None:
+            scores = [
+                score + cosine_similarity(vector, table_vector)
+                for score, table_vector in zip(scores, self._vectors)
+            ]
+        ranked = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)
+        return [i for i in ranked if scores[i] > 0]
+
+    def select(
+        self, question: str, k: int, vector: Optional[list[float]] = None
+    ) -> list[str]:
+        """
+        Return the names of the top-k relevant tables plus their FK neighbours.
+
+        An empty list means nothing matched and the caller should fall back
+        to the full schema.
+        """
+        selected = [self.tables[i].name for i in self._rank(question, vector)[:k]]
+        expanded = list(selected)
+        for name in selected:
+            for neighbour in sorted(self._neighbours[name]):
+                if neighbour not in expanded:
+                    expanded.append(neighbour)
+        return expanded
+
+    async def aselect(self, question: str, k: int) -> list[str]:
+        vector = await self.embedder.aembed(question) if self.embedder else None
+        return self.select(question, k, vector)
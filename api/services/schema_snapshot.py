@@ -0,0 +1,86 @@
+"""
+On-disk snapshot of introspected schema information for fast cold starts.
+"""
+
+import json
+import os
+from dataclasses import asdict
+from typing import Optional
+
+from api.core.logging import logger
+from api.services.schema_index import TableDoc
+
+SNAPSHOT_FORMAT_VERSION = 1
+
+
+def save_snapshot(
+    path: str,
+    database: str,
+    table_fingerprints: dict[str, str],
+    table_infos: dict[str, str],
+    table_docs: dict[str, TableDoc],
+):
+    """Atomically write the per-table schema info to `path`."""
+    tables = {
+        name: {
+            "fingerprint": table_fingerprints[name],
+            "info": info,
+            "doc": {
+                **asdict(table_docs[name]),
+                "foreign_keys": sorted(table_docs[name].foreign_keys),
+            },
+        }
+        for name, info in table_infos.items()
+        if name in table_fingerprints and name in table_docs
+    }
+    snapshot = {
+        "format": SNAPSHOT_FORMAT_VERSION,
+        "database": database,
+        "tables": tables,
+    }
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(snapshot, f, separators=(",", ":"))
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.warning(f"Could not write schema snapshot {path}: {str(e)}")
+
+
+def load_snapshot(
+    path: str, database: str, table_fingerprints: dict[str, str]
+) -> Optional[tuple[dict[str, str], dict[str, TableDoc]]]:
+    """
+    Load per-table info and docs from `path`.
+
+    Only tables whose fingerprint still matches the live catalog are
+    returned, so a partially stale snapshot is still useful.
+    """
+    try:
+        with open(path, encoding="utf-8") as f:
+            snapshot = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable schema snapshot {path}: {str(e)}")
+        return None
+
+    if (
+        snapshot.get("format") != SNAPSHOT_FORMAT_VERSION
+        or snapshot.get("database") != database
+    ):
+        return None
+
+    table_infos, table_docs = {}, {}
+    for name, entry in snapshot["tables"].items():
+        if table_fingerprints.get(name) != entry["fingerprint"]:
+            continue
+        doc = entry["doc"]
+        doc["foreign_keys"] = set(doc["foreign_keys"])
+        table_infos[name] = entry["info"]
+        table_docs[name] = TableDoc(**doc)
+    return table_infos, table_docs
@@ -0,0 +1,96 @@
+"""
+The SQLDatabase internals the services depend on, behind one adapter.
+
+LangChain's SQLDatabase has no public API for its engine, for refreshing
+its table list or for reflecting and dropping single tables in its
+MetaData. Everything that needs them goes through `SQLDatabaseAdapter`,
+which checks the private attributes when it is created, so an incompatible
+langchain-community release fails at startup rather than mid-request.
+"""
+
+import threading
+from typing import Iterable, Optional
+
+from langchain_community.utilities.sql_database import SQLDatabase
+from sqlalchemy import Table
+from sqlalchemy.engine import Engine
+
+# Private SQLDatabase attributes used below, as of langchain-community 0.3/0.4
+_REQUIRED_ATTRIBUTES = (
+    "_engine",
+    "_schema",
+    "_inspector",
+    "_all_tables",
+    "_metadata",
+    "_view_support",
+)
+
+
+class SQLDatabaseAdapter:
+    """
+    Engine access, table list refresh and per-table reflection for `db`.
+
+    MetaData is not thread-safe, so every reflection and removal holds
+    `lock`; callers hold it too when several steps must happen together.
+    """
+
+    def __init__(self, db: SQLDatabase, lock: Optional[threading.RLock] = None):
+        missing = [name for name in _REQUIRED_ATTRIBUTES if not hasattr(db, name)]
+        if missing:
+            raise RuntimeError(
+                "Unsupported langchain-community release, SQLDatabase has no "
+                f"{', '.join(missing)}"
+            )
+        self.db = db
+        self.lock = lock or threading.RLock()
+
+    @property
+    def engine(self) -> Engine:
+        return self.db._engine
+
+    def table_info(self, table: str) -> str:
+        """DDL and sample rows of `table`, as SQLDatabase renders them."""
+        with self.lock:
+            return self.db.get_table_info_no_throw([table]).strip()
+
+    def reflected(self, table: str) -> Optional[Table]:
+        """`table` if it has been reflected, else None."""
+        schema = self.db._schema
+        with self.lock:
+            return self.db._metadata.tables.get(f"{schema}.{table}" if schema else table)
+
+    def reflect(self, table_names: list[str]) -> dict[str, Table]:
+        """Reflect those of `table_names` not reflected yet; return all that were found."""
+        metadata = self.db._metadata
+        with self.lock:
+            reflected = {table.name for table in metadata.sorted_tables}
+            missing = [name for name in table_names if name not in reflected]
+            if missing:
+                metadata.reflect(
+                    views=self.db._view_support,
+                    bind=self.db._engine,
+                    only=missing,
+                    schema=self.db._schema,
+                )
+            return {
+                table.name: table
+                for table in metadata.sorted_tables
+                if table.name in table_names
+            }
+
+    def refresh_tables(self, forget: Iterable[str] = ()):
+        """Re-read the table list and drop the reflected metadata of `forget`."""
+        forget = set(forget)
+        schema = self.db._schema
+        with self.lock:
+            inspector = self.db._inspector
+            inspector.clear_cache()
+            names = list(inspector.get_table_names(schema=schema))
+            if self.db._view_support:
+                names += inspector.get_view_names(schema=schema)
+                names += inspector.get_materialized_view_names(schema=schema)
+            self.db._all_tables = set(names)
+            metadata = self.db._metadata
+            for table in list(metadata.sorted_tables):
+                if table.name in forget:
+                    metadata.remove(table)
@@ -5,30 +5,146 @@ from langchain_community.tools.sql_database.tool import (
     ListSQLDatabaseTool,
 )
 from langchain.tools import BaseTool
-from typing import List
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForToolRun,
+    CallbackManagerForToolRun,
+)
+from langchain_core.runnables.config import run_in_executor
+from contextvars import ContextVar
+from pydantic import Field
+from sqlalchemy import text
+from typing import List, NamedTuple, Optional
 import re
+import time
+
+from api.core.config import settings
+from api.core.tracing import record_span
+
+from api.services.async_database import AsyncDatabase
+from api.services.query_cache import QueryResultCache
+from api.services.query_guard import QueryGuard
+from api.services.result_encoder import FETCH_BATCH_SIZE, RawResult, encode_rows
+from api.services.schema_cache import SchemaCache
+from api.services.sql_database import SQLDatabaseAdapter
+from api.services.sql_validator import get_validator
+
+class ExecutedQuery(NamedTuple):
+    query: str  # as the agent wrote it, before the automatic LIMIT
+    result: str  # the text the agent saw
+    raw: Optional[RawResult] = None  # the actual rows, if capture_rows is set
+
+
+# Queries successfully executed during the current agent run. The caller
+# sets a fresh list; tool tasks inherit a reference to it.
+executed_queries: ContextVar[Optional[list[ExecutedQuery]]] = ContextVar(
+    "executed_queries", default=None
+)
+# Whether executed queries also keep their unencoded rows, e.g. for batch
+# results. Such queries bypass result cache reads, which only hold text.
+capture_rows: ContextVar[bool] = ContextVar("capture_rows", default=False)
+
+
+def _record_query(query: str, result: str, raw: Optional[RawResult] = None):
+    log = executed_queries.get()
+    if log is not None:
+        log.append(ExecutedQuery(query, result, raw))
 
 
 class CustomQuerySQLDataBaseTool(QuerySQLDataBaseTool):
     """Custom tool that returns only results, not SQL queries."""
 
+    database: SQLDatabaseAdapter = Field(exclude=True)
+    async_db: Optional[AsyncDatabase] = Field(default=None, exclude=True)
+    query_guard: Optional[QueryGuard] = Field(default=None, exclude=True)
+    result_cache: Optional[QueryResultCache] = Field(default=None, exclude=True)
+
     def _run(self, query: str) -> str:
         """Execute SQL and return ONLY results, not the query itself."""
         query = self._clean_query(query)
 
-        if not self._is_safe_query(query):
-            return "Error: Only SELECT queries are allowed for security reasons."
+        reason = self._check_query(query)
+        if reason is not None:
+            return f"Error: Only read-only SELECT queries are allowed ({reason})."
+        written = query
+        query = self._limit_query(query)
+
+        try:
+            raw = RawResult() if capture_rows.get() else None
+            cache = self.result_cache
+            result = cache.get(query) if cache and raw is None else None
+            if result is None:
+                result = self._execute(query, raw)
+                if cache:
+                    cache.set(query, result)
+
+            if not result or result.strip() == "":
+                result = "No results found."
+
+            _record_query(written, result, raw)
+            return result
+        except Exception as e:
+            return f"Error executing query: {str(e)}"
+
+    async def _arun(
+        self,
+        query: str,
+        run_manager: Optional[AsyncCallbackManagerForToolRun] = None,
+    ) -> str:
+        """Execute SQL on the async pool without blocking the event loop."""
+        if self.async_db is None:
+            return await run_in_executor(None, self._run, query)
+
+        query = self._clean_query(query)
+
+        reason = self._check_query(query)
+        if reason is not None:
+            return f"Error: Only read-only SELECT queries are allowed ({reason})."
+        written = query
+        query = self._limit_query(query)
 
         try:
-            result = self.db.run(query)
+            raw = RawResult() if capture_rows.get() else None
+            cache = self.result_cache
+            result = await cache.aget(query) if cache and raw is None else None
+            if result is None:
+                result = await self.async_db.run(query, raw=raw)
+                if cache:
+                    await cache.aset(query, result)
 
             if not result or result.strip() == "":
-                return "No results found."
+                result = "No results found."
 
+            _record_query(written, result, raw)
             return result
         except Exception as e:
             return f"Error executing query: {str(e)}"
 
+    def _execute(self, query: str, raw: Optional[RawResult] = None) -> str:
+        """Stream rows through a server-side cursor into capped TSV."""
+        start = time.perf_counter()
+        with self.database.engine.connect() as connection:
+            record_span("db_acquire", start)
+            start = time.perf_counter()
+            connection = connection.execution_options(
+                stream_results=True, max_row_buffer=FETCH_BATCH_SIZE
+            )
+            with connection.begin():
+                if self.query_guard is not None:
+                    self.query_guard.check(connection, query)
+                    start = time.perf_counter()
+                result = connection.execute(text(query))
+                record_span("db_execute", start)
+                if not result.returns_rows:
+                    return ""
+                start = time.perf_counter()
+                try:
+                    return encode_rows(
+                        list(result.keys()), result.partitions(FETCH_BATCH_SIZE), raw
+                    )
+                finally:
+                    result.close()
+                    record_span("db_fetch", start)
+
     def _clean_query(self, query: str) -> str:
         """Clean SQL query from markdown and formatting."""
         query = re.sub(r"```sql\s*", "", query, flags=re.IGNORECASE)
@@ -36,58 +152,133 @@ class CustomQuerySQLDataBaseTool(QuerySQLDataBaseTool):
         query = re.sub(r"^(SQL Query:|Query:)\s*", "", query, flags=re.IGNORECASE)
         return query.strip().rstrip(";")
 
-    def _is_safe_query(self, query: str) -> bool:
-        """Validate query is safe (SELECT only)."""
-        query_upper = query.strip().upper()
-
-        dangerous = [
-            "DROP",
-            "DELETE",
-            "UPDATE",
-            "INSERT",
-            "TRUNCATE",
-            "ALTER",
-            "CREATE",
-            "REPLACE",
-            "MERGE",
-            "GRANT",
-            "REVOKE",
-            "EXEC",
-            "EXECUTE",
-        ]
+    def _check_query(self, query: str) -> Optional[str]:
+        """Return why the query is not a safe read-only statement, or None."""
+        return get_validator(self.db.dialect).check(query)
+
+    def check(self, query: str) -> Optional[str]:
+        """Why the tool would refuse to run `query`, or None, without running it."""
+        return self._check_query(self._clean_query(query))
+
+    def _limit_query(self, query: str) -> str:
+        """
+        Bound queries without a LIMIT to the rows the result encoder can use:
+        the rows it returns plus the rows it counts for the truncation marker.
+        """
+        if not settings.sql_auto_limit:
+            return query
+        limit = settings.sql_max_rows + settings.sql_truncated_count_limit
+        return get_validator(self.db.dialect).with_limit(query, limit)
+
+
+class CustomListSQLDatabaseTool(ListSQLDatabaseTool):
+    """Table list tool served from the schema cache."""
+
+    schema_cache: SchemaCache = Field(exclude=True)
+
+    def _run(
+        self,
+        tool_input: str = "",
+        run_manager: Optional[CallbackManagerForToolRun] = None,
+    ) -> str:
+        return self.schema_cache.table_list()
 
-        return not any(
-            re.search(rf"\b{keyword}\b", query_upper) for keyword in dangerous
+    async def _arun(
+        self,
+        tool_input: str = "",
+        run_manager: Optional[AsyncCallbackManagerForToolRun] = None,
+    ) -> str:
+        # Usable table names are held in memory, there is no I/O to wait on
+        return self._run(tool_input)
+
+
+class CustomInfoSQLDatabaseTool(InfoSQLDatabaseTool):
+    """Schema tool served from the schema cache."""
+
+    schema_cache: SchemaCache = Field(exclude=True)
+    output_format: str = "compact"
+
+    @staticmethod
+    def _split(table_names: str) -> list[str]:
+        return [name.strip() for name in table_names.split(",") if name.strip()]
+
+    def _run(
+        self,
+        table_names: str,
+        run_manager: Optional[CallbackManagerForToolRun] = None,
+    ) -> str:
+        return self.schema_cache.describe(self._split(table_names), self.output_format)
+
+    async def _arun(
+        self,
+        table_names: str,
+        run_manager: Optional[AsyncCallbackManagerForToolRun] = None,
+    ) -> str:
+        """
+        Cached tables are answered inline; otherwise reflection and the one
+        batched sample-row query run on a worker thread.
+        """
+        names = self._split(table_names)
+        if self.schema_cache.is_cached(names, self.output_format):
+            return self._run(table_names)
+        return await run_in_executor(
+            None, self.schema_cache.describe, names, self.output_format
         )
 
 
 class CustomSQLDatabaseToolkit(SQLDatabaseToolkit):
     """Custom toolkit with tools that don't expose SQL queries."""
 
+    database: Optional[SQLDatabaseAdapter] = Field(default=None, exclude=True)
+    async_db: Optional[AsyncDatabase] = Field(default=None, exclude=True)
+    query_guard: Optional[QueryGuard] = Field(default=None, exclude=True)
+    result_cache: Optional[QueryResultCache] = Field(default=None, exclude=True)
+    schema_cache: Optional[SchemaCache] = Field(default=None, exclude=True)
+
     def get_tools(self) -> List[BaseTool]:
         """Get tools with custom query tool that hides SQL."""
+        database = self.database or SQLDatabaseAdapter(self.db)
+        schema_cache = self.schema_cache or SchemaCache(
+            database, sample_rows=settings.schema_tool_sample_rows
+        )
 
-        query_tool = CustomQuerySQLDataBaseTool(db=self.db)
+        query_tool = CustomQuerySQLDataBaseTool(
+            db=self.db,
+            database=database,
+            async_db=self.async_db,
+            query_guard=self.query_guard,
+            result_cache=self.result_cache,
+        )
         query_tool.name = "sql_db_query"
         query_tool.description = (
             "Execute a SQL query against the database and get back results. "
             "Input should be a valid SQL SELECT query. "
-            "Returns only the query results."
+            "Returns only the query results as tab-separated rows with a header "
+            "line; large results are truncated, so aggregate or filter when you "
+            "need to look at many rows."
         )
 
-        list_tables_tool = ListSQLDatabaseTool(db=self.db)
+        list_tables_tool = CustomListSQLDatabaseTool(db=self.db, schema_cache=schema_cache)
         list_tables_tool.description = (
             "List available tables in the database. "
             "Use this to see what data is available. "
             "Input is an empty string."
         )
 
-        schema_tool = InfoSQLDatabaseTool(db=self.db)
+        schema_tool = CustomInfoSQLDatabaseTool(
+            db=self.db,
+            schema_cache=schema_cache,
+            output_format=settings.schema_tool_format,
+        )
         schema_tool.description = (
             "Get schema information for specified tables. "
             "Input is a comma-separated list of table names. "
             "Use this to understand table structure before querying."
         )
+        if settings.schema_tool_format == "compact":
+            schema_tool.description += (
+                " Lists each column with its type, PK/FK markers and sample values."
+            )
 
         return [
             query_tool,
@@ -0,0 +1,207 @@
+"""
+Read-only validation of agent SQL.
+
+Queries are parsed with sqlglot rather than scanned for keywords, so column
+names such as `created_at_update` are allowed while stacked statements,
+data-modifying CTEs and side-effecting functions are not.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import NamedTuple, Optional
+
+import sqlglot
+from sqlglot import exp
+from sqlglot.errors import ParseError
+
+from api.core.config import settings
+from api.core.metrics import metrics
+
+sql_rejections = metrics.counter(
+    "nl2sql_sql_rejected_total", "Agent SQL rejected by the validator, by reason"
+)
+
+# SQLAlchemy dialect names that differ from sqlglot's
+_DIALECTS = {"postgresql": "postgres", "mssql": "tsql"}
+
+# exp.Alter replaced exp.AlterTable in sqlglot 25.20
+_ALTER = getattr(exp, "Alter", None) or exp.AlterTable
+
+# exp.SetOperation only exists from sqlglot 25.2; before that Intersect and
+# Except subclass Union
+_SET_OPERATIONS = (exp.Union, exp.Intersect, exp.Except)
+
+# Nodes that write, lock or change session state wherever they appear,
+# including inside CTEs (`WITH x AS (DELETE ... RETURNING *) SELECT ...`)
+_WRITE_NODES = (
+    exp.Insert,
+    exp.Update,
+    exp.Delete,
+    exp.Merge,
+    exp.Create,
+    exp.Drop,
+    _ALTER,
+    exp.TruncateTable,
+    exp.Copy,
+    exp.Into,
+    exp.Lock,
+    exp.Set,
+    exp.Command,
+)
+
+BLOCKED_FUNCTIONS = frozenset(
+    {
+        # Stall or kill sessions
+        "pg_sleep",
+        "pg_sleep_for",
+        "pg_sleep_until",
+        "pg_cancel_backend",
+        "pg_terminate_backend",
+        "pg_reload_conf",
+        "pg_rotate_logfile",
+        # Server filesystem
+        "pg_read_file",
+        "pg_read_binary_file",
+        "pg_ls_dir",
+        "pg_stat_file",
+        # Other connections and session state
+        "dblink",
+        "dblink_exec",
+        "dblink_connect",
+        "set_config",
+        "pg_notify",
+        # Sequences
+        "nextval",
+        "setval",
+        # SQLite
+        "load_extension",
+    }
+)
+
+# Whole function families, matched by prefix: advisory locks (every
+# lock/unlock/try/shared/xact variant) and large objects
+BLOCKED_FUNCTION_PREFIXES = ("pg_advisory_", "pg_try_advisory_", "lo_")
+
+# query_to_xml(), cursor_to_xml() and the rest of the *_to_xml* family run
+# the SQL string they are given, which the validator cannot see
+BLOCKED_FUNCTION_INFIXES = ("_to_xml",)
+
+
+def is_blocked_function(name: str) -> bool:
+    return (
+        name in BLOCKED_FUNCTIONS
+        or name.startswith(BLOCKED_FUNCTION_PREFIXES)
+        or any(infix in name for infix in BLOCKED_FUNCTION_INFIXES)
+    )
+
+
+class Verdict(NamedTuple):
+    reason: Optional[str]  # why the query is not allowed, None if it is
+    needs_limit: bool  # a plain SELECT or set operation without a row bound
+    tables: frozenset[str] = frozenset()  # lowercased names of the tables read
+
+
+def _function_name(node: exp.Func) -> str:
+    if isinstance(node, exp.Anonymous):
+        return node.name.lower()
+    return node.sql_name().lower()
+
+
+class SQLValidator:
+    """
+    Checks that a query is a single read-only statement.
+
+    Verdicts are kept in an LRU keyed by a digest of the query text, since
+    the agent tends to re-run the same queries and parsing dominates the
+    cost of a check.
+    """
+
+    def __init__(self, dialect: Optional[str] = None, max_entries: int = 1024):
+        self.dialect = _DIALECTS.get(dialect, dialect) if dialect else None
+        self.max_entries = max_entries
+        self._verdicts: OrderedDict[bytes, Verdict] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def check(self, query: str) -> Optional[str]:
+        """Return why `query` is not allowed, or None if it is."""
+        return self.verdict(query).reason
+
+    def tables(self, query: str) -> frozenset[str]:
+        """
+        Lowercased names of the tables `query` reads, wherever they appear:
+        comma joins, subqueries and CTE bodies, without schema or quotes.
+        """
+        return self.verdict(query).tables
+
+    def with_limit(self, query: str, limit: int) -> str:
+        """Append `LIMIT limit` to an allowed query that has no row bound."""
+        verdict = self.verdict(query)
+        if verdict.reason is not None or not verdict.needs_limit:
+            return query
+        # On its own line so a trailing comment cannot swallow it
+        return f"{query}\nLIMIT {int(limit)}"
+
+    def verdict(self, query: str) -> Verdict:
+        key = hashlib.blake2b(query.encode("utf-8"), digest_size=16).digest()
+        with self._lock:
+            if key in self._verdicts:
+                self._verdicts.move_to_end(key)
+                return self._verdicts[key]
+
+        verdict = self._verdict(query)
+        if verdict.reason is not None:
+            sql_rejections.inc(reason=verdict.reason.split(":")[0])
+
+        with self._lock:
+            self._verdicts[key] = verdict
+            while len(self._verdicts) > self.max_entries:
+                self._verdicts.popitem(last=False)
+        return verdict
+
+    def _verdict(self, query: str) -> Verdict:
+        try:
+            statements = [
+                statement
+                for statement in sqlglot.parse(query, read=self.dialect)
+                if statement is not None
+            ]
+        except ParseError:
+            return Verdict("parse_error: the query could not be parsed", False)
+
+        if len(statements) != 1:
+            return Verdict("multiple_statements: only a single statement is allowed", False)
+        statement = statements[0]
+
+        if not isinstance(statement, exp.Query):
+            return Verdict(
+                f"not_select: {statement.key.upper()} statements are not allowed", False
+            )
+
+        # Parenthesized queries are left alone; SQLite cannot LIMIT them
+        needs_limit = isinstance(statement, (exp.Select, *_SET_OPERATIONS)) and not any(
+            statement.args.get(arg) for arg in ("limit", "fetch", "offset")
+        )
+        tables = set()
+        for node in statement.walk():
+            if isinstance(node, _WRITE_NODES):
+                return Verdict(f"write: {node.key.upper()} is not allowed", needs_limit)
+            if isinstance(node, exp.Table) and node.name:
+                tables.add(node.name.lower())
+            elif isinstance(node, exp.Func):
+                name = _function_name(node)
+                if is_blocked_function(name):
+                    return Verdict(f"blocked_function: {name}() is not allowed", needs_limit)
+        # References to CTEs are not tables
+        tables -= {cte.alias_or_name.lower() for cte in statement.find_all(exp.CTE)}
+        return Verdict(None, needs_limit, frozenset(tables))
+
+    def __len__(self) -> int:
+        return len(self._verdicts)
+
+
+@lru_cache(maxsize=None)
+def get_validator(dialect: Optional[str] = None) -> SQLValidator:
+    """Shared validator for a SQLAlchemy or sqlglot dialect name."""
+    return SQLValidator(dialect, settings.sql_validator_cache_size)
@@ -0,0 +1,198 @@
+"""
+Server-Sent Events framing for chat responses.
+
+Frames stay compatible with the client's `data: {json}` parser; only the
+fields that change are sent on every frame.
+"""
+
+import asyncio
+import time
+from typing import Any, AsyncIterator, Callable, Optional
+
+try:
+    import orjson
+
+    def _dumps(value: Any) -> bytes:
+        return orjson.dumps(value)
+
+except ImportError:
+    import json
+
+    def _dumps(value: Any) -> bytes:
+        return json.dumps(value, separators=(",", ":")).encode("utf-8")
+
+
+_TOKEN_PREFIX = b'data: {"token":'
+_FRAME_SUFFIX = b"}\n\n"
+
+
+class SSEEncoder:
+    """
+    Encodes the frames of one chat response.
+
+    The model name goes out with the first frame only and token frames
+    leave out `done`, which the client treats as false when absent.
+    """
+
+    def __init__(self, model: str):
+        self.model = model
+        self._model_field = b',"model":' + _dumps(model)
+        self._model_sent = False
+
+    def _static_fields(self) -> bytes:
+        if self._model_sent:
+            return b""
+        self._model_sent = True
+        return self._model_field
+
+    def token(self, text: str) -> bytes:
+        return _TOKEN_PREFIX + _dumps(text) + self._static_fields() + _FRAME_SUFFIX
+
+    def tool(self, tool_name: str, content: str, tool_call_id: str) -> bytes:
+        return (
+            _TOKEN_PREFIX
+            + _dumps(content)
+            + b',"tool_name":'
+            + _dumps(tool_name)
+            + b',"tool_call_id":'
+            + _dumps(tool_call_id)
+            + self._static_fields()
+            + _FRAME_SUFFIX
+        )
+
+    def done(self, **fields) -> bytes:
+        return b"data: " + _dumps(
+            {"done": True, "token": "", "model": self.model, **fields}
+        ) + b"\n\n"
+
+
+class TokenBuffer:
+    """
+    Collects model tokens until `window` seconds have passed since the
+    first buffered token or `max_bytes` have accumulated.
+    """
+
+    def __init__(self, window: float, max_bytes: int):
+        self.window = window
+        self.max_bytes = max_bytes
+        self._parts: list[str] = []
+        self._size = 0
+        self._started_at = 0.0
+
+    def __bool__(self) -> bool:
+        return bool(self._parts)
+
+    def add(self, text: str):
+        if not self._parts:
+            self._started_at = time.perf_counter()
+        self._parts.append(text)
+        self._size += len(text)
+
+    def full(self) -> bool:
+        return self._size >= self.max_bytes or self.remaining() == 0.0
+
+    def remaining(self) -> Optional[float]:
+        """Seconds until the buffer is due, or None when it is empty."""
+        if not self._parts:
+            return None
+        return max(0.0, self.window - (time.perf_counter() - self._started_at))
+
+    def flush(self) -> str:
+        text = "".join(self._parts)
+        self._parts = []
+        self._size = 0
+        return text
+
+
+class ToolResultOrder:
+    """
+    Releases tool results in the order the model made the calls.
+
+    Tool calls of one model turn run concurrently and finish in any order;
+    results are held back until every earlier call of the turn has
+    returned, so clients always see the same sequence. Results for calls
+    that were never announced are released right away.
+
+    Not every announced call returns a result: calls whose arguments do
+    not parse are never run. Tools only run once the model message that
+    made the calls is complete, so the start of the next model message
+    releases whatever the turn still holds back.
+    """
+
+    def __init__(self):
+        self._pending: list[str] = []
+        self._ready: dict[str, Any] = {}
+        self._message_id: Optional[str] = None
+
+    def message(self, message_id: Optional[str]) -> list:
+        """Note the model message being streamed, return results now due."""
+        if message_id == self._message_id:
+            return []
+        self._message_id = message_id
+        return self.drain()
+
+    def expect(self, tool_call_id: str):
+        if tool_call_id not in self._pending:
+            self._pending.append(tool_call_id)
+
+    def release(self, tool_call_id: str, item: Any) -> list:
+        """Record a result, return the results that are now due."""
+        if tool_call_id not in self._pending:
+            return [item]
+        self._ready[tool_call_id] = item
+        due = []
+        while self._pending and self._pending[0] in self._ready:
+            due.append(self._ready.pop(self._pending.pop(0)))
+        return due
+
+    def drain(self) -> list:
+        """Every result still held back, in call order."""
+        due = [self._ready.pop(call_id) for call_id in self._pending if call_id in self._ready]
+        self._pending = []
+        return due
+
+
+_DONE = object()
+
+
+async def with_timeouts(
+    source: AsyncIterator, timeout: Callable[[], Optional[float]]
+) -> AsyncIterator:
+    """
+    Re-yield items from `source`, yielding None whenever `timeout()` seconds
+    pass without a new item (never, while `timeout()` is None).
+
+    `source` is consumed by a separate task so that timing out never
+    interrupts it. The task is cancelled if the consumer stops early.
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def pump():
+        try:
+            async for item in source:
+                await queue.put((item, None))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            await queue.put((_DONE, e))
+            return
+        finally:
+            if hasattr(source, "aclose"):
+                await source.aclose()
+        await queue.put((_DONE, None))
+
+    task = asyncio.create_task(pump())
+    try:
+        while True:
+            try:
+                item, error = await asyncio.wait_for(queue.get(), timeout())
+            except asyncio.TimeoutError:
+                yield None
+                continue
+            if item is _DONE:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        task.cancel()
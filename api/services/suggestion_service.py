@@ -2,11 +2,14 @@
 Service for generating query suggestions based on database schema.
 """
 
-from langchain_openai import ChatOpenAI
+import asyncio
+import time
+from typing import Optional
 
 from api.core.config import settings
 from api.core.logging import logger
-from api.services.database_service import database_service
+from api.services.database_service import DatabaseService
+from api.services.llm import get_llm_registry
 from api.prompts.prompts import get_suggestion_generation_prompt
 from api.models.chat import SuggestionsResponse
 
@@ -14,18 +17,19 @@ from api.models.chat import SuggestionsResponse
 class SuggestionService:
     """Service for generating database query suggestions."""
 
-    def __init__(self):
+    def __init__(self, database_service: DatabaseService):
         """Initialize the suggestion service."""
-        self.llm = ChatOpenAI(
-            model=settings.openai_model,
-            temperature=settings.openai_temperature,
-            max_tokens=settings.openai_max_tokens,
-            openai_api_key=settings.openai_api_key,
-            streaming=False,
-            max_retries=0,
+        self.database_service = database_service
+        self.llm = get_llm_registry().chat_model(
+            max_tokens=settings.openai_max_tokens, streaming=False
         )
+        # (schema_version, suggestions, generated_at)
+        self._cache: Optional[tuple[int, list, float]] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+        # When the last generation failed, None after a success
+        self._failed_at: Optional[float] = None
 
-    def generate_suggestions(self):
+    async def generate_suggestions(self):
         """
         Generate 5 query suggestions based on the database schema.
 
@@ -34,8 +38,10 @@ class SuggestionService:
         """
         try:
             # Get table information
-            table_info = database_service.get_db_info()
-            usable_tables = database_service.get_usable_tables()
+            table_info = await asyncio.to_thread(self.database_service.get_db_info)
+            usable_tables = await asyncio.to_thread(
+                self.database_service.get_usable_tables
+            )
 
             if not table_info:
                 logger.warning("No table information available")
@@ -45,7 +51,7 @@ class SuggestionService:
             suggestion_prompt = get_suggestion_generation_prompt()
             suggestion_chain = suggestion_prompt | structured_llm
 
-            result = suggestion_chain.invoke(
+            result = await suggestion_chain.ainvoke(
                 {
                     "table_info": table_info,
                     "table_names": ", ".join(usable_tables),
@@ -58,6 +64,64 @@ class SuggestionService:
             logger.error(f"Error generating suggestions: {str(e)}")
             return []
 
+    async def _refresh(self):
+        """Regenerate suggestions and store them for the current schema."""
+        schema_version = self.database_service.schema_version
+        suggestions = await self.generate_suggestions()
+        if suggestions:
+            self._cache = (schema_version, suggestions, time.monotonic())
+            self._failed_at = None
+        else:
+            # The previous suggestions, if any, stay cached
+            self._failed_at = time.monotonic()
+        return suggestions
+
+    def _backing_off(self) -> bool:
+        """Whether the last generation failed too recently to try again."""
+        return (
+            self._failed_at is not None
+            and time.monotonic() - self._failed_at < settings.suggestions_retry_seconds
+        )
+
+    def schedule_refresh(self) -> asyncio.Task:
+        """
+        Start a background refresh unless one is already running.
+
+        Concurrent callers share the same task, so at most one LLM call is in
+        flight at a time.
+        """
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._refresh())
+        return self._refresh_task
+
+    async def get_suggestions(self):
+        """
+        Return cached suggestions, refreshing them stale-while-revalidate.
+
+        Only a cold cache waits for the LLM; expired suggestions or ones
+        generated for an older schema version are served while a background
+        refresh replaces them. After a failed generation no new one starts
+        for `suggestions_retry_seconds`.
+        """
+        if self._cache is None:
+            if self._backing_off():
+                return []
+            return await asyncio.shield(self.schedule_refresh())
+
+        schema_version, suggestions, generated_at = self._cache
+        is_expired = (
+            time.monotonic() - generated_at > settings.suggestions_ttl_seconds
+        )
+        if (
+            schema_version != self.database_service.schema_version or is_expired
+        ) and not self._backing_off():
+            self.schedule_refresh()
+        return suggestions
+
+    async def shutdown(self):
+        """Cancel a running refresh."""
+        task = self._refresh_task
+        if task is not None and not task.done():
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
 
-# Global service instance
-suggestion_service = SuggestionService()
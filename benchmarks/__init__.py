@@ -0,0 +1,6 @@
+"""
+Benchmarks for the NL2SQL API.
+
+They drive the real application with a deterministic fake chat model, so
+results depend on the code under test rather than on OpenAI latency.
+"""
@@ -0,0 +1,550 @@
+"""
+Load test for POST /api/v1/chat.
+
+Serves the real application (`api.main.create_app`) with uvicorn in this
+process, swaps the chat model for a scripted fake and opens N concurrent
+SSE streams against it:
+
+    python -m benchmarks.chat --concurrency 1 8 32 --output baseline.json
+    python -m benchmarks.chat --concurrency 1 8 32 --compare baseline.json
+    python -m benchmarks.chat --mode agent direct
+    python -m benchmarks.chat --llm stub
+    python -m benchmarks.chat --llm stub --turns 4 --prune-schema --examples
+
+Time-to-first-token, tokens/sec and latency percentiles are measured on the
+client side; peak RSS is sampled for the whole process. LLM calls and
+prompt tokens per question (and the share of them served from the prompt
+cache) are read from the final frame of each response.
+
+With `--llm stub` the chat model is not swapped: the application talks to
+the OpenAI-compatible stub in `benchmarks.llm_stub` through its real LLM
+client, so HTTP pooling and streaming parsing are measured too.
+
+With `--turns N` every conversation asks N questions under one chat_id,
+and the cached token ratio of the follow-up turns is reported on its own:
+it shows whether the system prompt and history stay a cacheable prefix.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import resource
+import socket
+import sys
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Optional
+
+from sqlalchemy.engine import make_url
+
+from benchmarks import fixture
+
+DEFAULT_DB_URL = "sqlite:///.cache/benchmark.sqlite"
+
+QUESTIONS = [
+    "How many products are in each category?",
+    "Which customers placed the most orders?",
+    "What is the average product price per category?",
+    "Which products are out of stock?",
+]
+
+# Few-shot examples for the fixture, seeded with --examples
+EXAMPLES = [
+    {
+        "question": "How many products does each category have?",
+        "sql": "SELECT c.name, COUNT(p.id) FROM categories c "
+        "LEFT JOIN products p ON p.category_id = c.id GROUP BY c.name",
+    },
+    {
+        "question": "Which customers ordered the most items?",
+        "sql": "SELECT c.name, SUM(o.quantity) AS items FROM customers c "
+        "JOIN orders o ON o.customer_id = c.id GROUP BY c.name ORDER BY items DESC",
+    },
+    {
+        "question": "What is the highest product price per category?",
+        "sql": "SELECT c.name, MAX(p.price) FROM categories c "
+        "JOIN products p ON p.category_id = c.id GROUP BY c.name",
+    },
+    {
+        "question": "Which products have no stock left?",
+        "sql": "SELECT name FROM products WHERE stock = 0",
+    },
+]
+EXAMPLES_PATH = ".cache/benchmark_examples.jsonl"
+
+# Metrics where a larger value is worse
+LOWER_IS_BETTER = {"ttft_ms", "latency_ms"}
+
+
+@dataclass
+class StreamResult:
+    latency: float
+    ttft: Optional[float] = None
+    chars: int = 0
+    frames: int = 0
+    llm_calls: int = 0
+    prompt_tokens: int = 0
+    cached_tokens: int = 0
+    mode: str = ""
+    error: str = ""
+    turn: int = 0
+
+    @property
+    def tokens_per_second(self) -> Optional[float]:
+        # Frames may carry several tokens, so tokens are estimated from the
+        # answer length (about four characters per token)
+        if self.ttft is None or self.latency <= self.ttft:
+            return None
+        return self.chars / 4 / (self.latency - self.ttft)
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """Linearly interpolated percentile of `values`."""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    rank = (len(ordered) - 1) * pct / 100
+    lower = int(rank)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (rank - lower)
+
+
+def summarize(values: list[float], scale: float = 1.0) -> dict:
+    if not values:
+        return {}
+    return {
+        "p50": round(percentile(values, 50) * scale, 3),
+        "p95": round(percentile(values, 95) * scale, 3),
+        "p99": round(percentile(values, 99) * scale, 3),
+        "mean": round(sum(values) / len(values) * scale, 3),
+    }
+
+
+class RssSampler:
+    """Tracks the peak resident set size of this process."""
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.peak = 0
+        self._page_size = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 0
+
+    def current(self) -> int:
+        try:
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * self._page_size
+        except (OSError, ValueError, IndexError):
+            # No procfs: fall back to the all-time peak (KiB on Linux, bytes on macOS)
+            maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+    async def run(self):
+        self.peak = self.current()
+        while True:
+            self.peak = max(self.peak, self.current())
+            await asyncio.sleep(self.interval)
+
+
+def cached_token_ratio(results: list[StreamResult]) -> float:
+    """Share of prompt tokens the provider served from its prompt cache."""
+    prompt_tokens = sum(r.prompt_tokens for r in results)
+    return round(sum(r.cached_tokens for r in results) / max(prompt_tokens, 1), 3)
+
+
+async def run_stream(
+    client,
+    question: str,
+    model: str,
+    mode: str = "agent",
+    chat_id: Optional[str] = None,
+) -> StreamResult:
+    """Send one chat request and time its SSE frames."""
+    start = time.perf_counter()
+    result = StreamResult(latency=0.0)
+    try:
+        async with client.stream(
+            "POST",
+            "/api/v1/chat",
+            json={
+                "message": question,
+                "model": model,
+                "chat_id": chat_id or uuid.uuid4().hex,
+                "mode": mode,
+            },
+        ) as response:
+            if response.status_code != 200:
+                result.error = f"HTTP {response.status_code}"
+            else:
+                async for line in response.aiter_lines():
+                    if not line.startswith("data: "):
+                        continue
+                    frame = json.loads(line[len("data: ") :])
+                    result.frames += 1
+                    if frame.get("done"):
+                        result.llm_calls = frame.get("llm_calls", 0)
+                        usage = frame.get("usage") or {}
+                        result.prompt_tokens = usage.get("prompt_tokens", 0)
+                        result.cached_tokens = usage.get("cached_tokens", 0)
+                        result.mode = frame.get("mode", "")
+                        break
+                    if frame.get("tool_name") or not frame.get("token"):
+                        continue
+                    if result.ttft is None:
+                        result.ttft = time.perf_counter() - start
+                    result.chars += len(frame["token"])
+    except Exception as e:
+        result.error = type(e).__name__
+    result.latency = time.perf_counter() - start
+    return result
+
+
+async def run_level(
+    client,
+    concurrency: int,
+    requests: int,
+    model: str,
+    mode: str = "agent",
+    turns: int = 1,
+) -> dict:
+    """
+    Run `requests` chats of `turns` questions each, with at most
+    `concurrency` chats in flight.
+    """
+    pending = iter(range(requests))
+    results: list[StreamResult] = []
+
+    async def worker():
+        for index in pending:
+            chat_id = uuid.uuid4().hex
+            for turn in range(turns):
+                question = QUESTIONS[(index + turn) % len(QUESTIONS)]
+                result = await run_stream(client, question, model, mode, chat_id)
+                result.turn = turn
+                results.append(result)
+
+    sampler = RssSampler()
+    sampler_task = asyncio.create_task(sampler.run())
+    start = time.perf_counter()
+    cpu_start = time.process_time()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    cpu_seconds = time.process_time() - cpu_start
+    sampler_task.cancel()
+
+    ok = [result for result in results if not result.error]
+    return {
+        "mode": mode,
+        "concurrency": concurrency,
+        "requests": len(results),
+        "turns": turns,
+        "errors": len(results) - len(ok),
+        "throughput_rps": round(len(ok) / elapsed, 3) if elapsed else 0.0,
+        "ttft_ms": summarize([r.ttft for r in ok if r.ttft is not None], 1000),
+        "latency_ms": summarize([r.latency for r in ok], 1000),
+        "tokens_per_second": summarize(
+            [r.tokens_per_second for r in ok if r.tokens_per_second is not None]
+        ),
+        "peak_rss_mb": round(sampler.peak / (1024 * 1024), 1),
+        # Server and client share the process, so this is CPU for both ends
+        "cpu_ms_per_request": round(cpu_seconds / max(len(results), 1) * 1000, 3),
+        "frames_per_request": round(
+            sum(r.frames for r in results) / max(len(results), 1), 1
+        ),
+        "llm_calls_per_request": round(
+            sum(r.llm_calls for r in ok) / max(len(ok), 1), 2
+        ),
+        "prompt_tokens_per_request": round(
+            sum(r.prompt_tokens for r in ok) / max(len(ok), 1), 1
+        ),
+        "cached_token_ratio": cached_token_ratio(ok),
+        "follow_up_cached_token_ratio": cached_token_ratio([r for r in ok if r.turn]),
+        # Direct mode requests that the agent answered instead
+        "fallbacks": sum(1 for r in ok if r.mode and r.mode != mode),
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def prepare_fixture(db_url: str, seed: bool):
+    """Seed SQLite fixtures always, other databases only when asked to."""
+    url = make_url(db_url)
+    if url.get_backend_name() == "sqlite":
+        directory = os.path.dirname(url.database or "")
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        fixture.seed(db_url)
+    elif seed:
+        fixture.seed(db_url)
+
+
+def configure_environment(args):
+    """Point the settings at the fixture database before `api` is imported."""
+    os.environ["DATABASE_URL"] = args.db_url
+    os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+    os.environ["SCHEMA_POLL_INTERVAL_SECONDS"] = "0"
+    os.environ["SCHEMA_SNAPSHOT_PATH"] = ""
+    # Identical questions would otherwise be answered from the caches
+    os.environ["ANSWER_CACHE_ENABLED"] = str(args.cache).lower()
+    os.environ["QUERY_CACHE_ENABLED"] = str(args.cache).lower()
+    if args.prune_schema:
+        # The fixture is below the size where the schema is pruned, and
+        # smaller than the number of tables selected per question
+        os.environ["SCHEMA_PRUNING_MIN_TABLES"] = "0"
+        os.environ["SCHEMA_PRUNING_TOP_K"] = "2"
+    if args.examples:
+        os.makedirs(os.path.dirname(EXAMPLES_PATH), exist_ok=True)
+        with open(EXAMPLES_PATH, "w", encoding="utf-8") as f:
+            f.writelines(json.dumps(example) + "\n" for example in EXAMPLES)
+        os.environ["EXAMPLES_SEED_PATH"] = EXAMPLES_PATH
+        os.environ["EXAMPLES_PATH"] = ""
+        os.environ["EXAMPLES_TOP_K"] = "1"
+    if args.llm == "stub":
+        os.environ["LLM_BASE_URL"] = f"http://127.0.0.1:{args.stub_port}/v1"
+
+
+async def serve(app, port: int):
+    """Start uvicorn for `app` in this event loop; return the server and its task."""
+    import uvicorn
+
+    server = uvicorn.Server(
+        uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning")
+    )
+    server_task = asyncio.create_task(server.serve())
+    while not server.started:
+        if server_task.done():
+            server_task.result()
+            raise RuntimeError("Server exited during startup")
+        await asyncio.sleep(0.05)
+    return server, server_task
+
+
+async def benchmark(args) -> list[dict]:
+    import httpx
+
+    from api.main import create_app
+    from api.services import get_ai_service, get_suggestion_service
+    from benchmarks.fake_llm import DEFAULT_TOOL_CALLS, FakeChatModel
+    from benchmarks.llm_stub import StubScript, create_stub_app
+
+    # Per-request logs would dominate the output and the timings
+    logging.getLogger().setLevel(logging.WARNING)
+
+    structured_output = {
+        "SuggestionsResponse": {"suggestions": []},
+        # The query the scripted agent run ends with
+        "GeneratedSQL": {"sql": DEFAULT_TOOL_CALLS[-1][1]["query"]},
+    }
+    stub = None
+    if args.llm == "stub":
+        script = StubScript(
+            structured_output=structured_output,
+            first_token_latency=args.first_token_latency,
+            token_latency=args.token_latency,
+        )
+        stub = await serve(create_stub_app(script), args.stub_port)
+    else:
+        fake = FakeChatModel(
+            first_token_latency=args.first_token_latency,
+            token_latency=args.token_latency,
+            structured_output=structured_output,
+        )
+        get_ai_service().llm_factory = lambda **kwargs: fake
+        get_suggestion_service().llm = fake
+
+    port = free_port()
+    server, server_task = await serve(create_app(), port)
+
+    results = []
+    try:
+        async with httpx.AsyncClient(
+            base_url=f"http://127.0.0.1:{port}",
+            timeout=None,
+            limits=httpx.Limits(max_connections=max(args.concurrency)),
+        ) as client:
+            # Compile the agent and warm the connection pools
+            await run_stream(client, QUESTIONS[0], args.model)
+            for mode in args.mode:
+                for concurrency in args.concurrency:
+                    result = await run_level(
+                        client,
+                        concurrency,
+                        args.requests or concurrency * 4,
+                        args.model,
+                        mode,
+                        args.turns,
+                    )
+                    results.append(result)
+                    print_result(result)
+    finally:
+        server.should_exit = True
+        await server_task
+        if stub is not None:
+            stub[0].should_exit = True
+            await stub[1]
+    return results
+
+
+def print_result(result: dict):
+    ttft, latency = result["ttft_ms"], result["latency_ms"]
+    print(
+        f"{result['mode']:<11} c={result['concurrency']:<4} n={result['requests']:<5} "
+        f"errors={result['errors']:<3} rps={result['throughput_rps']:<8} "
+        f"ttft p50/p95={ttft.get('p50')}/{ttft.get('p95')}ms "
+        f"latency p50/p95/p99={latency.get('p50')}/{latency.get('p95')}/{latency.get('p99')}ms "
+        f"tok/s p50={result['tokens_per_second'].get('p50')} "
+        f"cpu={result['cpu_ms_per_request']}ms/req "
+        f"frames={result['frames_per_request']}/req "
+        f"llm_calls={result['llm_calls_per_request']}/req "
+        f"prompt_tokens={result['prompt_tokens_per_request']}/req "
+        f"cached={result['cached_token_ratio']} "
+        f"follow_up_cached={result.get('follow_up_cached_token_ratio')} "
+        f"fallbacks={result['fallbacks']} "
+        f"rss={result['peak_rss_mb']}MB"
+    )
+
+
+def compare(baseline: dict, results: list[dict], tolerance: float) -> list[str]:
+    """Describe every metric that got worse than `baseline` by more than `tolerance`."""
+    def key(result: dict) -> tuple:
+        return result.get("mode", "agent"), result["concurrency"], result.get("turns", 1)
+
+    previous = {key(result): result for result in baseline["results"]}
+    regressions = []
+    for result in results:
+        before = previous.get(key(result))
+        if before is None:
+            continue
+        label = (
+            f"{result.get('mode', 'agent')} c={result['concurrency']} "
+            f"turns={result.get('turns', 1)}"
+        )
+        checks = [
+            ("ttft_ms", "p95"),
+            ("latency_ms", "p50"),
+            ("latency_ms", "p95"),
+            ("tokens_per_second", "p50"),
+        ]
+        for metric, stat in checks:
+            old = before.get(metric, {}).get(stat)
+            new = result.get(metric, {}).get(stat)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            worse = change > tolerance if metric in LOWER_IS_BETTER else -change > tolerance
+            if worse:
+                regressions.append(
+                    f"{label} {metric}.{stat}: {old} -> {new} ({change:+.1%})"
+                )
+        for metric in (
+            "cpu_ms_per_request",
+            "peak_rss_mb",
+            "llm_calls_per_request",
+            "prompt_tokens_per_request",
+        ):
+            old, new = before.get(metric), result.get(metric)
+            if old and new is not None and new > old * (1 + tolerance):
+                regressions.append(
+                    f"{label} {metric}: {old} -> {new} "
+                    f"({(new - old) / old:+.1%})"
+                )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test POST /api/v1/chat")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument(
+        "--requests", type=int, default=0, help="Requests per level (default 4x concurrency)"
+    )
+    parser.add_argument("--model", default="gpt-4o-mini")
+    parser.add_argument(
+        "--mode",
+        nargs="+",
+        default=["agent"],
+        choices=["agent", "direct", "direct_rows"],
+        help="Chat modes to benchmark, each at every concurrency level",
+    )
+    parser.add_argument(
+        "--llm",
+        choices=["fake", "stub"],
+        default="fake",
+        help="In-process fake chat model, or the OpenAI-compatible stub server",
+    )
+    parser.add_argument("--first-token-latency", type=float, default=0.2)
+    parser.add_argument("--token-latency", type=float, default=0.01)
+    parser.add_argument(
+        "--db-url",
+        default=DEFAULT_DB_URL,
+        help="Database to query; SQLite fixtures are (re)seeded automatically",
+    )
+    parser.add_argument(
+        "--seed", action="store_true", help="(Re)seed the fixture tables at --db-url"
+    )
+    parser.add_argument(
+        "--cache", action="store_true", help="Keep the answer and query caches enabled"
+    )
+    parser.add_argument(
+        "--turns", type=int, default=1, help="Questions per chat_id, asked one after another"
+    )
+    parser.add_argument(
+        "--prune-schema",
+        action="store_true",
+        help="Prune the schema context for the fixture's few tables too",
+    )
+    parser.add_argument(
+        "--examples",
+        action="store_true",
+        help="Seed few-shot examples for the fixture's questions",
+    )
+    parser.add_argument("--output", default="", help="Write results as a JSON baseline")
+    parser.add_argument("--compare", default="", help="Baseline JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10)
+    args = parser.parse_args()
+
+    args.stub_port = free_port()
+    url = make_url(args.db_url)
+    prepare_fixture(args.db_url, args.seed)
+    configure_environment(args)
+    results = asyncio.run(benchmark(args))
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "db_url": url.render_as_string(hide_password=True),
+            "model": args.model,
+            "modes": args.mode,
+            "llm": args.llm,
+            "first_token_latency": args.first_token_latency,
+            "token_latency": args.token_latency,
+            "cache": args.cache,
+            "turns": args.turns,
+            "prune_schema": args.prune_schema,
+            "examples": args.examples,
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, results, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions against {args.compare}")
+
+
+if __name__ == "__main__":
+    main()
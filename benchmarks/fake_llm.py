@@ -0,0 +1,156 @@
+"""
+Deterministic chat model that replays a scripted agent run.
+"""
+
+import asyncio
+import json
+import time
+from typing import Any, Optional, Union
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.runnables import RunnableLambda
+
+# What a typical run of the SQL agent looks like: discover the tables, read
+# the relevant schema, then run a query
+DEFAULT_TOOL_CALLS = [
+    ("sql_db_list_tables", {"tool_input": ""}),
+    ("sql_db_schema", {"table_names": "products, categories"}),
+    (
+        "sql_db_query",
+        {
+            "query": (
+                "SELECT c.name, COUNT(p.id) AS product_count FROM categories c "
+                "JOIN products p ON p.category_id = c.id "
+                "GROUP BY c.name ORDER BY product_count DESC LIMIT 10"
+            )
+        },
+    ),
+]
+
+DEFAULT_ANSWER = (
+    "Here are the product counts per category, ordered from the largest "
+    "category to the smallest. Electronics has the most products, followed "
+    "by Clothing and Home. The remaining categories each hold a similar "
+    "number of products."
+)
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Replays `tool_calls` one model call at a time, then streams `answer`.
+    A step given as a list of calls issues them all in one turn, as a model
+    making parallel tool calls does. Tool calls are only made once tools
+    are bound, and structured output is answered from `structured_output`,
+    keyed by schema name.
+
+    The step is derived from the messages of the current turn rather than
+    from instance state, so one model can serve any number of concurrent
+    conversations.
+    """
+
+    tool_calls: list[Union[tuple[str, dict], list[tuple[str, dict]]]] = DEFAULT_TOOL_CALLS
+    answer: str = DEFAULT_ANSWER
+    first_token_latency: float = 0.2
+    token_latency: float = 0.01
+    structured_output: dict = {}
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake"
+
+    def bind_tools(self, tools, **kwargs):
+        return self.bind(tools=tools)
+
+    def with_structured_output(self, schema, **kwargs):
+        # A real model call, so latency and callbacks match the other calls
+        return self.bind(schema_name=schema.__name__) | RunnableLambda(
+            lambda message: schema.model_validate_json(message.content)
+        )
+
+    def _next_message(self, messages: list[BaseMessage], **kwargs: Any) -> AIMessage:
+        if kwargs.get("schema_name"):
+            return AIMessage(
+                content=json.dumps(self.structured_output.get(kwargs["schema_name"], {}))
+            )
+        if not kwargs.get("tools"):
+            return AIMessage(content=self.answer)
+        turn_start = max(
+            (i for i, message in enumerate(messages) if isinstance(message, HumanMessage)),
+            default=0,
+        )
+        step = sum(
+            1
+            for message in messages[turn_start:]
+            if isinstance(message, AIMessage) and message.tool_calls
+        )
+        if step < len(self.tool_calls):
+            calls = self.tool_calls[step]
+            if isinstance(calls, tuple):
+                calls = [calls]
+            return AIMessage(
+                content="",
+                tool_calls=[
+                    {
+                        "name": name,
+                        "args": args,
+                        "id": f"call_{step}" if len(calls) == 1 else f"call_{step}_{index}",
+                    }
+                    for index, (name, args) in enumerate(calls)
+                ],
+            )
+        return AIMessage(content=self.answer)
+
+    def _tokens(self, text: str) -> list[str]:
+        words = text.split(" ")
+        return [word + " " for word in words[:-1]] + words[-1:]
+
+    def _generate(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager=None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        message = self._next_message(messages, **kwargs)
+        time.sleep(
+            self.first_token_latency
+            + self.token_latency * len(self._tokens(message.content))
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _astream(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager=None,
+        **kwargs: Any,
+    ):
+        message = self._next_message(messages, **kwargs)
+        await asyncio.sleep(self.first_token_latency)
+
+        if message.tool_calls:
+            yield ChatGenerationChunk(
+                message=AIMessageChunk(
+                    content="",
+                    tool_call_chunks=[
+                        {
+                            "name": call["name"],
+                            "args": json.dumps(call["args"]),
+                            "id": call["id"],
+                            "index": index,
+                        }
+                        for index, call in enumerate(message.tool_calls)
+                    ],
+                )
+            )
+            return
+
+        for index, token in enumerate(self._tokens(message.content)):
+            if index:
+                await asyncio.sleep(self.token_latency)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                await run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
@@ -0,0 +1,119 @@
+"""
+Deterministic shop database used by the benchmarks.
+
+Works against SQLite and PostgreSQL. Seeding drops and recreates the
+fixture tables, so only point it at a scratch database.
+"""
+
+import random
+from datetime import date, timedelta
+
+from sqlalchemy import (
+    Column,
+    Date,
+    ForeignKey,
+    Integer,
+    MetaData,
+    Numeric,
+    String,
+    Table,
+    create_engine,
+    insert,
+)
+
+metadata = MetaData()
+
+categories = Table(
+    "categories",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("name", String(50), nullable=False),
+    comment="Product categories",
+)
+
+products = Table(
+    "products",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("name", String(100), nullable=False),
+    Column("category_id", Integer, ForeignKey("categories.id"), nullable=False),
+    Column("price", Numeric(10, 2), nullable=False),
+    Column("stock", Integer, nullable=False),
+)
+
+customers = Table(
+    "customers",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("name", String(100), nullable=False),
+    Column("email", String(100), nullable=False),
+    Column("country", String(50), nullable=False),
+)
+
+orders = Table(
+    "orders",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("customer_id", Integer, ForeignKey("customers.id"), nullable=False),
+    Column("product_id", Integer, ForeignKey("products.id"), nullable=False),
+    Column("quantity", Integer, nullable=False),
+    Column("ordered_on", Date, nullable=False),
+)
+
+CATEGORIES = ["Electronics", "Clothing", "Home", "Garden", "Sports", "Toys", "Books"]
+COUNTRIES = ["US", "GB", "DE", "FR", "IN", "BR", "JP"]
+
+
+def seed(url: str, products_count: int = 2000, orders_count: int = 10000, seed: int = 0):
+    """(Re)create the fixture tables at `url` with deterministic rows."""
+    rng = random.Random(seed)
+    engine = create_engine(url)
+    metadata.drop_all(engine)
+    metadata.create_all(engine)
+
+    customers_count = max(1, products_count // 4)
+    start = date(2024, 1, 1)
+    with engine.begin() as connection:
+        connection.execute(
+            insert(categories),
+            [{"id": i + 1, "name": name} for i, name in enumerate(CATEGORIES)],
+        )
+        connection.execute(
+            insert(products),
+            [
+                {
+                    "id": i,
+                    "name": f"Product {i}",
+                    "category_id": rng.randint(1, len(CATEGORIES)),
+                    "price": round(rng.uniform(1, 500), 2),
+                    "stock": rng.randint(0, 250),
+                }
+                for i in range(1, products_count + 1)
+            ],
+        )
+        connection.execute(
+            insert(customers),
+            [
+                {
+                    "id": i,
+                    "name": f"Customer {i}",
+                    "email": f"customer{i}@example.com",
+                    "country": rng.choice(COUNTRIES),
+                }
+                for i in range(1, customers_count + 1)
+            ],
+        )
+        connection.execute(
+            insert(orders),
+            [
+                {
+                    "id": i,
+                    "customer_id": rng.randint(1, customers_count),
+                    "product_id": rng.randint(1, products_count),
+                    "quantity": rng.randint(1, 5),
+                    "ordered_on": start + timedelta(days=rng.randint(0, 364)),
+                }
+                for i in range(1, orders_count + 1)
+            ],
+        )
+    engine.dispose()
@@ -0,0 +1,262 @@
+"""
+OpenAI-compatible stand-in for the chat completions and embeddings APIs.
+
+Replays the same scripted agent run as `benchmarks.fake_llm` over HTTP,
+so the whole application, including its real OpenAI client, connection
+pool and retries, can be load-tested with no network access:
+
+    python -m benchmarks.llm_stub --port 8100
+    LLM_BASE_URL=http://127.0.0.1:8100/v1 OPENAI_API_KEY=stub make api
+
+Requests with tools get the scripted tool calls, one step per assistant
+turn; structured output requests get `--structured` JSON by schema name;
+everything else gets the scripted answer. Streaming responses are sent as
+server-sent events, with usage in the last chunk when it is requested.
+Usage reports cached prompt tokens the way OpenAI's prompt caching would,
+so prompt layout changes can be checked without network access.
+"""
+
+import argparse
+import asyncio
+import json
+import time
+import uuid
+from typing import Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from api.services.embeddings import HashingEmbedder
+from benchmarks.fake_llm import DEFAULT_ANSWER, DEFAULT_TOOL_CALLS
+
+
+class StubScript:
+    """What the stub answers and how slowly."""
+
+    def __init__(
+        self,
+        tool_calls: list = DEFAULT_TOOL_CALLS,
+        answer: str = DEFAULT_ANSWER,
+        structured_output: Optional[dict] = None,
+        first_token_latency: float = 0.2,
+        token_latency: float = 0.01,
+    ):
+        self.tool_calls = tool_calls
+        self.answer = answer
+        self.structured_output = structured_output or {}
+        self.first_token_latency = first_token_latency
+        self.token_latency = token_latency
+
+    def reply(self, body: dict) -> dict:
+        """The assistant message for a chat completions request body."""
+        response_format = body.get("response_format") or {}
+        if response_format.get("type") == "json_schema":
+            name = response_format["json_schema"]["name"]
+            return {
+                "role": "assistant",
+                "content": json.dumps(self.structured_output.get(name, {})),
+            }
+        if not body.get("tools"):
+            return {"role": "assistant", "content": self.answer}
+
+        messages = body["messages"]
+        turn_start = max(
+            (i for i, message in enumerate(messages) if message["role"] == "user"),
+            default=0,
+        )
+        step = sum(
+            1
+            for message in messages[turn_start:]
+            if message["role"] == "assistant" and message.get("tool_calls")
+        )
+        if step >= len(self.tool_calls):
+            return {"role": "assistant", "content": self.answer}
+        calls = self.tool_calls[step]
+        if isinstance(calls, tuple):
+            calls = [calls]
+        return {
+            "role": "assistant",
+            "content": None,
+            "tool_calls": [
+                {
+                    "id": f"call_{step}_{index}_{uuid.uuid4().hex[:8]}",
+                    "type": "function",
+                    "function": {"name": name, "arguments": json.dumps(args)},
+                }
+                for index, (name, args) in enumerate(calls)
+            ],
+        }
+
+
+class PromptCache:
+    """
+    Mimics provider-side prompt caching: a prompt of at least `min_tokens`
+    reuses the longest prefix seen before, in steps of `block_tokens`.
+    """
+
+    def __init__(
+        self, min_tokens: int = 1024, block_tokens: int = 128, max_entries: int = 100_000
+    ):
+        self.min_tokens = min_tokens
+        self.block_tokens = block_tokens
+        self.max_entries = max_entries
+        self._prefixes: set[int] = set()
+
+    def cached_tokens(self, prompt: str) -> int:
+        """Prompt tokens served from the cache, remembering the prompt's prefixes."""
+        if len(self._prefixes) > self.max_entries:
+            self._prefixes.clear()
+        cached = 0
+        hit = True
+        for end in range(self.min_tokens, len(prompt) // 4 + 1, self.block_tokens):
+            prefix = hash(prompt[: end * 4])
+            hit = hit and prefix in self._prefixes
+            if hit:
+                cached = end
+            self._prefixes.add(prefix)
+        return cached
+
+
+def _prompt(body: dict) -> str:
+    # Tools come before the messages in the prefix the provider caches
+    return json.dumps([body.get("tools") or [], body["messages"]])
+
+
+def _tokens(text: str) -> list[str]:
+    words = text.split(" ")
+    return [word + " " for word in words[:-1]] + words[-1:]
+
+
+def _usage(body: dict, message: dict, cache: PromptCache) -> dict:
+    # About four characters per token, like the app's own estimates
+    text = _prompt(body)
+    prompt = len(text) // 4
+    completion = len(json.dumps(message)) // 4
+    return {
+        "prompt_tokens": prompt,
+        "completion_tokens": completion,
+        "total_tokens": prompt + completion,
+        "prompt_tokens_details": {"cached_tokens": cache.cached_tokens(text)},
+    }
+
+
+def create_stub_app(script: StubScript) -> FastAPI:
+    app = FastAPI(title="OpenAI stub")
+    embedder = HashingEmbedder(dimensions=1536)
+    cache = PromptCache()
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        message = script.reply(body)
+        usage = _usage(body, message, cache)
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+        envelope = {"id": completion_id, "created": created, "model": body["model"]}
+
+        if not body.get("stream"):
+            tokens = _tokens(message["content"] or "")
+            await asyncio.sleep(
+                script.first_token_latency + script.token_latency * len(tokens)
+            )
+            return JSONResponse(
+                {
+                    **envelope,
+                    "object": "chat.completion",
+                    "choices": [
+                        {
+                            "index": 0,
+                            "message": message,
+                            "finish_reason": "tool_calls"
+                            if message.get("tool_calls")
+                            else "stop",
+                        }
+                    ],
+                    "usage": usage,
+                }
+            )
+
+        def event(**fields) -> bytes:
+            payload = {**envelope, "object": "chat.completion.chunk", **fields}
+            return f"data: {json.dumps(payload)}\n\n".encode("utf-8")
+
+        def chunk(delta: dict, finish_reason: Optional[str] = None) -> bytes:
+            return event(
+                choices=[{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+            )
+
+        async def events():
+            await asyncio.sleep(script.first_token_latency)
+            if message.get("tool_calls"):
+                yield chunk(
+                    {
+                        "role": "assistant",
+                        "tool_calls": [
+                            {"index": index, **call}
+                            for index, call in enumerate(message["tool_calls"])
+                        ],
+                    }
+                )
+                finish_reason = "tool_calls"
+            else:
+                for index, token in enumerate(_tokens(message["content"])):
+                    if index:
+                        await asyncio.sleep(script.token_latency)
+                    delta = {"content": token}
+                    yield chunk(delta if index else {"role": "assistant", **delta})
+                finish_reason = "stop"
+            yield chunk({}, finish_reason)
+            if (body.get("stream_options") or {}).get("include_usage"):
+                yield event(choices=[], usage=usage)
+            yield b"data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        return JSONResponse(
+            {
+                "object": "list",
+                "model": body["model"],
+                "data": [
+                    {
+                        "object": "embedding",
+                        "index": index,
+                        "embedding": embedder.embed(str(text)),
+                    }
+                    for index, text in enumerate(inputs)
+                ],
+                "usage": {"prompt_tokens": 0, "total_tokens": 0},
+            }
+        )
+
+    return app
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="OpenAI-compatible stub server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--first-token-latency", type=float, default=0.2)
+    parser.add_argument("--token-latency", type=float, default=0.01)
+    parser.add_argument(
+        "--structured",
+        default='{"SuggestionsResponse": {"suggestions": []}}',
+        help="JSON object of structured output per schema name",
+    )
+    args = parser.parse_args()
+
+    script = StubScript(
+        structured_output=json.loads(args.structured),
+        first_token_latency=args.first_token_latency,
+        token_latency=args.token_latency,
+    )
+    uvicorn.run(create_stub_app(script), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
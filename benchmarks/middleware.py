@@ -0,0 +1,139 @@
+"""
+Per-request overhead of the request logging middleware.
+
+Compares the pure ASGI `RequestLoggingMiddleware` with the previous
+`BaseHTTPMiddleware` implementation, and with no middleware at all, on a
+JSON endpoint and an SSE endpoint. Requests are driven straight through
+the ASGI interface, so no network or server time is included:
+
+    python -m benchmarks.middleware --requests 5000 --chunks 200
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from api.core.logging import logger
+from api.middleware import RequestLoggingMiddleware
+
+
+class BaseHTTPRequestLoggingMiddleware(BaseHTTPMiddleware):
+    """The previous implementation, kept here as the point of comparison."""
+
+    async def dispatch(self, request: Request, call_next):
+        start_time = time.time()
+        logger.info(f"➡️  {request.method} {request.url.path}")
+        response = await call_next(request)
+        process_time = time.time() - start_time
+        logger.info(
+            f"⬅️  {request.method} {request.url.path} "
+            f"- Status: {response.status_code} "
+            f"- Time: {process_time:.3f}s"
+        )
+        response.headers["X-Process-Time"] = str(process_time)
+        return response
+
+
+def create_app(middleware, chunks: int) -> FastAPI:
+    app = FastAPI()
+    if middleware is not None:
+        app.add_middleware(middleware)
+
+    @app.get("/json")
+    async def json_endpoint():
+        return {"status": "ok"}
+
+    @app.get("/stream")
+    async def stream_endpoint():
+        async def frames():
+            for _ in range(chunks):
+                yield 'data: {"token": "hello ", "done": false}\n\n'
+
+        return StreamingResponse(frames(), media_type="text/event-stream")
+
+    return app
+
+
+async def call(app, path: str) -> int:
+    """Send one GET request through the ASGI interface, return bytes received."""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0", "spec_version": "2.4"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"host", b"bench")],
+        "client": ("127.0.0.1", 50000),
+        "server": ("127.0.0.1", 8000),
+    }
+    received = 0
+    done = asyncio.Event()
+
+    async def receive():
+        if not hasattr(receive, "sent"):
+            receive.sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await done.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal received
+        if message["type"] == "http.response.body":
+            received += len(message.get("body", b""))
+            if not message.get("more_body", False):
+                done.set()
+
+    await app(scope, receive, send)
+    return received
+
+
+async def measure(app, path: str, requests: int) -> float:
+    """Mean microseconds per request."""
+    for _ in range(min(100, requests)):
+        await call(app, path)
+    start = time.perf_counter()
+    for _ in range(requests):
+        await call(app, path)
+    return (time.perf_counter() - start) / requests * 1e6
+
+
+async def run(args):
+    variants = [
+        ("none", None),
+        ("BaseHTTPMiddleware", BaseHTTPRequestLoggingMiddleware),
+        ("pure ASGI", RequestLoggingMiddleware),
+    ]
+    for path in ("/json", "/stream"):
+        baseline = None
+        for name, middleware in variants:
+            app = create_app(middleware, args.chunks)
+            micros = await measure(app, path, args.requests)
+            baseline = micros if baseline is None else baseline
+            print(
+                f"{path:<8} {name:<20} {micros:9.1f} us/request "
+                f"({micros - baseline:+.1f} us vs no middleware)"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark request logging middleware")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--chunks", type=int, default=200, help="SSE frames per stream")
+    args = parser.parse_args()
+
+    # Measure the middleware, not the log handlers
+    logging.getLogger().setLevel(logging.WARNING)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Cost of the sql_db_schema tool.
+
+Compares LangChain's InfoSQLDatabaseTool with the cached `SchemaCache`
+output in both formats, counting database statements, response size and
+time for a cold call (tables already reflected, as after startup) and a
+warm one:
+
+    python -m benchmarks.schema_tools --tables categories products customers orders
+"""
+
+import argparse
+import logging
+import time
+
+from langchain_community.tools.sql_database.tool import InfoSQLDatabaseTool
+from langchain_community.utilities import SQLDatabase
+from sqlalchemy import event
+
+from api.services.schema_cache import SchemaCache
+from api.services.schema_index import estimate_tokens
+from api.services.sql_database import SQLDatabaseAdapter
+from benchmarks.chat import DEFAULT_DB_URL, prepare_fixture
+
+
+class StatementCounter:
+    def __init__(self, db: SQLDatabase):
+        self.count = 0
+        self.engine = SQLDatabaseAdapter(db).engine
+        event.listen(self.engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, *args):
+        self.count += 1
+
+
+def measure(describe, db: SQLDatabase) -> tuple[int, float, int]:
+    """Statements run, milliseconds and response tokens of one call."""
+    counter = StatementCounter(db)
+    start = time.perf_counter()
+    output = describe()
+    millis = (time.perf_counter() - start) * 1000
+    event.remove(counter.engine, "before_cursor_execute", counter._on_execute)
+    return counter.count, millis, estimate_tokens(output)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the schema tool")
+    parser.add_argument("--db-url", default=DEFAULT_DB_URL)
+    parser.add_argument(
+        "--tables", nargs="+", default=["categories", "products", "customers", "orders"]
+    )
+    parser.add_argument("--seed", action="store_true", help="Re-seed the fixture first")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    prepare_fixture(args.db_url, args.seed)
+
+    def fresh_db() -> SQLDatabase:
+        db = SQLDatabase.from_uri(args.db_url, lazy_table_reflection=True)
+        # Reflect up front, as the schema prompt does at startup, so only
+        # the tool's own statements are counted
+        db.get_table_info(args.tables)
+        return db
+
+    db = fresh_db()
+    tool = InfoSQLDatabaseTool(db=db)
+    variants = [("InfoSQLDatabaseTool", db, lambda: tool.invoke(", ".join(args.tables)))]
+    for output_format in ("ddl", "compact"):
+        cache_db = fresh_db()
+        cache = SchemaCache(SQLDatabaseAdapter(cache_db))
+        variants.append(
+            (
+                f"SchemaCache {output_format}",
+                cache_db,
+                lambda cache=cache, output_format=output_format: cache.describe(
+                    args.tables, output_format
+                ),
+            )
+        )
+
+    print(f"{'':<22}{'statements':>11}{'cold ms':>9}{'warm ms':>9}{'tokens':>8}")
+    for name, variant_db, describe in variants:
+        statements, cold, tokens = measure(describe, variant_db)
+        _, warm, _ = measure(describe, variant_db)
+        print(f"{name:<22}{statements:>11}{cold:>9.2f}{warm:>9.2f}{tokens:>8}")
+
+
+if __name__ == "__main__":
+    main()
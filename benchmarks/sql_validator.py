@@ -0,0 +1,149 @@
+"""
+Per-call cost and verdicts of the SQL safety check.
+
+Compares the previous keyword regexes with `SQLValidator`, both parsing
+every call and with cached verdicts. The workload repeats a handful of
+distinct queries, as an agent re-running its queries does:
+
+    python -m benchmarks.sql_validator --calls 20000 --distinct 50
+
+It exits non-zero when a verdict in CASES or the tables read by a query in
+TABLE_CASES differ from the expected ones.
+"""
+
+import argparse
+import re
+import sys
+import time
+
+from api.services.sql_validator import SQLValidator
+
+QUERIES = [
+    "SELECT name, price FROM products WHERE price > 100 ORDER BY price DESC LIMIT 10",
+    "SELECT c.name, SUM(o.total) AS revenue FROM orders o JOIN customers c "
+    "ON c.id = o.customer_id GROUP BY c.name ORDER BY revenue DESC LIMIT 5",
+    "WITH monthly AS (SELECT date_trunc('month', created_at) AS month, "
+    "COUNT(*) AS n FROM orders GROUP BY 1) SELECT * FROM monthly ORDER BY month",
+    "SELECT category_id, AVG(price) FROM products GROUP BY category_id",
+]
+
+# (query, should be allowed)
+CASES = [
+    ("SELECT id, created_at_update FROM orders", True),
+    ("SELECT * FROM products WHERE tag = 'drop shipping'", True),
+    ("SELECT replace(name, ' ', '_') FROM products", True),
+    ("SELECT pg_sleep(10)", False),
+    ("SELECT 1; DROP TABLE orders", False),
+    ("WITH gone AS (DELETE FROM orders RETURNING *) SELECT * FROM gone", False),
+    ("SELECT * INTO orders_copy FROM orders", False),
+    ("SELECT nextval('orders_id_seq')", False),
+    ("UPDATE products SET price = 0", False),
+    # Functions that run a SQL string, and lock or large object variants
+    ("SELECT query_to_xml('delete from t', true, false, '')", False),
+    ("SELECT query_to_xml_and_xmlschema('delete from t', true, false, '')", False),
+    ("SELECT cursor_to_xml('c', 1, true, false, '')", False),
+    ("SELECT pg_catalog.query_to_xml('delete from t', true, false, '')", False),
+    ("SELECT pg_advisory_lock_shared(1)", False),
+    ("SELECT pg_try_advisory_lock_shared(1)", False),
+    ("SELECT pg_try_advisory_xact_lock(1)", False),
+    ("SELECT lo_get(1)", False),
+    ("SELECT lower(name), lpad(name, 5) FROM products", True),
+]
+
+# (query, tables it reads), as the query result cache tags its entries
+TABLE_CASES = [
+    ("SELECT * FROM a, b WHERE a.id = b.a_id", {"a", "b"}),
+    (
+        "WITH recent AS (SELECT * FROM orders) "
+        "SELECT * FROM recent JOIN customers c ON c.id = recent.customer_id",
+        {"orders", "customers"},
+    ),
+    (
+        'SELECT * FROM public."Order Items" JOIN shop.products USING (id)',
+        {"order items", "products"},
+    ),
+    ("SELECT * FROM products WHERE id IN (SELECT product_id FROM reviews)", {"products", "reviews"}),
+    ("SELECT FROM WHERE", set()),
+]
+
+
+def legacy_is_safe_query(query: str) -> bool:
+    """The previous check, kept here as the point of comparison."""
+    query_upper = query.strip().upper()
+
+    dangerous = [
+        "DROP",
+        "DELETE",
+        "UPDATE",
+        "INSERT",
+        "TRUNCATE",
+        "ALTER",
+        "CREATE",
+        "REPLACE",
+        "MERGE",
+        "GRANT",
+        "REVOKE",
+        "EXEC",
+        "EXECUTE",
+    ]
+
+    return not any(re.search(rf"\b{keyword}\b", query_upper) for keyword in dangerous)
+
+
+def workload(calls: int, distinct: int) -> list[str]:
+    variants = [
+        f"{QUERIES[i % len(QUERIES)]} -- {i // len(QUERIES)}" for i in range(distinct)
+    ]
+    return [variants[i % distinct] for i in range(calls)]
+
+
+def measure(check, queries: list[str]) -> float:
+    """Mean microseconds per call."""
+    start = time.perf_counter()
+    for query in queries:
+        check(query)
+    return (time.perf_counter() - start) / len(queries) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the SQL safety check")
+    parser.add_argument("--calls", type=int, default=20000)
+    parser.add_argument("--distinct", type=int, default=50)
+    parser.add_argument("--dialect", default="postgres")
+    args = parser.parse_args()
+
+    queries = workload(args.calls, args.distinct)
+    cached = SQLValidator(args.dialect)
+    for name, check in [
+        ("keyword regexes", legacy_is_safe_query),
+        ("sqlglot, uncached", lambda q: SQLValidator(args.dialect).check(q)),
+        ("sqlglot, cached", cached.check),
+    ]:
+        print(f"{name:<20} {measure(check, queries):9.2f} us/call")
+
+    print()
+    validator = SQLValidator(args.dialect)
+    print(f"{'expected':<9}{'regexes':<9}{'sqlglot':<9}query")
+    wrong = 0
+    for query, allowed in CASES:
+        verdict = validator.check(query)
+        wrong += (verdict is None) != allowed
+        print(
+            f"{'allow' if allowed else 'reject':<9}"
+            f"{'allow' if legacy_is_safe_query(query) else 'reject':<9}"
+            f"{'allow' if verdict is None else 'reject':<9}{query}"
+        )
+
+    print()
+    print(f"{'ok':<4}tables")
+    for query, expected in TABLE_CASES:
+        tables = set(validator.tables(query))
+        wrong += tables != expected
+        print(f"{'yes' if tables == expected else 'no':<4}{sorted(tables)} {query}")
+    if wrong:
+        print(f"{wrong} verdict(s) or table set(s) differ from the expected one")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
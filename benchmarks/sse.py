@@ -0,0 +1,72 @@
+"""
+CPU cost of framing a streamed answer as SSE.
+
+Compares the previous framing (`json.dumps` of a fresh dict per token,
+one frame per token) with `SSEEncoder` plus token coalescing:
+
+    python -m benchmarks.sse --tokens 500 --runs 200
+"""
+
+import argparse
+import json
+import time
+
+from api.services.sse import SSEEncoder, TokenBuffer
+
+WORDS = "The top categories by revenue are Electronics and Clothing , with".split()
+
+
+def legacy_frames(tokens: list[str], model: str) -> list[str]:
+    frames = [
+        f"data: {json.dumps({'token': token, 'done': False, 'model': model})}\n\n"
+        for token in tokens
+    ]
+    frames.append(f"data: {json.dumps({'done': True, 'token': '', 'model': model})}\n\n")
+    return frames
+
+
+def coalesced_frames(tokens: list[str], model: str, max_bytes: int) -> list[bytes]:
+    # Time-based flushing is left out: tokens arrive back to back here, so
+    # only the size limit applies, as under load
+    encoder = SSEEncoder(model)
+    buffer = TokenBuffer(window=3600.0, max_bytes=max_bytes)
+    frames = []
+    for index, token in enumerate(tokens):
+        buffer.add(token)
+        if index == 0 or buffer.full():
+            frames.append(encoder.token(buffer.flush()))
+    if buffer:
+        frames.append(encoder.token(buffer.flush()))
+    frames.append(encoder.done())
+    return frames
+
+
+def measure(build, runs: int) -> tuple[float, int, int]:
+    """CPU microseconds per response, frames and bytes per response."""
+    frames = build()
+    start = time.process_time()
+    for _ in range(runs):
+        build()
+    micros = (time.process_time() - start) / runs * 1e6
+    return micros, len(frames), sum(len(frame) for frame in frames)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark SSE framing")
+    parser.add_argument("--tokens", type=int, default=500)
+    parser.add_argument("--runs", type=int, default=200)
+    parser.add_argument("--max-bytes", type=int, default=256)
+    args = parser.parse_args()
+
+    tokens = [f"{WORDS[i % len(WORDS)]} " for i in range(args.tokens)]
+    model = "gpt-4o-mini"
+    for name, build in [
+        ("per-token json.dumps", lambda: legacy_frames(tokens, model)),
+        ("SSEEncoder + coalescing", lambda: coalesced_frames(tokens, model, args.max_bytes)),
+    ]:
+        micros, frames, size = measure(build, args.runs)
+        print(f"{name:<26} {micros:9.1f} us/response {frames:5} frames {size:7} bytes")
+
+
+if __name__ == "__main__":
+    main()
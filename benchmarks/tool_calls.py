@@ -0,0 +1,156 @@
+"""
+Wall-clock time of an agent turn that makes several tool calls at once.
+
+A scripted model asks for the schema of every fixture table and runs a few
+queries of different duration in one turn. The turn is timed through the
+real agent graph and toolkit, and compared with the sum and the maximum of
+the calls' latencies measured one at a time:
+
+    python -m benchmarks.tool_calls --query-latency 0.1
+
+The fixture is SQLite, whose queries are CPU-bound in this process, so
+server time is simulated with a `bench_sleep(seconds)` SQL function that
+waits without holding the GIL, like a database server would.
+
+Tool results are also passed through `ToolResultOrder`, as the chat
+endpoint does, to show that they come out in call order. It exits non-zero
+when a result of a call announced ahead of one that never runs is still
+held back once the next model message starts.
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+
+from benchmarks import fixture
+from benchmarks.chat import DEFAULT_DB_URL, prepare_fixture
+
+
+def on_connect(dbapi_connection, _):
+    dbapi_connection.create_function("bench_sleep", 1, lambda seconds: time.sleep(seconds))
+
+
+def script(query_latency: float) -> list[tuple[str, dict]]:
+    tables = [table.name for table in fixture.metadata.sorted_tables]
+    calls = [("sql_db_schema", {"table_names": table}) for table in tables]
+    calls += [
+        (
+            "sql_db_query",
+            {
+                "query": f"SELECT (SELECT COUNT(*) FROM {table}) AS row_count, "
+                f"bench_sleep({query_latency * (index + 1)}) AS waited"
+            },
+        )
+        for index, table in enumerate(tables[:3])
+    ]
+    return calls
+
+
+async def run(args):
+    from langchain.agents import create_agent
+    from langchain_community.utilities import SQLDatabase
+    from sqlalchemy import event
+
+    from api.services.async_database import AsyncDatabase
+    from api.services.database_service import DatabaseService
+    from api.services.sql_database import SQLDatabaseAdapter
+    from api.services.sql_service import CustomSQLDatabaseToolkit
+    from api.services.sse import ToolResultOrder
+    from benchmarks.fake_llm import FakeChatModel
+
+    calls = script(args.query_latency)
+
+    def toolkit():
+        # A fresh toolkit per measurement, so reflection is never pre-warmed
+        db = SQLDatabase.from_uri(
+            DatabaseService._database_url().render_as_string(hide_password=False),
+            lazy_table_reflection=True,
+        )
+        async_db = AsyncDatabase(
+            DatabaseService._database_url(asynchronous=True).render_as_string(
+                hide_password=False
+            )
+        )
+        database = SQLDatabaseAdapter(db)
+        event.listen(database.engine, "connect", on_connect)
+        event.listen(async_db.engine.sync_engine, "connect", on_connect)
+        return CustomSQLDatabaseToolkit(
+            db=db, database=database, llm=FakeChatModel(), async_db=async_db
+        )
+
+    tools = {tool.name: tool for tool in toolkit().get_tools()}
+    latencies = []
+    for name, tool_args in calls:
+        start = time.perf_counter()
+        await tools[name].ainvoke(tool_args)
+        latencies.append(time.perf_counter() - start)
+
+    model = FakeChatModel(
+        tool_calls=[calls], answer="done", first_token_latency=0.0, token_latency=0.0
+    )
+    agent = create_agent(model=model, tools=toolkit().get_tools())
+    order = ToolResultOrder()
+    arrived, released = [], []
+    start = time.perf_counter()
+    async for chunk, _ in agent.astream(
+        {"messages": [{"role": "user", "content": "benchmark"}]},
+        stream_mode="messages",
+    ):
+        if getattr(chunk, "tool_call_id", None):
+            arrived.append(chunk.tool_call_id)
+            released += [item.tool_call_id for item in order.release(chunk.tool_call_id, chunk)]
+            continue
+        released += [item.tool_call_id for item in order.message(chunk.id)]
+        for call in getattr(chunk, "tool_call_chunks", None) or ():
+            order.expect(call["id"])
+    wall = time.perf_counter() - start
+
+    print(f"{len(calls)} tool calls in one turn")
+    print(f"sum of latencies  {sum(latencies) * 1000:8.1f} ms")
+    print(f"max latency       {max(latencies) * 1000:8.1f} ms")
+    print(f"agent turn        {wall * 1000:8.1f} ms")
+    print(f"arrival order     {' '.join(call.rsplit('_', 1)[-1] for call in arrived)}")
+    print(f"sent order        {' '.join(call.rsplit('_', 1)[-1] for call in released)}")
+
+
+def unanswered_call_released() -> bool:
+    """
+    A turn announces a call whose arguments do not parse, so it never runs,
+    ahead of one that does; the result of the second has to go out when
+    the model's next message starts, not with the final answer.
+    """
+    from api.services.sse import ToolResultOrder
+
+    order = ToolResultOrder()
+    order.message("turn_1")
+    order.expect("call_invalid")
+    order.expect("call_valid")
+    held = order.release("call_valid", "result")
+    return not held and order.message("turn_2") == ["result"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark parallel tool calls")
+    parser.add_argument("--db-url", default=DEFAULT_DB_URL, help="SQLite fixture to query")
+    parser.add_argument(
+        "--query-latency", type=float, default=0.1, help="Simulated seconds per query step"
+    )
+    parser.add_argument("--seed", action="store_true", help="Re-seed the fixture first")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    prepare_fixture(args.db_url, args.seed)
+    # Read by the settings, so it has to be set before `api` is imported
+    os.environ["DATABASE_URL"] = args.db_url
+    os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+    asyncio.run(run(args))
+    if not unanswered_call_released():
+        print("a tool result was held back past the end of its turn")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()